@@ -0,0 +1,335 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import SyntheticProvider, synthetic_prices, write_universe
+
+# -----------------------------
+# Benchmark harness
+# -----------------------------
+# Times the hot paths on deterministic synthetic prices (no network) and
+# records wall time and peak traced memory per benchmark:
+#
+#   python -m benchmarks.run                           10 tickers x 3 years
+#   python -m benchmarks.run --tickers 500 --days 2520 --only rotation flow
+#   python -m benchmarks.run --save base.json
+#   python -m benchmarks.run --compare base.json       exit 1 on regressions
+#
+# Each benchmark runs once untimed (warm-up), `repeat` times for timing and
+# once more under tracemalloc for the memory peak (tracing slows it down, so
+# it is kept out of the timings).
+
+
+def measure(fn, repeat: int = 3) -> dict:
+    fn()
+
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "peak_mb": peak / 1e6,
+        "repeat": repeat,
+    }
+
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+# Each entry: name -> setup(args) returning the callable to time.
+
+def _prices(args):
+    return synthetic_prices(args.tickers, args.days, args.sectors, args.seed)
+
+
+def bench_feature_matrix(args):
+    from features.feature_engineering import build_feature_matrix
+    prices, market = _prices(args)
+    return lambda: build_feature_matrix(prices, market)
+
+
+def bench_rolling_features(args):
+    from features.rolling_features import build_rolling_features
+    prices, market = _prices(args)
+    return lambda: build_rolling_features(prices, market, args.window)
+
+
+def bench_rolling_covariance(args):
+    from features.rolling_covariance import build_rolling_covariance
+    prices, market = _prices(args)
+    return lambda: build_rolling_covariance(prices, market, args.window)
+
+
+def bench_cluster_confidence(args):
+    from models.cluster_confidence import bootstrap_cluster_confidence
+    prices, market = _prices(args)
+    return lambda: bootstrap_cluster_confidence(prices, market, 500)
+
+
+def bench_kmeans_fit_predict(args):
+    from features.feature_engineering import build_feature_matrix
+    from models.kmeans import SectorKMeans
+    prices, market = _prices(args)
+    features = build_feature_matrix(prices, market).dropna()
+    return lambda: SectorKMeans(n_clusters=3).fit_predict(features)
+
+
+def bench_kmeans_batch(args):
+    from features.rolling_features import build_rolling_features
+    from models.kmeans import SectorKMeans
+    prices, market = _prices(args)
+    values = build_rolling_features(prices, market, args.window).values
+    return lambda: SectorKMeans(n_clusters=3, backend="numpy").fit_predict_batch(values)
+
+
+def bench_rotation_frames(backend):
+    def setup(args):
+        from models.rotation_frame_builder import build_rotation_frames
+        prices, market = _prices(args)
+        return lambda: build_rotation_frames(prices, market, args.window, backend=backend)
+    return setup
+
+
+def bench_rotation_run(backend, warm_start=False):
+    def setup(args):
+        from models.sector_rotation import SectorRotationModel
+        prices, market = _prices(args)
+        return lambda: SectorRotationModel(args.window, warm_start=warm_start, backend=backend).run(prices, market)
+    return setup
+
+
+def bench_rotation_update(args):
+    from models.sector_rotation import SectorRotationModel
+    prices, market = _prices(args)
+    model = SectorRotationModel(args.window, warm_start=True, backend="numpy")
+    model.run(prices.iloc[:-1], market.iloc[:-1])
+
+    # Saved once so every call loads the same state and appends the same day
+    path = os.path.join(tempfile.mkdtemp(prefix="sra-bench-"), "model.npz")
+    model.save(path)
+    return lambda: SectorRotationModel.load(path).update(prices.iloc[-1:], market.iloc[-1:])
+
+
+def bench_rotation_flow(args):
+    from models.rotation_flow import (
+        compute_relative_strength, compute_rolling_strength, compute_rotation_flow, compute_sector_returns
+    )
+    prices, market = _prices(args)
+    rel_strength = compute_relative_strength(compute_sector_returns(prices), market.pct_change().dropna())
+    rolling_strength = compute_rolling_strength(rel_strength, window=20)
+    return lambda: compute_rotation_flow(rolling_strength)
+
+
+def bench_startup(args):
+    # Fresh interpreter importing and starting the API (see benchmarks/startup.py)
+    from benchmarks.startup import time_startup
+    return lambda: time_startup(repeat=1)
+
+
+def bench_rotation_horizons(args):
+    from models.rotation_flow import (
+        compute_relative_strength, compute_rolling_strengths, compute_rotation_flow_matrices, compute_sector_returns
+    )
+    prices, market = _prices(args)
+    rel_strength = compute_relative_strength(compute_sector_returns(prices), market.pct_change().dropna())
+    return lambda: compute_rotation_flow_matrices(compute_rolling_strengths(rel_strength, (5, 20, 60, 120)))
+
+
+def bench_flow_graph_range(args):
+    # One date-range query (half the history) against a prebuilt flow graph
+    from models.flow_graph import FlowGraph
+    from models.rotation_flow import compute_relative_strength, compute_rolling_strength, compute_sector_returns
+    prices, market = _prices(args)
+    rel_strength = compute_relative_strength(compute_sector_returns(prices), market.pct_change().dropna())
+    graph = FlowGraph.from_rolling_strength(compute_rolling_strength(rel_strength, args.window))
+    lo, hi = len(graph) // 4, 3 * len(graph) // 4
+    return lambda: graph.net_inflow(lo, hi)
+
+
+def bench_live_tick(args):
+    # One intraday bar (provisional close of the day after the history)
+    from data.bar_sources import Bar
+    from services.live import LiveEngine
+    prices, market = _prices(args)
+    engine = LiveEngine(prices.iloc[:-1], market.iloc[:-1], "MARKET", args.window)
+    bar = Bar(prices.index[-1] + pd.Timedelta(hours=12), dict(prices.iloc[-1], MARKET=market.iloc[-1]))
+    return lambda: engine.on_bar(bar)
+
+
+BENCHMARKS = {
+    "startup.api[subprocess]": bench_startup,
+    "features.build_feature_matrix": bench_feature_matrix,
+    "features.build_rolling_features": bench_rolling_features,
+    "features.build_rolling_covariance": bench_rolling_covariance,
+    "kmeans.fit_predict": bench_kmeans_fit_predict,
+    "kmeans.fit_predict_batch[numpy]": bench_kmeans_batch,
+    "kmeans.bootstrap_confidence[500]": bench_cluster_confidence,
+    "frames.build_rotation_frames[sklearn]": bench_rotation_frames("sklearn"),
+    "frames.build_rotation_frames[numpy]": bench_rotation_frames("numpy"),
+    "rotation.run[sklearn]": bench_rotation_run("sklearn"),
+    "rotation.run[sklearn,warm]": bench_rotation_run("sklearn", warm_start=True),
+    "rotation.run[numpy]": bench_rotation_run("numpy"),
+    "rotation.update[1 day]": bench_rotation_update,
+    "flow.compute_rotation_flow": bench_rotation_flow,
+    "flow.horizons[5,20,60,120]": bench_rotation_horizons,
+    "flow.graph_range_query": bench_flow_graph_range,
+    "live.tick": bench_live_tick,
+}
+
+ENDPOINTS = ["/clusters", "/correlation", "/rotation", "/rotation/graph"]
+
+
+def configure_app(args):
+    """
+    Point utils/config at a synthetic universe and a scratch price store.
+    Must run before anything imports utils/config.
+    """
+    workdir = tempfile.mkdtemp(prefix="sra-bench-")
+    os.environ.update({
+        "SRA_UNIVERSE": write_universe(os.path.join(workdir, "universe.json"), args.tickers, args.sectors),
+        "SRA_UNIVERSE_LEVEL": args.level,
+        "SRA_PRICE_STORE_DIR": os.path.join(workdir, "store"),
+        "SRA_PROCESS_WORKERS": "0",
+        "SRA_REFRESH_INTERVAL_SECONDS": str(10 ** 9),
+        "SRA_SNAPSHOT_INDEX": "0",
+    })
+
+
+def run_endpoints(args, selected) -> dict:
+    """
+    Both endpoints through TestClient against a synthetic universe:
+    [cold] recomputes the snapshot on every request, [warm] serves it.
+    """
+    names = [f"api.{path}[{mode}]" for path in ENDPOINTS for mode in ("cold", "warm")]
+    names = [n for n in names if selected(n)]
+    if not names:
+        return {}
+
+    from fastapi.testclient import TestClient
+    from data import dataGetter
+    dataGetter.set_price_provider(SyntheticProvider(args.days, args.sectors, args.seed),
+                                  os.environ["SRA_PRICE_STORE_DIR"])
+    import main
+
+    results = {}
+    with TestClient(main.app) as client:
+        for name in names:
+            path = name[len("api."):name.index("[")]
+
+            def request(path=path, cold=name.endswith("[cold]")):
+                if cold:
+                    main.scheduler.invalidate()
+                response = client.get(path)
+                response.raise_for_status()
+
+            results[name] = measure(request, args.repeat)
+    return results
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Names whose median time or memory peak grew by more than `threshold`
+    (a fraction) over the baseline.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        for metric in ("median_s", "peak_mb"):
+            if before[metric] > 0 and current[metric] > before[metric] * (1 + threshold):
+                regressions.append((name, metric, before[metric], current[metric]))
+    return regressions
+
+
+def print_table(results: dict, baseline: dict = None):
+    baseline = (baseline or {}).get("results", {})
+    print(f"{'benchmark':42s} {'median':>10s} {'min':>10s} {'peak MB':>9s} {'vs base':>8s}")
+    for name, r in results.items():
+        ratio = ""
+        if name in baseline and baseline[name]["median_s"] > 0:
+            ratio = f"{r['median_s'] / baseline[name]['median_s']:.2f}x"
+        print(f"{name:42s} {r['median_s'] * 1e3:8.1f}ms {r['min_s'] * 1e3:8.1f}ms {r['peak_mb']:9.1f} {ratio:>8s}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths on synthetic prices")
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--days", type=int, default=756)
+    parser.add_argument("--sectors", type=int, default=10)
+    parser.add_argument("--window", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--level", default="sector", help="universe level the endpoints analyse")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="run benchmarks whose name contains any of these")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from --save")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown / growth (fraction)")
+    args = parser.parse_args(argv)
+
+    def selected(name):
+        return not args.only or any(part in name for part in args.only)
+
+    meta = {
+        "tickers": args.tickers, "days": args.days, "sectors": args.sectors, "window": args.window,
+        "seed": args.seed, "level": args.level, "python": platform.python_version(),
+        "numpy": np.__version__, "pandas": pd.__version__,
+    }
+
+    configure_app(args)
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if selected(name):
+            results[name] = measure(setup(args), args.repeat)
+    results.update(run_endpoints(args, selected))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sizes = ("tickers", "days", "sectors", "window", "level")
+        if any(baseline["meta"].get(k) != meta[k] for k in sizes):
+            print("warning: baseline was recorded with different sizes", file=sys.stderr)
+
+    print_table(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.4g} -> {after:.4g}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# -----------------------------
+# Startup / import-time benchmark
+# -----------------------------
+# Each measurement runs in a fresh interpreter (imports are cached per
+# process), with the backend directory as working directory:
+#
+#   python -m benchmarks.startup                 import + startup times, heaviest imports
+#   python -m benchmarks.startup --repeat 10
+#
+# Exits 1 when importing the API loads a module from HEAVY: plotting, sklearn
+# and yfinance must only be imported on first use.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("sklearn", "scipy", "matplotlib", "plotly", "yfinance", "requests", "curl_cffi")
+
+# Prints: import seconds, startup seconds (lifespan, no background refresh), loaded top-level packages
+_PROBE = """
+import os, sys, time
+os.environ.setdefault("SRA_REFRESH_INTERVAL_SECONDS", str(10 ** 9))
+os.environ.setdefault("SRA_PROCESS_WORKERS", "0")
+os.environ.setdefault("SRA_SNAPSHOT_INDEX", "0")
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+
+import asyncio
+async def boot():
+    async with main.lifespan(main.app):
+        pass
+started = time.perf_counter()
+main.scheduler.refresh_once = lambda: asyncio.sleep(0)
+asyncio.run(boot())
+booted = time.perf_counter() - started
+
+print(imported, booted, " ".join(sorted({m.split(".")[0] for m in sys.modules})))
+"""
+
+
+def _run(args: list, env: dict = None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, cwd=BACKEND_DIR, capture_output=True, text=True,
+                          env=dict(os.environ, **(env or {})), check=True)
+
+
+def time_startup(repeat: int = 5) -> dict:
+    """
+    Median import / startup time of the API in fresh interpreters, plus the
+    top-level packages it loaded.
+    """
+    imports, boots = [], []
+    for _ in range(repeat):
+        imported, booted, modules = _run(["-c", _PROBE]).stdout.split(" ", 2)
+        imports.append(float(imported))
+        boots.append(float(booted))
+
+    return {
+        "import_s": statistics.median(imports),
+        "startup_s": statistics.median(boots),
+        "modules": modules.split(),
+    }
+
+
+def import_profile(module: str = "main", top: int = 15) -> list:
+    """
+    (cumulative seconds, module) of the slowest imports under `module`,
+    from python -X importtime.
+    """
+    stderr = _run(["-X", "importtime", "-c", f"import {module}"]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1e6, name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API import and startup time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args(argv)
+
+    result = time_startup(args.repeat)
+    print(f"import main   {result['import_s'] * 1e3:8.1f}ms")
+    print(f"app startup   {result['startup_s'] * 1e3:8.1f}ms")
+    print()
+    print("slowest imports (cumulative):")
+    for seconds, name in import_profile("main", args.top):
+        print(f"  {seconds * 1e3:8.1f}ms  {name}")
+
+    loaded = [m for m in HEAVY if m in result["modules"]]
+    if loaded:
+        print(f"\nheavy modules loaded at startup: {', '.join(loaded)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import json
+import zlib
+import numpy as np
+import pandas as pd
+from data.providers import period_start
+
+# -----------------------------
+# Synthetic prices
+# -----------------------------
+# Deterministic daily closes for any number of tickers, with no network.
+# Daily log returns = beta * market factor + sector factor + idiosyncratic
+# noise, so clusters and rotations have some structure to find. The same
+# (seed, ticker) always gives the same series.
+
+MARKET = "SPY"
+
+
+def _rng(seed: int, name: str):
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+
+def _trading_days(n_days: int, end=None) -> pd.DatetimeIndex:
+    end = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end)
+    return pd.bdate_range(end=end, periods=n_days, name="Date")
+
+
+def ticker_names(n_tickers: int) -> list:
+    return [f"T{i:05d}" for i in range(n_tickers)]
+
+
+def sector_of(ticker: str, n_sectors: int) -> str:
+    return f"Sector{zlib.crc32(ticker.encode()) % n_sectors:02d}"
+
+
+def _factor(seed: int, name: str, n_days: int, vol: float, drift: float = 0.0) -> np.ndarray:
+    return drift + vol * _rng(seed, name).standard_normal(n_days)
+
+
+def _closes(seed: int, ticker: str, sector: str, n_days: int) -> np.ndarray:
+    rng = _rng(seed, ticker)
+    beta = rng.uniform(0.6, 1.4)
+    log_returns = (
+        beta * _factor(seed, MARKET, n_days, 0.010, 0.0003)
+        + _factor(seed, sector, n_days, 0.006)
+        + rng.standard_normal(n_days) * rng.uniform(0.005, 0.02)
+    )
+    return 100 * np.exp(np.cumsum(log_returns))
+
+
+def synthetic_prices(n_tickers: int = 10, n_days: int = 756, n_sectors: int = 10, seed: int = 0, end=None):
+    """
+    Returns (prices, market_prices): DataFrame (days x tickers) and the
+    market Series, shaped like split_universe_prices' output.
+    """
+    dates = _trading_days(n_days, end)
+    tickers = ticker_names(n_tickers)
+
+    prices = pd.DataFrame(
+        np.column_stack([_closes(seed, t, sector_of(t, n_sectors), n_days) for t in tickers]),
+        index=dates, columns=tickers,
+    )
+    market = pd.Series(100 * np.exp(np.cumsum(_factor(seed, MARKET, n_days, 0.010, 0.0003))),
+                       index=dates, name="Close")
+    return prices, market
+
+
+class SyntheticProvider:
+    """
+    Price provider (same interface as data/providers.py) serving synthetic
+    closes for any ticker, ending today so that period-based loads work.
+    """
+
+    def __init__(self, n_days: int = 756, n_sectors: int = 10, seed: int = 0):
+        self.n_days = n_days
+        self.n_sectors = n_sectors
+        self.seed = seed
+
+    def fetch(self, ticker: str, period: str = None, start=None) -> pd.Series:
+        dates = _trading_days(self.n_days)
+        if ticker == MARKET:
+            values = 100 * np.exp(np.cumsum(_factor(self.seed, MARKET, self.n_days, 0.010, 0.0003)))
+        else:
+            values = _closes(self.seed, ticker, sector_of(ticker, self.n_sectors), self.n_days)
+        series = pd.Series(values, index=dates, name="Close")
+
+        if start is not None:
+            return series[series.index >= pd.Timestamp(start)]
+        if period is not None:
+            return series[series.index >= period_start(period, dates[-1])]
+        return series
+
+
+def write_universe(path: str, n_tickers: int, n_sectors: int = 10, dtype: str = "float64") -> str:
+    """
+    Universe file (see utils/universe.py) with n_tickers synthetic members.
+    With n_tickers == n_sectors every sector is a single ticker, like the
+    sector ETF universe.
+    """
+    tickers = ticker_names(n_tickers)
+    if n_tickers == n_sectors:
+        members = [{"ticker": t, "sector": f"Sector{i:02d}"} for i, t in enumerate(tickers)]
+    else:
+        members = [{"ticker": t, "sector": sector_of(t, n_sectors)} for t in tickers]
+
+    with open(path, "w") as f:
+        json.dump({"name": f"synthetic-{n_tickers}", "market": MARKET, "dtype": dtype, "members": members}, f)
+    return path
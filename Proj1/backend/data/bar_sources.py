@@ -0,0 +1,82 @@
+import asyncio
+import pandas as pd
+
+# -----------------------------
+# Intraday bar sources
+# -----------------------------
+# A bar source feeds the live mode (services/live.py) with price updates.
+# Any object with an async bars() iterator of Bar works; sources only know
+# how to produce bars, the live engine does the analysis.
+#
+# Bars carry the latest price of the symbols that traded: universe tickers
+# (and the market ticker), or group names directly.
+
+
+class Bar:
+    def __init__(self, timestamp, prices: dict):
+        """
+        timestamp: when the bar closed
+        prices: symbol -> last price; symbols without an update are left out
+        """
+        self.timestamp = pd.Timestamp(timestamp)
+        self.prices = prices
+
+    def __repr__(self):
+        return f"Bar({self.timestamp}, {len(self.prices)} symbols)"
+
+
+class ReplayBarSource:
+    """
+    Replays bars from a CSV file, for testing and demos. Either layout works:
+      long: timestamp,symbol,price (one row per symbol per bar)
+      wide: timestamp,<symbol>,<symbol>,... (one row per bar, empty = no update)
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, sleep=asyncio.sleep):
+        """
+        speed: replay speed-up over the recorded timestamps (60 = a minute per
+               second); 0 replays as fast as the consumer reads. Only bars
+               of the same day are paced: the next day starts right away.
+        sleep: async sleep used for pacing (injectable for tests)
+        """
+        self.path = path
+        self.speed = speed
+        self.sleep = sleep
+
+    def read(self) -> list:
+        """
+        All bars of the file, in timestamp order.
+        """
+        df = pd.read_csv(self.path)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+
+        if {"symbol", "price"} <= set(df.columns):
+            wide = df.pivot_table(index="timestamp", columns="symbol", values="price", aggfunc="last")
+        else:
+            wide = df.set_index("timestamp").sort_index()
+
+        symbols = wide.columns.astype(str).tolist()
+        bars = []
+        for timestamp, row in zip(wide.index, wide.to_numpy(dtype="float64")):
+            prices = {s: float(p) for s, p in zip(symbols, row) if p == p}
+            if prices:
+                bars.append(Bar(timestamp, prices))
+        return bars
+
+    async def bars(self):
+        previous = None
+        for bar in self.read():
+            if previous is not None and self.speed > 0 and bar.timestamp.normalize() == previous.normalize():
+                await self.sleep(max(0.0, (bar.timestamp - previous).total_seconds()) / self.speed)
+            previous = bar.timestamp
+            yield bar
+
+
+def get_bar_source(spec: str, speed: float = 1.0):
+    """
+    Build a bar source from its config string: "replay:<path to csv>".
+    """
+    kind, _, target = spec.partition(":")
+    if kind == "replay" and target:
+        return ReplayBarSource(target, speed)
+    raise ValueError(f"Unknown bar source: {spec!r}")
@@ -1,51 +1,98 @@
 import pandas as pd
-import yfinance as yf
-SECTORS = {
-    "Technology": "XLK",
-    "Financials": "XLF",
-    "Energy": "XLE",
-    "Healthcare": "XLV",
-    "ConsumerDiscretionary": "XLY",
-    "ConsumerStaples": "XLP",
-    "Industrials": "XLI",
-    "Materials": "XLB",
-    "Utilities": "XLU",
-    "RealEstate": "XLRE"
-}
-
-MARKET_TICKER = "SPY"
+from data.fetcher import FetchReport
+from data.price_store import PriceStore
+from data.providers import get_provider
+from utils.config import (
+    UNIVERSE, UNIVERSE_LEVEL, PRICE_STORE_DIR, PRICE_MAX_AGE_SECONDS, PRICE_REFRESH_OVERLAP_DAYS, PRICE_PROVIDER,
+    FIXTURE_DIR, FETCH_OPTIONS
+)
+from utils.metrics import stage
+from utils.universe import Universe, load_universe
 
-def get_sector_prices(period="6mo"):
-    data = {}
+_store = None
+
+
+def get_price_store() -> PriceStore:
+    """
+    Shared on-disk price store, created on first use from utils/config.
+    """
+    global _store
+    if _store is None:
+        provider = get_provider(PRICE_PROVIDER, FIXTURE_DIR)
+        _store = PriceStore(PRICE_STORE_DIR, provider, max_age_seconds=PRICE_MAX_AGE_SECONDS,
+                            fetch_options=FETCH_OPTIONS, overlap_days=PRICE_REFRESH_OVERLAP_DAYS)
+    return _store
+
+
+def set_price_provider(provider, root: str = PRICE_STORE_DIR):
+    """
+    Swap the fetch backend (e.g. a FixtureProvider for offline use).
+    """
+    global _store
+    _store = PriceStore(root, provider, max_age_seconds=PRICE_MAX_AGE_SECONDS,
+                        fetch_options=FETCH_OPTIONS, overlap_days=PRICE_REFRESH_OVERLAP_DAYS)
+    return _store
+
+
+def get_universe() -> Universe:
+    """
+    The configured universe (see utils/universes/).
+    """
+    return load_universe(UNIVERSE)
+
+
+def get_universe_prices(period="6mo", universe: Universe = None, level: str = UNIVERSE_LEVEL) -> FetchReport:
+    """
+    Universe members and market in one fetch.
+    report.prices has one column per group at `level` (members aggregated by
+    Universe.aggregate) plus the market ticker,
+    report.failures lists the tickers that could not be refreshed.
+    """
+    universe = universe or get_universe()
+    report = get_price_store().load(universe.tickers + [universe.market], period)
 
-    for sector, ticker in SECTORS.items():
-        df = yf.download(ticker, period=period, progress=False, auto_adjust=True)
+    market = report.series.pop(universe.market, None)
+    with stage("aggregate"):
+        report.series = universe.aggregate(report.series, level)
+    if market is not None:
+        report.series[universe.market] = market
 
-        # Safety check
-        if df.empty:
-            print(f"⚠️ No data for {sector} ({ticker}), skipping.")
-            continue
+    return report
 
-        if "Close" in df.columns:
-            series = df["Close"]
-        # FORCE single-level columns
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
-        series = df["Close"].dropna()
-        data[sector] = series
 
-    sector_prices = pd.concat(data, axis=1)
+def split_universe_prices(prices: pd.DataFrame, market_ticker: str = None):
+    """
+    Split a universe frame into (sector_prices, market_prices).
+    market_ticker: defaults to the configured universe's market
+    """
+    market_ticker = market_ticker or get_universe().market
+
+    sector_prices = prices[[c for c in prices.columns if c != market_ticker]]
+    sector_prices.index.name = "Date"
+
+    market_prices = prices[market_ticker].dropna()
+    market_prices.index.name = "Date"
+    market_prices.name = "Close"
+
+    return sector_prices, market_prices
+
+
+def get_sector_prices(period="6mo"):
+    universe = get_universe()
+    report = get_universe_prices(period, universe)
+    report.series.pop(universe.market, None)
+
+    sector_prices = report.prices
     sector_prices.index.name = "Date"
 
     return sector_prices
 
 def get_market_prices(period="6mo"):
-    df = yf.download(MARKET_TICKER, period=period, progress=False, auto_adjust=True)
-
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
+    market_ticker = get_universe().market
+    prices = get_price_store().load_prices([market_ticker], period)
 
-    prices = df["Close"].dropna()
+    prices = prices[market_ticker].dropna()
     prices.index.name = "Date"
+    prices.name = "Close"
 
-    return prices
\ No newline at end of file
+    return prices
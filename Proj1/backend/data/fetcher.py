@@ -0,0 +1,156 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Universe fetch layer
+# -----------------------------
+# Pulls every ticker of the universe in one go: a single batched provider
+# call when the provider supports it, then a bounded thread pool with
+# per-ticker retry/timeout for anything the batch did not return (including
+# empty series). Only a per-ticker fetch can confirm an incremental request
+# (start given) legitimately has no bars.
+
+
+class FetchFailure:
+    def __init__(self, ticker: str, error: str, attempts: int):
+        self.ticker = ticker
+        self.error = error
+        self.attempts = attempts
+
+    def to_dict(self) -> dict:
+        return {"ticker": self.ticker, "error": self.error, "attempts": self.attempts}
+
+    def __repr__(self):
+        return f"FetchFailure({self.ticker!r}, {self.error!r}, attempts={self.attempts})"
+
+
+class FetchReport:
+    def __init__(self, series: Dict[str, pd.Series], failures: List[FetchFailure]):
+        # ticker -> Series of closes (only successful tickers)
+        self.series = series
+        self.failures = failures
+
+    @property
+    def prices(self) -> pd.DataFrame:
+        """
+        Aligned wide frame (dates x tickers) of everything that was fetched.
+        """
+        if not self.series:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"))
+        # Own the data: store-backed series are read-only memory maps
+        prices = pd.concat(self.series, axis=1).sort_index().copy()
+        prices.index.name = "Date"
+        return prices
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+
+def fetch_universe(provider, tickers, period: str = None, start=None,
+                   max_workers: int = 8, retries: int = 2, timeout: float = 30.0,
+                   backoff: float = 0.5, batch: bool = True) -> FetchReport:
+    """
+    Fetch closes for all `tickers` from `provider`.
+
+    provider: object with fetch(ticker, period=None, start=None) -> Series and,
+              optionally, fetch_many(tickers, period=None, start=None) -> dict
+    retries: extra attempts per ticker after the first one
+    timeout: seconds allowed per attempt
+    """
+    tickers = list(dict.fromkeys(tickers))
+    series = {}
+
+    # 1. One batched request for the whole universe
+    if batch and len(tickers) > 1 and hasattr(provider, "fetch_many"):
+        try:
+            fetched = provider.fetch_many(tickers, period=period, start=start)
+            # An empty series in a batch can be a per-ticker failure as well as
+            # "no new bars": those tickers are asked again on their own below
+            series.update({t: s for t, s in fetched.items() if s is not None and len(s)})
+        except Exception as exc:
+            logger.warning("Batched fetch failed, falling back to per-ticker: %s", exc)
+
+    # 2. Per-ticker pool for whatever is still missing
+    remaining = [t for t in tickers if t not in series]
+    failures = []
+    if remaining:
+        fetched, failures = _fetch_each(provider, remaining, period, start,
+                                        max_workers, retries, timeout, backoff)
+        series.update(fetched)
+
+    for failure in failures:
+        logger.warning("No data for %s after %d attempt(s): %s",
+                       failure.ticker, failure.attempts, failure.error)
+
+    return FetchReport({t: series[t] for t in tickers if t in series}, failures)
+
+
+def _fetch_each(provider, tickers, period, start, max_workers, retries, timeout, backoff):
+    fetched = {}
+    failures = []
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers))))
+    # future -> (ticker, attempt number, holder with the attempt's start time)
+    pending = {}
+
+    def run(holder, ticker, delay):
+        # Back off on the worker so the loop keeps collecting other tickers
+        if delay:
+            time.sleep(delay)
+        holder["started"] = time.monotonic()
+        return provider.fetch(ticker, period=period, start=start)
+
+    def submit(ticker, attempt, delay=0.0):
+        holder = {"started": None}
+        pending[pool.submit(run, holder, ticker, delay)] = (ticker, attempt, holder)
+
+    def deadline(holder):
+        # Time spent queued behind other tickers or backing off does not count
+        started = holder["started"]
+        return float("inf") if started is None else started + timeout
+
+    def retry_or_fail(ticker, attempt, error):
+        if attempt <= retries:
+            submit(ticker, attempt + 1, backoff * attempt)
+        else:
+            failures.append(FetchFailure(ticker, error, attempt))
+
+    try:
+        for ticker in tickers:
+            submit(ticker, 1)
+
+        while pending:
+            next_deadline = min(deadline(holder) for _, _, holder in pending.values())
+            wait_for = 0.05 if next_deadline == float("inf") else max(0.0, next_deadline - time.monotonic())
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                ticker, attempt, _ = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    retry_or_fail(ticker, attempt, f"{type(exc).__name__}: {exc}")
+                    continue
+
+                if result is None or (not len(result) and start is None):
+                    retry_or_fail(ticker, attempt, "empty response")
+                else:
+                    fetched[ticker] = result
+
+            # Abandon attempts that ran past their deadline
+            now = time.monotonic()
+            for future, (ticker, attempt, holder) in list(pending.items()):
+                if deadline(holder) <= now and not future.done():
+                    future.cancel()
+                    del pending[future]
+                    retry_or_fail(ticker, attempt, f"timed out after {timeout}s")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return fetched, failures
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from data.fetcher import FetchReport, fetch_universe
+from data.providers import period_start
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Local price store
+# -----------------------------
+# One .npy file per ticker holding a record array (date as datetime64[D],
+# close as float64) plus a small JSON metadata file. Reads are memory-mapped,
+# so callers get views into the page cache instead of fresh copies. Dates and
+# closes live in one file so a single rename publishes both (.npz archives
+# cannot be memory-mapped).
+#
+# Refreshes ask the provider for the last `overlap_days` again on top of the
+# missing bars (see data/fetcher.py) and overwrite them: a partial bar for the
+# current session gets its final close on the next refresh. If the provider
+# returns different closes for finalized days it has re-adjusted the history
+# (dividend, split), and the ticker is fetched again in full.
+
+BAR_DTYPE = np.dtype([("date", "datetime64[D]"), ("close", "float64")])
+
+# Relative change of a finalized close that counts as a re-adjustment
+ADJUSTMENT_TOLERANCE = 1e-6
+
+
+class PriceStore:
+    def __init__(self, root: str, provider, max_age_seconds: float = 3600, fetch_options: dict = None,
+                 overlap_days: int = 7):
+        """
+        root: directory holding the store files
+        provider: object with fetch(ticker, period=None, start=None) -> Series
+        max_age_seconds: how long a refreshed ticker is considered fresh
+        fetch_options: extra keyword arguments for fetch_universe
+                       (max_workers, retries, timeout, ...)
+        overlap_days: calendar days before the last stored bar fetched again
+                      (and overwritten) on every incremental refresh
+        """
+        self.root = root
+        self.provider = provider
+        self.max_age_seconds = max_age_seconds
+        self.overlap_days = overlap_days
+        self.fetch_options = fetch_options or {}
+        os.makedirs(root, exist_ok=True)
+
+    # -----------------------------
+    # Paths / metadata
+    # -----------------------------
+
+    def _path(self, ticker: str, kind: str) -> str:
+        return os.path.join(self.root, f"{ticker}.{kind}")
+
+    def _read_meta(self, ticker: str) -> dict:
+        path = self._path(ticker, "json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _publish(self, ticker: str, kind: str, write):
+        """
+        Write a file under a unique temporary name, then rename it into place:
+        readers see the old or the new file, never a partial one, and
+        concurrent writers never share a temporary file.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{ticker}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, self._path(ticker, kind))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _write_meta(self, ticker: str, meta: dict):
+        self._publish(ticker, "json", lambda f: f.write(json.dumps(meta).encode()))
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+
+    def read(self, ticker: str):
+        """
+        Returns (dates, closes) as read-only memory-mapped arrays.
+        Both are empty if the ticker has never been stored.
+        """
+        try:
+            bars = np.load(self._path(ticker, "npy"), mmap_mode="r")
+        except FileNotFoundError:
+            bars = np.empty(0, dtype=BAR_DTYPE)
+        return bars["date"], bars["close"]
+
+    def series(self, ticker: str, start=None) -> pd.Series:
+        """
+        Close prices as a Series backed by the memory-mapped array (no copy).
+        """
+        dates, closes = self.read(ticker)
+
+        if start is not None and len(dates):
+            first = np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date(), "D"))
+            dates, closes = dates[first:], closes[first:]
+
+        index = pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="Date")
+        return pd.Series(closes, index=index, name="Close", copy=False)
+
+    def last_date(self, ticker: str):
+        dates, _ = self.read(ticker)
+        return pd.Timestamp(dates[-1]) if len(dates) else None
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+
+    def append(self, ticker: str, new_bars: pd.Series, replace: bool = False) -> int:
+        """
+        Merge bars into the stored series; bars on stored dates overwrite them.
+        replace: drop the stored bars first (full refetch)
+        The file is replaced atomically so open memory maps stay valid.
+        Returns the number of bars appended after the previous last date.
+        """
+        new_bars = new_bars.dropna().sort_index()
+        new_bars = new_bars[~new_bars.index.duplicated(keep="last")]
+        new_dates = new_bars.index.values.astype("datetime64[D]")
+        new_closes = new_bars.to_numpy(dtype="float64")
+        if not len(new_dates):
+            return 0
+
+        dates, closes = self.read(ticker)
+        if replace:
+            dates, closes = dates[:0], closes[:0]
+        appended = int(np.sum(new_dates > dates[-1])) if len(dates) else len(new_dates)
+
+        kept = ~np.isin(dates, new_dates)
+        bars = np.empty(int(kept.sum()) + len(new_dates), dtype=BAR_DTYPE)
+        bars["date"] = np.concatenate([dates[kept], new_dates])
+        bars["close"] = np.concatenate([closes[kept], new_closes])
+        bars = bars[np.argsort(bars["date"], kind="stable")]
+
+        self._publish(ticker, "npy", lambda f: np.save(f, bars))
+        return appended
+
+    def _readjusted(self, ticker: str, bars: pd.Series) -> bool:
+        """
+        True when fetched bars change the close of a finalized stored day
+        (any day before the last stored one, which may have been partial).
+        """
+        dates, closes = self.read(ticker)
+        if len(dates) < 2 or not len(bars):
+            return False
+        bars = bars.dropna()
+        fetched_dates = bars.index.values.astype("datetime64[D]")
+        finalized = fetched_dates < dates[-1]
+        positions = np.searchsorted(dates, fetched_dates[finalized])
+        positions = np.minimum(positions, len(dates) - 1)
+        found = dates[positions] == fetched_dates[finalized]
+        stored = closes[positions[found]]
+        fetched = bars.to_numpy(dtype="float64")[finalized][found]
+        return bool(np.any(np.abs(fetched - stored) > ADJUSTMENT_TOLERANCE * np.abs(stored)))
+
+    def refresh(self, ticker: str, period: str = "6mo", force: bool = False):
+        """
+        Bring one ticker up to date, fetching only what is missing.
+        """
+        return self.refresh_many([ticker], period, force)
+
+    def refresh_many(self, tickers, period: str = "6mo", force: bool = False):
+        """
+        Bring several tickers up to date with one universe fetch per kind of
+        request (full history vs. the stored tail and the bars after it).
+        Returns the list of FetchFailure for tickers that could not be refreshed;
+        their previously stored bars are still served.
+        """
+        now = time.time()
+        wanted_from = period_start(period)
+
+        full, incremental = [], {}
+        metas = {}
+        for ticker in tickers:
+            meta = self._read_meta(ticker)
+            metas[ticker] = meta
+
+            covered_from = pd.Timestamp(meta["covered_from"]) if "covered_from" in meta else None
+            last = self.last_date(ticker)
+            if covered_from is None or wanted_from < covered_from or last is None:
+                # History does not reach back far enough: fetch the whole period
+                full.append(ticker)
+            elif force or now - meta.get("refreshed_at", 0) >= self.max_age_seconds:
+                incremental[ticker] = last
+
+        failures = []
+
+        if incremental:
+            # Overlap the stored tail so partial and re-adjusted bars get replaced
+            start = min(incremental.values()) - pd.Timedelta(days=self.overlap_days)
+            with stage("download"):
+                report = fetch_universe(self.provider, list(incremental), start=start, **self.fetch_options)
+            failures.extend(report.failures)
+            for ticker, bars in report.series.items():
+                if self._readjusted(ticker, bars):
+                    logger.info("%s history was re-adjusted, fetching it again", ticker)
+                    full.append(ticker)
+                    continue
+                if len(bars):
+                    self.append(ticker, bars)
+                metas[ticker]["refreshed_at"] = now
+                self._write_meta(ticker, metas[ticker])
+
+        if full:
+            with stage("download"):
+                report = fetch_universe(self.provider, full, period=period, **self.fetch_options)
+            failures.extend(report.failures)
+            for ticker, bars in report.series.items():
+                self.append(ticker, bars, replace=True)
+                metas[ticker]["covered_from"] = str(wanted_from.date())
+                metas[ticker]["refreshed_at"] = now
+                self._write_meta(ticker, metas[ticker])
+
+        return failures
+
+    # -----------------------------
+    # Wide frames
+    # -----------------------------
+
+    def load(self, tickers, period: str = "6mo") -> FetchReport:
+        """
+        Refresh stale tickers and return their stored closes covering `period`
+        together with any refresh failures.
+        """
+        failures = self.refresh_many(tickers, period)
+        start = period_start(period)
+
+        series = {}
+        with stage("store_read"):
+            for ticker in tickers:
+                stored = self.series(ticker, start=start)
+                if len(stored):
+                    series[ticker] = stored
+
+        return FetchReport(series, failures)
+
+    def load_prices(self, tickers, period: str = "6mo") -> pd.DataFrame:
+        """
+        Wide frame (dates x tickers) covering `period`.
+        """
+        return self.load(tickers, period).prices
@@ -0,0 +1,129 @@
+import os
+import pandas as pd
+
+# -----------------------------
+# Price providers
+# -----------------------------
+# A provider knows how to fetch daily close prices for a single ticker.
+# The price store only talks to this interface, so yfinance can be swapped
+# for local fixture files when running offline.
+
+
+class YFinanceProvider:
+    """
+    Fetches adjusted daily closes from Yahoo Finance.
+    """
+
+    def fetch(self, ticker: str, period: str = None, start=None) -> pd.Series:
+        """
+        Either `period` (e.g. "6mo") or `start` (first date to include) is used.
+        Returns a Series of closes indexed by date (may be empty).
+        """
+        import yfinance as yf
+
+        if start is not None:
+            df = yf.download(ticker, start=pd.Timestamp(start).strftime("%Y-%m-%d"),
+                             progress=False, auto_adjust=True)
+        else:
+            df = yf.download(ticker, period=period, progress=False, auto_adjust=True)
+
+        return _close_series(df)
+
+    def fetch_many(self, tickers, period: str = None, start=None, timeout: float = 30) -> dict:
+        """
+        One batched download for several tickers.
+        Returns ticker -> Series of closes (empty for tickers with no data).
+        """
+        import yfinance as yf
+
+        kwargs = {"progress": False, "auto_adjust": True, "group_by": "column",
+                  "threads": True, "timeout": timeout}
+        if start is not None:
+            kwargs["start"] = pd.Timestamp(start).strftime("%Y-%m-%d")
+        else:
+            kwargs["period"] = period
+
+        df = yf.download(list(tickers), **kwargs)
+        if df.empty:
+            return {ticker: pd.Series(dtype="float64", name="Close") for ticker in tickers}
+
+        closes = df["Close"]
+        return {
+            ticker: _close_series(closes[[ticker]].rename(columns={ticker: "Close"}))
+            if ticker in closes.columns else pd.Series(dtype="float64", name="Close")
+            for ticker in tickers
+        }
+
+
+class FixtureProvider:
+    """
+    Reads closes from local CSV files: <fixture_dir>/<TICKER>.csv
+    with a 'Date' column and a 'Close' column.
+    """
+
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+
+    def fetch(self, ticker: str, period: str = None, start=None) -> pd.Series:
+        path = os.path.join(self.fixture_dir, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return pd.Series(dtype="float64", name="Close")
+
+        df = pd.read_csv(path, index_col="Date", parse_dates=True)
+        series = _close_series(df)
+
+        if start is not None:
+            series = series[series.index >= pd.Timestamp(start)]
+        elif period is not None and len(series):
+            series = series[series.index >= period_start(period, series.index[-1])]
+
+        return series
+
+
+def _close_series(df: pd.DataFrame) -> pd.Series:
+    """
+    Extract a clean 'Close' Series from a downloaded/loaded price frame.
+    """
+    if df.empty:
+        return pd.Series(dtype="float64", name="Close")
+
+    # FORCE single-level columns
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+
+    series = df["Close"].dropna().astype("float64")
+    series.index = pd.DatetimeIndex(series.index).tz_localize(None).normalize()
+    series.index.name = "Date"
+    series.name = "Close"
+    return series
+
+
+def period_start(period: str, end=None) -> pd.Timestamp:
+    """
+    Convert a yfinance-style period ("5d", "6mo", "1y", "ytd", "max")
+    into the first date it covers, counting back from `end` (default today).
+    """
+    end = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end).normalize()
+
+    if period == "max":
+        return pd.Timestamp("1900-01-01")
+    if period == "ytd":
+        return pd.Timestamp(year=end.year, month=1, day=1)
+
+    units = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return end - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def get_provider(name: str, fixture_dir: str = None):
+    """
+    Build a provider from its config name ("yfinance" or "fixture").
+    """
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "fixture":
+        return FixtureProvider(fixture_dir)
+    raise ValueError(f"Unknown price provider: {name}")
@@ -1,4 +1,5 @@
 import pandas as pd
+from features.rolling_covariance import build_rolling_covariance
 
 
 def compute_returns(prices, window):
@@ -35,11 +36,13 @@ def compute_relative_strength(sector_prices, market_prices, window=30):
     return relative_strength
 
 
-def build_feature_matrix(sector_prices, market_prices):
+def build_feature_matrix(sector_prices, market_prices, correlation=False):
     """
     Returns a DataFrame where:
     rows = sectors
     columns = features
+    correlation: also add beta (vs. market) and avg_correlation (with the
+                 other sectors) over the short window
     """
 
     # Dynamically choose windows based on available data
@@ -60,11 +63,31 @@ def build_feature_matrix(sector_prices, market_prices):
         "rel_strength": rel_str
     })
 
+    if correlation and w1 >= 2:
+        # Only the latest window is needed
+        cov = build_rolling_covariance(sector_prices, market_prices, w1, start=sector_prices.index[-1])
+        if len(cov):
+            features["beta"] = cov.market_beta().iloc[-1]
+            features["avg_correlation"] = cov.mean_correlation().iloc[-1]
+
     # Only drop rows where ALL values are NaN
     features = features.dropna(how="all")
 
     return features
 
+def build_cluster_features(sector_prices, market_prices, window=30):
+    """
+    Latest-date features used by the /clusters endpoint:
+    rows = sectors, columns = ret_short, rel_strength, volatility
+    """
+    sector_ret = sector_prices.pct_change(window).iloc[-1]
+
+    return pd.DataFrame({
+        "ret_short": sector_ret,  # 30-day return
+        "rel_strength": sector_ret - market_prices.pct_change(window).iloc[-1],
+        "volatility": sector_prices.pct_change().rolling(window).std().iloc[-1],
+    })
+
 def standardize_features(feature_matrix):
     """
     Standardizes the feature matrix (z-score normalization)
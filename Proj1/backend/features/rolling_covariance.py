@@ -0,0 +1,182 @@
+import math
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Rolling covariance engine
+# -----------------------------
+# Rolling sector-to-sector and sector-to-market covariances of daily returns,
+# for every date, from windowed sums of returns and of their cross products:
+#   cov_ij = (sum x_i x_j - sum x_i sum x_j / w) / (w - 1)
+# The sums come from cumulative sums over blocks of dates, so one vectorized
+# pass replaces a per-date pandas rolling().cov(). Returns are centered by
+# their full-history mean first (covariance is shift invariant) to keep the
+# differences of cumulative sums accurate.
+#
+# Window ending on date t covers the `window` daily returns up to and
+# including t, like returns.rolling(window).cov(); a window holding a missing
+# return is NaN for that name, as with pandas' default min_periods.
+
+MARKET_NAME = "market"
+
+
+class RollingCovariance:
+    def __init__(self, dates: pd.DatetimeIndex, names: pd.Index, cov: np.ndarray, window: int, n_sectors: int):
+        """
+        dates: window end dates (one per matrix)
+        names: sectors, then the market when it was given
+        cov: float32 array (dates x names x names)
+        n_sectors: leading names that are sectors
+        """
+        self.dates = dates
+        self.names = names
+        self.cov = cov
+        self.window = window
+        self.n_sectors = n_sectors
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def has_market(self) -> bool:
+        return len(self.names) > self.n_sectors
+
+    def correlation(self) -> np.ndarray:
+        """
+        Correlation tensor (dates x names x names), float32.
+        """
+        std = np.sqrt(np.diagonal(self.cov, axis1=1, axis2=2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.cov / (std[:, :, None] * std[:, None, :])
+        return np.clip(corr, -1.0, 1.0)
+
+    def betas(self) -> np.ndarray:
+        """
+        Beta of each row name on each column name (dates x names x names),
+        float32: cov_ij / var_j.
+        """
+        var = np.diagonal(self.cov, axis1=1, axis2=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.cov / var[:, None, :]
+
+    def market_beta(self) -> pd.DataFrame:
+        """
+        Beta of every sector on the market (dates x sectors).
+        """
+        if not self.has_market:
+            raise ValueError("Covariances were computed without market prices")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta = self.cov[:, :self.n_sectors, -1] / self.cov[:, -1, -1][:, None]
+        return pd.DataFrame(beta, index=self.dates, columns=self.names[:self.n_sectors])
+
+    def mean_correlation(self) -> pd.DataFrame:
+        """
+        Average correlation of every sector with the other sectors (dates x sectors).
+        """
+        corr = self.correlation()[:, :self.n_sectors, :self.n_sectors].astype("float64")
+        valid = ~np.isnan(corr) & ~np.eye(self.n_sectors, dtype=bool)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, corr, 0.0).sum(axis=2) / valid.sum(axis=2)
+        return pd.DataFrame(mean, index=self.dates, columns=self.names[:self.n_sectors])
+
+    def position(self, as_of=None) -> int:
+        """
+        Index of the last window ending on or before as_of (the latest when
+        None); -1 when there is none.
+        """
+        if as_of is None:
+            return len(self) - 1
+        return int(self.dates.searchsorted(pd.Timestamp(as_of), side="right")) - 1
+
+    def frame(self, k: int, kind: str = "corr") -> pd.DataFrame:
+        """
+        Matrix of window k (names x names). kind: "corr", "cov" or "beta".
+        """
+        if kind == "corr":
+            values = self.correlation()[k]
+        elif kind == "cov":
+            values = self.cov[k]
+        elif kind == "beta":
+            values = self.betas()[k]
+        else:
+            raise ValueError(f"Unknown kind {kind!r}; expected corr, cov or beta")
+        return pd.DataFrame(values, index=self.names, columns=self.names)
+
+
+def build_rolling_covariance(sector_prices: pd.DataFrame, market_prices: pd.Series = None, window: int = 30,
+                             start=None, end=None, chunk_size: int = None,
+                             market_name: str = MARKET_NAME) -> RollingCovariance:
+    """
+    sector_prices: DataFrame (dates x sectors)
+    market_prices: Series (dates), appended as the last name (market_name) when given
+    window: daily returns per window (at least 2)
+    start / end: only windows ending in [start, end]
+    chunk_size: windows per block; None sizes blocks to a few million cells
+                (large universes are also tiled over pairs of name blocks)
+    Returns a RollingCovariance with one matrix per window end.
+    """
+    if window < 2:
+        raise ValueError("window must be at least 2")
+
+    names = pd.Index(sector_prices.columns)
+    prices = sector_prices.to_numpy(dtype="float64")
+    if market_prices is not None:
+        market = market_prices.reindex(sector_prices.index).to_numpy(dtype="float64")
+        prices = np.column_stack([prices, market])
+        names = names.append(pd.Index([market_name]))
+    n_names = len(names)
+
+    # 1. Centered daily returns, 0 where missing
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = prices[1:] / prices[:-1] - 1
+    return_dates = sector_prices.index[1:]
+    missing = np.isnan(returns)
+    counts = np.maximum((~missing).sum(axis=0), 1)
+    filled = np.where(missing, 0.0, returns)
+    centered = np.where(missing, 0.0, filled - filled.sum(axis=0) / counts)
+
+    # 2. Window ends (rows of `returns`) inside [start, end]
+    ends = np.arange(window - 1, len(returns))
+    if start is not None:
+        ends = ends[return_dates[ends] >= pd.Timestamp(start)]
+    if end is not None:
+        ends = ends[return_dates[ends] <= pd.Timestamp(end)]
+
+    cov = np.full((len(ends), n_names, n_names), np.nan, dtype="float32")
+
+    # Cross products are (rows x names x names): tile the names so one tile of
+    # at least 2 * window rows fits in a few million cells
+    budget = 4_000_000
+    name_block = n_names if n_names ** 2 * 2 * window <= budget else max(1, math.isqrt(budget // (2 * window)))
+    if chunk_size is None:
+        chunk_size = max(window, budget // name_block ** 2 - window)
+    tiles = [slice(lo, min(lo + name_block, n_names)) for lo in range(0, n_names, name_block)]
+
+    # 3. Blocks of consecutive window ends: cumulative sums over the rows they
+    #    cover, differenced `window` rows apart
+    for lo in range(0, len(ends), chunk_size):
+        block = ends[lo:lo + chunk_size]
+        first = block[0] - window + 1
+        rows = centered[first:block[-1] + 1]
+        zeros = np.zeros((1, n_names))
+
+        hi = block - first + 1
+        csum = np.concatenate([zeros, np.cumsum(rows, axis=0)])
+        cmissing = np.concatenate([zeros, np.cumsum(missing[first:block[-1] + 1], axis=0)])
+        s = csum[hi] - csum[hi - window]
+        incomplete = (cmissing[hi] - cmissing[hi - window]) > 0
+
+        # Upper triangle of name tiles; the lower one is its transpose
+        for a, ti in enumerate(tiles):
+            for tj in tiles[a:]:
+                cprod = np.concatenate([np.zeros((1, ti.stop - ti.start, tj.stop - tj.start)),
+                                        np.cumsum(rows[:, ti, None] * rows[:, None, tj], axis=0)])
+                sxy = cprod[hi] - cprod[hi - window]
+                tile_cov = (sxy - s[:, ti, None] * s[:, None, tj] / window) / (window - 1)
+                tile_cov[incomplete[:, ti, None] | incomplete[:, None, tj]] = np.nan
+
+                cov[lo:lo + len(block), ti, tj] = tile_cov
+                if ti != tj:
+                    cov[lo:lo + len(block), tj, ti] = tile_cov.transpose(0, 2, 1)
+
+    return RollingCovariance(return_dates[ends], names, cov, window, sector_prices.shape[1])
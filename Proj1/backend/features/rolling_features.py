@@ -0,0 +1,369 @@
+import copy
+import numpy as np
+import pandas as pd
+from features.rolling_covariance import build_rolling_covariance
+
+# -----------------------------
+# Rolling-window feature engine
+# -----------------------------
+# Computes the same four features as build_feature_matrix, but for every
+# window end at once. Window k covers rows [k, k + window_size) of the price
+# history and is labelled with the date right after it (dates[k + window_size]),
+# matching how build_rotation_frames and SectorRotationModel slice windows.
+
+FEATURE_NAMES = ["ret_short", "ret_medium", "volatility", "rel_strength"]
+# Optional (correlation=True): beta on the market and average correlation with
+# the other sectors over the short lookback, as build_feature_matrix(correlation=True)
+CORRELATION_FEATURES = ["beta", "avg_correlation"]
+
+
+class RollingFeatures:
+    def __init__(self, dates: pd.DatetimeIndex, sectors: pd.Index, values: np.ndarray, window_size: int,
+                 feature_names=None):
+        """
+        dates: window end labels (one per window)
+        sectors: sector names
+        values: array (windows x sectors x features), features in feature_names order
+        feature_names: FEATURE_NAMES (default), then CORRELATION_FEATURES when computed
+        """
+        self.dates = dates
+        self.sectors = sectors
+        self.values = values
+        self.window_size = window_size
+        self.feature_names = list(feature_names or FEATURE_NAMES)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def frame(self, k: int) -> pd.DataFrame:
+        """
+        Feature matrix for window k, shaped like build_feature_matrix's output
+        (rows = sectors, columns = features).
+        """
+        features = pd.DataFrame(self.values[k], index=self.sectors, columns=self.feature_names)
+
+        # Only drop rows where ALL values are NaN
+        return features.dropna(how="all")
+
+
+def _window_returns(prices: np.ndarray, ends: np.ndarray, lag: int) -> np.ndarray:
+    """
+    pct_change(lag) evaluated at each row in `ends`.
+    """
+    return prices[ends] / prices[ends - lag] - 1
+
+
+def _market_returns(market: np.ndarray, ends: np.ndarray, w1: int, window_size: int) -> np.ndarray:
+    """
+    Market return of each window, ffilled like compute_relative_strength
+    does: from the latest row inside the same window that has one, else NaN.
+    """
+    market_ret = _window_returns(market, ends, w1)
+    for lag in range(1, window_size - w1):
+        missing = np.isnan(market_ret)
+        if not missing.any():
+            break
+        market_ret[missing] = _window_returns(market, ends[missing] - lag, w1)
+    return market_ret
+
+
+def build_rolling_features(sector_prices: pd.DataFrame, market_prices: pd.Series,
+                           window_size: int = 30, chunk_size: int = None, correlation: bool = False) -> RollingFeatures:
+    """
+    sector_prices: DataFrame (dates x sectors)
+    market_prices: Series (dates)
+    chunk_size: sectors processed per step; None sizes chunks to a few
+                million cells so large universes stay memory-bounded
+    correlation: also compute CORRELATION_FEATURES (rolling covariances,
+                 see features/rolling_covariance.py)
+    Returns a RollingFeatures holding one feature matrix per window end,
+    computed in a single vectorized pass. Features are stored as float32 when
+    every price column is float32, float64 otherwise.
+    """
+    n_dates, n_sectors = sector_prices.shape
+    dtype = "float32" if all(dt == np.float32 for dt in sector_prices.dtypes) and n_sectors else "float64"
+    market = market_prices.reindex(sector_prices.index).to_numpy(dtype="float64")
+
+    # Same adaptive lookbacks as build_feature_matrix for a window of this size
+    w1 = min(30, window_size - 1)
+    w2 = min(90, window_size - 1)
+
+    feature_names = FEATURE_NAMES + (CORRELATION_FEATURES if correlation else [])
+    n_windows = max(0, n_dates - window_size)
+    ends = np.arange(window_size, n_dates) - 1  # last row inside each window
+
+    values = np.full((n_windows, n_sectors, len(feature_names)), np.nan, dtype=dtype)
+    if n_windows == 0:
+        return RollingFeatures(sector_prices.index[window_size:], sector_prices.columns, values, window_size,
+                               feature_names)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        market_ret = _market_returns(market, ends, w1, window_size)
+
+    if chunk_size is None:
+        chunk_size = max(1, 4_000_000 // n_dates)
+
+    for lo in range(0, n_sectors, chunk_size):
+        hi = min(lo + chunk_size, n_sectors)
+        prices = sector_prices.iloc[:, lo:hi].to_numpy(dtype="float64")
+        values[:, lo:hi, :len(FEATURE_NAMES)] = _features_chunk(prices, market_ret, ends, w1, w2)
+
+    if correlation and w1 >= 2:
+        values[:, :, len(FEATURE_NAMES):] = _correlation_features(sector_prices, market_prices, ends, w1)
+
+    return RollingFeatures(sector_prices.index[window_size:], sector_prices.columns, values, window_size,
+                           feature_names)
+
+
+def _features_chunk(prices: np.ndarray, market_ret: np.ndarray, ends: np.ndarray, w1: int, w2: int):
+    """
+    Features for a block of sector columns: array (windows x sectors x features).
+    """
+    n_sectors = prices.shape[1]
+    values = np.empty((len(ends), n_sectors, len(FEATURE_NAMES)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 1. Point-to-point returns
+        values[:, :, 0] = _window_returns(prices, ends, w1)
+        values[:, :, 1] = _window_returns(prices, ends, w2)
+
+        # 2. Volatility: sample std of the last w1 daily returns, from
+        #    cumulative sums of (demeaned) returns and squared returns
+        daily = np.full_like(prices, np.nan)
+        daily[1:] = prices[1:] / prices[:-1] - 1
+
+        missing = np.isnan(daily)
+        filled = np.where(missing, 0.0, daily)
+        counts = np.maximum((~missing).sum(axis=0), 1)
+        centered = np.where(missing, 0.0, filled - filled.sum(axis=0) / counts)
+
+        zeros = np.zeros((1, n_sectors))
+        csum = np.concatenate([zeros, np.cumsum(centered, axis=0)])
+        csum_sq = np.concatenate([zeros, np.cumsum(centered ** 2, axis=0)])
+        cmissing = np.concatenate([zeros, np.cumsum(missing, axis=0)])
+
+        lo, hi = ends - w1 + 1, ends + 1
+        s1 = csum[hi] - csum[lo]
+        s2 = csum_sq[hi] - csum_sq[lo]
+        n_missing = cmissing[hi] - cmissing[lo]
+
+        var = (s2 - s1 ** 2 / w1) / (w1 - 1) if w1 > 1 else np.full_like(s1, np.nan)
+        vol = np.sqrt(np.maximum(var, 0.0))
+        vol[n_missing > 0] = np.nan
+        values[:, :, 2] = vol
+
+        # 3. Relative strength vs. market over the short lookback
+        values[:, :, 3] = values[:, :, 0] - market_ret[:, None]
+
+    return values
+
+
+def _correlation_features(sector_prices: pd.DataFrame, market_prices: pd.Series, ends: np.ndarray, w1: int):
+    """
+    Beta and average correlation over the w1 daily returns up to each row in
+    `ends`: array (windows x sectors x 2). Windows are taken in blocks so the
+    (windows x names x names) covariances stay a few million cells.
+    """
+    n_names = sector_prices.shape[1] + 1
+    values = np.empty((len(ends), sector_prices.shape[1], len(CORRELATION_FEATURES)))
+
+    step = max(1, 4_000_000 // n_names ** 2)
+    for lo in range(0, len(ends), step):
+        block = ends[lo:lo + step]
+        rows = sector_prices.iloc[block[0] - w1:block[-1] + 1]
+        cov = build_rolling_covariance(rows, market_prices, w1)
+        values[lo:lo + len(block), :, 0] = cov.market_beta().to_numpy()
+        values[lo:lo + len(block), :, 1] = cov.mean_correlation().to_numpy()
+    return values
+
+
+# -----------------------------
+# Incremental state
+# -----------------------------
+
+class RollingFeatureState:
+    """
+    Everything needed to compute the next window's features without the full
+    history: the last window_size price rows (ring buffers) and running sums of
+    the last w1 daily returns for the volatility. push() is O(sectors x features)
+    regardless of how long the history is.
+    """
+
+    def __init__(self, sectors, window_size: int = 30, center: np.ndarray = None, correlation: bool = False):
+        """
+        center: per-sector constant subtracted from daily returns before they are
+                summed (keeps the running variance numerically stable); the mean
+                daily return of the seeding history
+        correlation: also compute CORRELATION_FEATURES (from the buffered
+                     window, O(window x sectors^2) per push)
+        """
+        self.sectors = pd.Index(sectors)
+        self.window_size = window_size
+        self.w1 = min(30, window_size - 1)
+        self.w2 = min(90, window_size - 1)
+        self.correlation = correlation
+        self.feature_names = FEATURE_NAMES + (CORRELATION_FEATURES if correlation else [])
+
+        n_sectors = len(self.sectors)
+        self.prices = np.full((window_size, n_sectors), np.nan)
+        self.market = np.full(window_size, np.nan)
+        self.n_rows = 0
+        self.last_date = None
+
+        self.center = np.zeros(n_sectors) if center is None else np.asarray(center, dtype="float64")
+        self.returns = np.zeros((self.w1, n_sectors))          # centered, 0 where missing
+        self.missing = np.zeros((self.w1, n_sectors), dtype=bool)
+        self.n_returns = 0
+        self.s1 = np.zeros(n_sectors)
+        self.s2 = np.zeros(n_sectors)
+        self.n_missing = np.zeros(n_sectors)
+
+    @classmethod
+    def from_prices(cls, sector_prices: pd.DataFrame, market_prices: pd.Series,
+                    window_size: int = 30, correlation: bool = False) -> "RollingFeatureState":
+        """
+        State after seeing the whole given history, so that the next push()
+        yields what build_rolling_features would for the next window end.
+        """
+        prices = sector_prices.to_numpy(dtype="float64")
+        market = market_prices.reindex(sector_prices.index).to_numpy(dtype="float64")
+        n_dates = len(prices)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            daily = prices[1:] / prices[:-1] - 1
+            counts = np.maximum((~np.isnan(daily)).sum(axis=0), 1)
+            center = np.where(np.isnan(daily), 0.0, daily).sum(axis=0) / counts
+
+        state = cls(sector_prices.columns, window_size, center, correlation)
+
+        tail = slice(max(0, n_dates - window_size), n_dates)
+        for date, row, level in zip(sector_prices.index[tail], prices[tail], market[tail]):
+            state.push(date, row, level)
+        return state
+
+    def push(self, date, sector_row: np.ndarray, market_value: float):
+        """
+        Add one price row.
+        Returns the features (sectors x features) of the window labelled `date`
+        (the window_size rows before it), or None while the history is shorter
+        than one window.
+        """
+        features = self._features() if self.n_rows >= self.window_size else None
+
+        row = np.asarray(sector_row, dtype="float64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.n_rows:
+                daily = row / self.prices[(self.n_rows - 1) % self.window_size] - 1
+            else:
+                daily = np.full(len(row), np.nan)
+        self._add_return(daily)
+
+        self.prices[self.n_rows % self.window_size] = row
+        self.market[self.n_rows % self.window_size] = market_value
+        self.n_rows += 1
+        self.last_date = pd.Timestamp(date)
+
+        return features
+
+    def preview(self, sector_row: np.ndarray, market_value: float):
+        """
+        Features (sectors x features) of the window that would end with this
+        row, e.g. today's provisional intraday prices; the state is unchanged.
+        None while the history is shorter than one window.
+        """
+        state = copy.deepcopy(self)
+        state.push(self.last_date, sector_row, market_value)
+        return state._features() if state.n_rows >= state.window_size else None
+
+    def _add_return(self, daily: np.ndarray):
+        missing = np.isnan(daily)
+        centered = np.where(missing, 0.0, daily - self.center)
+        slot = self.n_returns % self.w1
+
+        if self.n_returns >= self.w1:
+            old = self.returns[slot]
+            self.s1 -= old
+            self.s2 -= old ** 2
+            self.n_missing -= self.missing[slot]
+
+        self.returns[slot] = centered
+        self.missing[slot] = missing
+        self.s1 += centered
+        self.s2 += centered ** 2
+        self.n_missing += missing
+        self.n_returns += 1
+
+        # Re-sum exactly once per lap of the ring so rounding cannot drift
+        if self.n_returns % self.w1 == 0:
+            self.s1 = self.returns.sum(axis=0)
+            self.s2 = (self.returns ** 2).sum(axis=0)
+            self.n_missing = self.missing.sum(axis=0).astype("float64")
+
+    def _row(self, lag: int) -> np.ndarray:
+        return self.prices[(self.n_rows - 1 - lag) % self.window_size]
+
+    def _features(self) -> np.ndarray:
+        w1, w2 = self.w1, self.w2
+        values = np.full((len(self.sectors), len(self.feature_names)), np.nan)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            last = self._row(0)
+            values[:, 0] = last / self._row(w1) - 1
+            values[:, 1] = last / self._row(w2) - 1
+
+            var = (self.s2 - self.s1 ** 2 / w1) / (w1 - 1) if w1 > 1 else np.full(len(last), np.nan)
+            vol = np.sqrt(np.maximum(var, 0.0))
+            vol[self.n_missing > 0] = np.nan
+            values[:, 2] = vol
+
+            ends = np.arange(self.n_rows - 1, self.n_rows - 1 - (self.window_size - w1), -1)
+            market_ret = _window_returns(self.market, ends % self.window_size, w1)
+        # Latest market return inside the window (ffill), see _market_returns
+        known = market_ret[~np.isnan(market_ret)]
+        values[:, 3] = values[:, 0] - (known[0] if len(known) else np.nan)
+
+        if self.correlation and w1 >= 2:
+            # The w1 daily returns of the window, oldest first
+            rows = (self.n_rows - 1 - np.arange(w1, -1, -1)) % self.window_size
+            cov = build_rolling_covariance(pd.DataFrame(self.prices[rows]), pd.Series(self.market[rows]), w1)
+            values[:, 4] = cov.market_beta().to_numpy()[-1]
+            values[:, 5] = cov.mean_correlation().to_numpy()[-1]
+
+        return values
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def to_arrays(self, prefix: str = "features_") -> dict:
+        return {
+            prefix + "prices": self.prices,
+            prefix + "market": self.market,
+            prefix + "center": self.center,
+            prefix + "returns": self.returns,
+            prefix + "missing": self.missing,
+            prefix + "sums": np.stack([self.s1, self.s2, self.n_missing]),
+            prefix + "counters": np.array([self.window_size, self.n_rows, self.n_returns]),
+            prefix + "correlation": np.array(self.correlation),
+            prefix + "last_date": np.array(
+                "NaT" if self.last_date is None else self.last_date.date(), dtype="datetime64[D]"
+            ),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, sectors, prefix: str = "features_") -> "RollingFeatureState":
+        window_size, n_rows, n_returns = (int(v) for v in arrays[prefix + "counters"])
+        # Files written before CORRELATION_FEATURES have no flag
+        correlation = prefix + "correlation" in arrays and bool(arrays[prefix + "correlation"])
+        state = cls(sectors, window_size, arrays[prefix + "center"], correlation)
+
+        state.prices = np.array(arrays[prefix + "prices"])
+        state.market = np.array(arrays[prefix + "market"])
+        state.returns = np.array(arrays[prefix + "returns"])
+        state.missing = np.array(arrays[prefix + "missing"])
+        state.s1, state.s2, state.n_missing = np.array(arrays[prefix + "sums"])
+        state.n_rows, state.n_returns = n_rows, n_returns
+
+        last_date = arrays[prefix + "last_date"][()]
+        state.last_date = None if np.isnat(last_date) else pd.Timestamp(last_date)
+        return state
@@ -1,15 +1,124 @@
-from fastapi import FastAPI
-from data.dataGetter import get_sector_prices, get_market_prices
-from features.feature_engineering import build_feature_matrix
-from models.kmeans import SectorKMeans
-from models.rotation_flow import compute_rotation_flow, compute_relative_strength, compute_rolling_strength, compute_sector_returns
-import pandas as pd 
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import pandas as pd
+from fastapi import FastAPI, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from data.bar_sources import get_bar_source
+from data.dataGetter import get_universe, get_universe_prices, split_universe_prices
+from features.rolling_covariance import build_rolling_covariance
+from models.cluster_confidence import bootstrap_cluster_confidence
+from models.rotation_flow import flow_matrix_to_edges
+from models.rotation_frame_builder import iter_rotation_frames
+from utils import metrics
+from utils.frame_encoding import DEFAULT_PRECISION, decimate_frames, iter_encoded_frames
+from utils.serialization import JSON, choose_format, encode, to_records
+from services.live import Broadcaster, LiveEngine, LiveFeed
+from services.scheduler import RefreshScheduler, UnknownSnapshotKey, make_process_pool
+from services.snapshot_index import SnapshotIndex, index_path, maintain_index
+from utils.config import (
+    REFRESH_INTERVAL_SECONDS, STALE_AFTER_SECONDS, PROCESS_WORKERS, METRICS_ENABLED, PROFILING_ENABLED,
+    SNAPSHOT_PERIODS, SNAPSHOT_WINDOWS, MAX_SNAPSHOTS, MAX_ROTATION_HORIZON, MAX_FRAME_WINDOW,
+    MAX_CORRELATION_WINDOW, SNAPSHOT_INDEX_ENABLED, SNAPSHOT_INDEX_FLOW_MAX_SECTORS, N_CLUSTERS, CLUSTER_FEATURES,
+    CONFIDENCE_BOOTSTRAPS, CONFIDENCE_BLOCK,
+    UNIVERSE_LEVEL, LIVE_ENABLED, LIVE_SOURCE, LIVE_REPLAY_SPEED, LIVE_QUEUE_SIZE, LIVE_PERIOD, LIVE_ROLLING_WINDOW
+)
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# Precomputes prices -> features -> clusters / flows in the background;
+# handlers serve the latest snapshot.
+scheduler = RefreshScheduler(interval=REFRESH_INTERVAL_SECONDS, stale_after=STALE_AFTER_SECONDS,
+                             periods=SNAPSHOT_PERIODS, windows=SNAPSHOT_WINDOWS, max_snapshots=MAX_SNAPSHOTS)
+
+# Upper bound on horizons per /rotation?windows= request
+MAX_ROTATION_WINDOWS = 16
+
+# Upper bounds of the /clusters/confidence parameters: replicates, block
+# length (at most the resampled window) and seed
+MAX_BOOTSTRAPS = 20_000
+CONFIDENCE_WINDOW = 30
+MAX_SEED = 2 ** 32 - 1
+
+# Point-in-time history (date -> clusters / features / flows), memory-mapped;
+# built and extended in the background
+snapshot_index = SnapshotIndex(index_path())
+# Its own single worker, so a long build / extend never queues snapshot refreshes
+index_executor = None
+
+# Live intraday mode: bars -> incremental clusters / flows -> /live/ws subscribers
+broadcaster = Broadcaster(LIVE_QUEUE_SIZE)
+live_feed = None
+
+
+def _live_engine(bar) -> LiveEngine:
+    """
+    Live engine seeded with the daily history before the first bar's day.
+    """
+    universe = get_universe()
+    sector_prices, market_prices = split_universe_prices(get_universe_prices(LIVE_PERIOD).prices, universe.market)
+    # Member closes seed the chain-linking of groups with several members
+    member_prices = None if UNIVERSE_LEVEL == "ticker" else get_universe_prices(LIVE_PERIOD, level="ticker").prices
+    return LiveEngine.before(
+        sector_prices, market_prices, bar.timestamp, market_ticker=universe.market,
+        rs_window=LIVE_ROLLING_WINDOW, n_clusters=N_CLUSTERS, mapping=universe.mapping(UNIVERSE_LEVEL),
+        features=CLUSTER_FEATURES, member_prices=member_prices,
+    )
 
-from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+async def _maintain_snapshot_index():
+    """
+    Build the snapshot index if needed, then extend it every refresh interval.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(index_executor, maintain_index, snapshot_index.path)
+        except Exception:
+            logger.exception("Snapshot index update failed")
+        await scheduler.clock.sleep(scheduler.interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global index_executor
+    scheduler.executor = make_process_pool(PROCESS_WORKERS)
+    scheduler.start()
+    index_task = None
+    if SNAPSHOT_INDEX_ENABLED:
+        index_executor = make_process_pool(min(PROCESS_WORKERS, 1)) or ThreadPoolExecutor(max_workers=1)
+        index_task = asyncio.get_running_loop().create_task(_maintain_snapshot_index())
+
+    global live_feed
+    live_task = None
+    if LIVE_ENABLED:
+        live_feed = LiveFeed(get_bar_source(LIVE_SOURCE, LIVE_REPLAY_SPEED), _live_engine, broadcaster)
+        live_task = asyncio.get_running_loop().create_task(live_feed.run())
+    yield
+    if index_task is not None:
+        index_task.cancel()
+        index_executor.shutdown(cancel_futures=True)
+    if live_task is not None:
+        live_task.cancel()
+    await scheduler.stop()
+    if scheduler.executor is not None:
+        scheduler.executor.shutdown(cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(UnknownSnapshotKey)
+async def unknown_snapshot_key(request: Request, exc: UnknownSnapshotKey):
+    # Rejected before anything is computed or scheduled
+    return Response(str(exc), status_code=400)
+
 
 # Allow requests from your frontend
 app.add_middleware(
@@ -18,78 +127,524 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-As-Of", "X-Computed-At", "X-Stale", "Server-Timing"],
 )
 
 
+if METRICS_ENABLED or PROFILING_ENABLED:
+    @app.middleware("http")
+    async def instrument(request: Request, call_next):
+        """
+        Times the request and the stages run while handling it. With
+        profiling enabled, ?profile=1 or an X-Profile: 1 header returns the
+        breakdown as a Server-Timing header: request stages, then the stages
+        of the snapshot computation that was served (prefixed "snapshot.").
+        """
+        started = time.perf_counter()
+        with metrics.collect() as timings:
+            response = await call_next(request)
+        elapsed = time.perf_counter() - started
+
+        if METRICS_ENABLED:
+            route = request.scope.get("route")
+            metrics.REQUEST_SECONDS.observe(route.path if route is not None else "unmatched", elapsed)
+            metrics.observe_stages(timings.seconds)
+
+        if PROFILING_ENABLED and "1" in (request.query_params.get("profile"), request.headers.get("x-profile")):
+            timings.merge(getattr(request.state, "snapshot_timings", {}), prefix="snapshot.")
+            timings.add("total", elapsed)
+            response.headers["Server-Timing"] = metrics.server_timing(timings.seconds)
+        return response
+
+
+def _freshness_headers(snapshot) -> dict:
+    """
+    as-of date of the market data, when the snapshot was computed, and
+    whether it is older than the scheduler's staleness threshold.
+    """
+    headers = {}
+    if snapshot.as_of is not None:
+        headers["X-As-Of"] = str(snapshot.as_of.date())
+    headers["X-Computed-At"] = datetime.fromtimestamp(snapshot.computed_at, timezone.utc).isoformat()
+    headers["X-Stale"] = "true" if scheduler.is_stale(snapshot) else "false"
+    return headers
+
+
+def _served(request: Request, snapshot):
+    """
+    Remember which snapshot a request served, for its profile.
+    """
+    request.state.snapshot_timings = getattr(snapshot.result, "timings", {})
+    return snapshot
+
+
+def _columnar_response(request: Request, df: pd.DataFrame, headers: dict = None) -> Response:
+    """
+    Serialize `df` in the format the client asked for (see utils/serialization.py).
+    """
+    media_type = choose_format(request.headers.get("accept"))
+    try:
+        with metrics.stage("serialize"):
+            content = encode(df, media_type)
+    except ImportError:
+        return Response(f"{media_type} is not available on this server", status_code=406)
+
+    headers = dict(headers or {}, Vary="Accept")
+    return Response(content, media_type=media_type, headers=headers)
+
+
 @app.get("/clusters")
-def get_clusters():
-    # sector_prices = get_sector_prices()
-    # market_prices = get_market_prices()
-    # feature_df = build_feature_matrix(sector_prices, market_prices)  # DataFrame with features
-    # kmeans = SectorKMeans()
-    # clustered_df = kmeans.label_clusters_by_performance(
-    #     kmeans.get_clustered_dataframe(feature_df)
-    # )
-    # return clustered_df.reset_index().to_dict(orient="records")
-        # Get prices
-    sector_prices = get_sector_prices()
-    market_prices = get_market_prices()
-
-    # Build feature matrix
-    feature_df = pd.DataFrame({
-        "ret_short": sector_prices.pct_change(30).iloc[-1],  # 30-day return
-        "rel_strength": sector_prices.pct_change(30).iloc[-1] - market_prices.pct_change(30).iloc[-1],
-        "volatility": sector_prices.pct_change().rolling(30).std().iloc[-1],
-    })
-
-    # K-Means
-    km = SectorKMeans(n_clusters=3)
-    clustered_df = km.get_clustered_dataframe(feature_df)
-    clustered_df = km.label_clusters_by_performance(clustered_df)
-
-    # Prepare JSON
-    data = []
-    for idx, row in clustered_df.iterrows():
-        data.append({
-            "sector": idx,
-            "ret_short": float(row["ret_short"]),
-            "rel_strength": float(row["rel_strength"]),
-            "volatility": float(row["volatility"]),
-            "performance": row["performance"],
-            "cluster": int(row["cluster"]),
+async def get_clusters(request: Request):
+    snapshot = _served(request, await scheduler.get())
+    clustered_df = snapshot.result.clustered_df
+
+    columns = ["sector", "ret_short", "rel_strength", "volatility", "performance", "cluster"]
+    df = clustered_df.rename_axis("sector").reset_index()[columns]
+    df["cluster"] = df["cluster"].astype("int32")
+
+    return _columnar_response(request, df, _freshness_headers(snapshot))
+
+@app.get("/clusters/confidence")
+async def get_cluster_confidence(
+    request: Request,
+    n: int = Query(CONFIDENCE_BOOTSTRAPS, ge=1, le=MAX_BOOTSTRAPS),
+    block: int = Query(CONFIDENCE_BLOCK, ge=1, le=CONFIDENCE_WINDOW),
+    seed: int = Query(0, ge=0, le=MAX_SEED),
+):
+    """
+    How robust the /clusters assignment is: the latest 30-day window is
+    reclustered on n block-bootstrap resamples of its daily returns
+    (models/cluster_confidence.py), spread over the process pool.
+    {"n_bootstrap", "block", "seed", "sectors", "labels",
+     "performance": hard label per sector, "confidence": its probability,
+     "probabilities": [[per label] per sector],
+     "coassignment": [[share of replicates clustering the pair together]]}
+    Results are deterministic in (n, seed); the last few are cached per snapshot.
+    """
+    snapshot = _served(request, await scheduler.get())
+    result = snapshot.result
+
+    key = (n, block, seed)
+    confidence = result.cached_confidence(key)
+    if confidence is None:
+        with metrics.stage("bootstrap"):
+            confidence = await run_in_threadpool(
+                bootstrap_cluster_confidence, result.sector_prices, result.market_prices, n,
+                window=CONFIDENCE_WINDOW, block=block, n_clusters=N_CLUSTERS, seed=seed, executor=scheduler.executor,
+            )
+        result.store_confidence(key, confidence)
+
+    performance = result.clustered_df["performance"]
+    with metrics.stage("serialize"):
+        content = json.dumps({
+            "n_bootstrap": n,
+            "block": block,
+            "seed": seed,
+            "sectors": confidence.sectors.tolist(),
+            "labels": confidence.labels,
+            "performance": [p if isinstance(p, str) else None for p in performance.reindex(confidence.sectors)],
+            "confidence": _nan_to_none(confidence.confidence(performance).to_numpy()),
+            "probabilities": [_nan_to_none(row) for row in confidence.probabilities().to_numpy()],
+            "coassignment": [_nan_to_none(row) for row in confidence.coassignment().to_numpy()],
         })
+    return Response(content, media_type=JSON, headers=_freshness_headers(snapshot))
+
+def _nan_to_none(values) -> list:
+    return [None if v != v else v for v in values.tolist()]
+
+@app.get("/correlation")
+async def get_correlation(
+    request: Request,
+    period: str = "6mo",
+    window: int = Query(30, ge=2, le=MAX_CORRELATION_WINDOW),
+    as_of: str = None,
+    kind: str = "corr",
+):
+    """
+    Rolling sector-to-sector and sector-to-market matrix over the `window`
+    daily returns ending on as_of (default: the latest date), from the
+    covariance engine in features/rolling_covariance.py.
+    kind: "corr", "cov" or "beta" (beta of each row on each column)
+    JSON: {"date", "window", "kind", "names", "matrix"}, the market last;
+    binary formats send a "name" column plus one column per name.
+    """
+    if kind not in ("corr", "cov", "beta"):
+        return Response(f"kind must be corr, cov or beta, got {kind!r}", status_code=400)
+
+    snapshot = _served(request, await scheduler.get(period=period))
+    sector_prices = snapshot.result.sector_prices
+    try:
+        end = sector_prices.index[-1] if as_of is None else pd.Timestamp(as_of)
+    except ValueError as exc:
+        return Response(f"Invalid date: {exc}", status_code=400)
+
+    # Only the window ending on the last price date on or before as_of
+    position = sector_prices.index.searchsorted(end, side="right") - 1
+    if position < window:
+        return Response(f"No {window}-day window ends on or before {end.date()}", status_code=404)
+
+    with metrics.stage("covariance"):
+        date = sector_prices.index[position]
+        cov = await run_in_threadpool(
+            build_rolling_covariance, sector_prices, snapshot.result.market_prices, window,
+            start=date, end=date, market_name=get_universe().market,
+        )
+        matrix = cov.frame(0, kind)
+
+    headers = _freshness_headers(snapshot)
+    headers["X-As-Of"] = str(date.date())
+    if choose_format(request.headers.get("accept")) == JSON:
+        with metrics.stage("serialize"):
+            content = json.dumps({
+                "date": str(date.date()),
+                "window": window,
+                "kind": kind,
+                "names": matrix.index.tolist(),
+                "matrix": [_nan_to_none(row) for row in matrix.to_numpy()],
+            })
+        return Response(content, media_type=JSON, headers=headers)
 
-    return data
+    return _columnar_response(request, matrix.rename_axis("name").reset_index(), headers)
 
 @app.get("/rotation")
-def get_rotation():
-    # Get prices
-    sector_prices = get_sector_prices()
-    market_prices = get_market_prices()
-
-    # Compute returns
-    sector_returns = compute_sector_returns(sector_prices)
-    market_returns = market_prices.pct_change().dropna()
-
-    # Compute relative strength (sector vs market)
-    rel_strength = compute_relative_strength(sector_returns, market_returns)
-
-    # Compute rolling strength
-    rolling_strength = compute_rolling_strength(rel_strength, window=20)
-
-    # Compute rotation flows
-    flows = compute_rotation_flow(rolling_strength)
-
-    # Prepare JSON response
-    data = []
-    for f in flows:
-        data.append({
-            "source": f["source"],
-            "target": f["target"],
-            "weight": f["weight"]
-        })
+async def get_rotation(request: Request, format: str = "edges", windows: str = None):
+    """
+    format: "edges" (list of source/target/weight) or "matrix"
+            ({"sectors": [...], "matrix": [[...]]}, rows = source, columns = target;
+            binary formats send it as a "source" column plus one column per target)
+    windows: comma-separated rolling horizons in days (e.g. "5,20,60,120") to get
+             the flows of several horizons in one response. Edges then carry a
+             "window" column; JSON matrices come as {"sectors", "windows", "matrices"}
+             and binary ones as a "window" column plus the matrix layout above.
+    """
+    snapshot = _served(request, await scheduler.get(window=20))
+    headers = _freshness_headers(snapshot)
+
+    if windows is None:
+        return _rotation_response(request, snapshot.result.flow_matrix, format, headers)
+
+    try:
+        horizons = sorted({int(w) for w in windows.split(",")})
+    except ValueError:
+        return Response(f"windows must be comma-separated integers, got {windows!r}", status_code=400)
+    if not horizons or horizons[0] < 1 or horizons[-1] > MAX_ROTATION_HORIZON or len(horizons) > MAX_ROTATION_WINDOWS:
+        return Response(f"windows must list 1 to {MAX_ROTATION_WINDOWS} horizons of 1 to {MAX_ROTATION_HORIZON} days",
+                        status_code=400)
+
+    # Horizons outside the configured set are derived from the snapshot off the event loop
+    flow_matrices = await run_in_threadpool(snapshot.result.horizon_flow_matrices, horizons)
+
+    if format == "matrix" and choose_format(request.headers.get("accept")) == JSON:
+        sectors = snapshot.result.flow_matrix.index
+        with metrics.stage("serialize"):
+            content = json.dumps({
+                "sectors": sectors.tolist(),
+                "windows": horizons,
+                "matrices": [m.to_numpy().tolist() for m in flow_matrices.values()],
+            })
+        return Response(content, media_type=JSON, headers=headers)
+
+    with metrics.stage("edges"):
+        frames = []
+        for window, flow_matrix in flow_matrices.items():
+            df = _rotation_frame(flow_matrix, format)
+            df.insert(0, "window", window)
+            frames.append(df)
+        df = pd.concat(frames, ignore_index=True)
+        df["window"] = df["window"].astype("int32")
+    return _columnar_response(request, df, headers)
+
+def _rotation_frame(flow_matrix: pd.DataFrame, format: str) -> pd.DataFrame:
+    if format == "matrix":
+        return flow_matrix.rename_axis("source").reset_index()
+    return flow_matrix_to_edges(flow_matrix)[["source", "target", "weight"]]
+
+def _rotation_response(request: Request, flow_matrix: pd.DataFrame, format: str, headers: dict) -> Response:
+    if format == "matrix" and choose_format(request.headers.get("accept")) == JSON:
+        with metrics.stage("serialize"):
+            content = json.dumps({
+                "sectors": flow_matrix.index.tolist(),
+                "matrix": flow_matrix.to_numpy().tolist(),
+            })
+        return Response(content, media_type=JSON, headers=headers)
+
+    with metrics.stage("edges"):
+        df = _rotation_frame(flow_matrix, format)
+    return _columnar_response(request, df, headers)
+
+@app.get("/rotation/graph")
+async def get_rotation_graph(
+    request: Request,
+    window: int = Query(20, ge=1, le=MAX_ROTATION_HORIZON),
+    start: str = None,
+    end: str = None,
+    top: int = Query(10, ge=1, le=1000),
+    path: str = None,
+):
+    """
+    Flow-graph metrics over the days in [start, end] (default: the whole
+    snapshot), from prefix sums of the daily flows (see models/flow_graph.py):
+    {"start", "end", "days", "net_inflow": [{sector, inflow, outflow, net}],
+     "top_flows": [{source, target, weight}], "path": {...} (when asked)}
+    window: rolling horizon in days
+    path: comma-separated sectors (e.g. "Energy,Utilities"); reports how many
+          days every hop of the path carried flow
+    """
+    snapshot = _served(request, await scheduler.get(window=20))
+    graphs = await run_in_threadpool(snapshot.result.horizon_flow_graphs, [window])
+    graph = graphs[window]
+
+    try:
+        lo, hi = graph.bounds(start, end)
+    except ValueError as exc:
+        return Response(f"Invalid date: {exc}", status_code=400)
+
+    with metrics.stage("flow_graph"):
+        content = {
+            "start": str(graph.dates[lo].date()) if hi > lo else None,
+            "end": str(graph.dates[hi - 1].date()) if hi > lo else None,
+            "days": hi - lo,
+            "net_inflow": to_records(graph.net_inflow(lo, hi)),
+            "top_flows": to_records(graph.top_flows(lo, hi, top)),
+        }
+        if path is not None:
+            try:
+                content["path"] = graph.path_persistence(path.split(","), lo, hi)
+            except KeyError as exc:
+                return Response(str(exc.args[0]), status_code=400)
+
+    return Response(json.dumps(content), media_type=JSON, headers=_freshness_headers(snapshot))
+
+@app.get("/rotation/frames")
+async def stream_rotation_frames(
+    request: Request,
+    period: str = "6mo",
+    window: int = Query(30, ge=2, le=MAX_FRAME_WINDOW),
+    start: str = None,
+    end: str = None,
+    stride: int = Query(1, ge=1),
+    encoding: str = "rows",
+    precision: float = Query(DEFAULT_PRECISION, gt=0),
+    on_label_change: bool = False,
+    keyframe_every: int = Query(None, ge=1),
+):
+    """
+    Streams rotation frames as NDJSON, one line per window end:
+    {"date": "YYYY-MM-DD", "sectors": [{sector, ret_short, ..., performance, size}, ...]}
+    start / end: ISO dates bounding the window ends; stride: every Nth window end
+    on_label_change: only frames whose cluster / performance labels changed
+
+    encoding=delta streams a keyframe then per-date deltas of the coordinates
+    quantized to `precision` and of the labels that changed (see
+    utils/frame_encoding.py); keyframe_every repeats the keyframe for seeking.
+
+    With a binary Accept type (packed / Arrow) the selected frames are sent as
+    one long-format columnar payload instead.
+    """
+    if encoding not in ("rows", "delta"):
+        return Response(f"encoding must be rows or delta, got {encoding!r}", status_code=400)
+    # Parsed here: an error inside the stream would come after the 200
+    try:
+        start, end = (None if d is None else pd.Timestamp(d) for d in (start, end))
+    except ValueError as exc:
+        return Response(f"Invalid date: {exc}", status_code=400)
+
+    snapshot = _served(request, await scheduler.get(period=period))
+    frames = iter_rotation_frames(
+        snapshot.result.sector_prices, snapshot.result.market_prices, window_size=window,
+        start=start, end=end, stride=stride, backend="numpy",
+    )
+
+    headers = {}
+    if snapshot.as_of is not None:
+        headers["X-As-Of"] = str(snapshot.as_of.date())
+
+    if on_label_change:
+        frames = decimate_frames(frames, on_label_change=True)
+
+    if encoding == "delta":
+        messages = iter_encoded_frames(frames, precision, keyframe_every=keyframe_every)
+        lines = (json.dumps(m, separators=(",", ":")) + "\n" for m in messages)
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+
+    if choose_format(request.headers.get("accept")) != JSON:
+        frames = list(frames)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return _columnar_response(request, df, headers)
+
+    return StreamingResponse(_ndjson_frames(frames), media_type="application/x-ndjson", headers=headers)
+
+def _ndjson_frames(frames):
+    for frame in frames:
+        date = frame["date"].iat[0]
+        rows = to_records(frame.drop(columns="date"))
+        yield json.dumps({"date": date, "sectors": rows}) + "\n"
+
+# -----------------------------
+# Point-in-time history
+# -----------------------------
+
+def _history_rows(as_of: str = None, start: str = None, end: str = None):
+    """
+    Index rows [lo, hi) selected by as_of (the last indexed date on or before
+    it) or by the date range [start, end]; an error Response otherwise.
+    """
+    if not snapshot_index.refresh():
+        return Response("The snapshot index has not been built yet", status_code=503)
+
+    try:
+        if as_of is not None:
+            position = snapshot_index.position(as_of)
+            if position < 0:
+                return Response(f"No indexed date on or before {as_of}", status_code=404)
+            return position, position + 1
+        return snapshot_index.bounds(start, end)
+    except ValueError as exc:
+        return Response(f"Invalid date: {exc}", status_code=400)
+
+def _history_headers(lo: int, hi: int) -> dict:
+    return {"X-As-Of": str(snapshot_index.dates[hi - 1])} if hi > lo else {}
+
+@app.get("/history/clusters")
+async def get_history_clusters(
+    request: Request,
+    as_of: str = None,
+    start: str = None,
+    end: str = None,
+    stride: int = Query(1, ge=1),
+):
+    """
+    Clusters as they were, from the snapshot index (no recompute):
+    as_of: the window ending on that date (or the last one before it)
+    start / end: every window end in the range (every stride-th)
+    Long format: date, sector, features..., performance. X-As-Of is the last date returned.
+    """
+    rows = _history_rows(as_of, start, end)
+    if isinstance(rows, Response):
+        return rows
+
+    df = await run_in_threadpool(snapshot_index.frames, *rows, stride)
+    return _columnar_response(request, df, _history_headers(*rows))
+
+@app.get("/history/rotation")
+async def get_history_rotation(
+    request: Request,
+    as_of: str = None,
+    start: str = None,
+    end: str = None,
+    format: str = "edges",
+):
+    """
+    Rotation flows as they were, from the snapshot index: the moves of the
+    as_of day, or summed over the days in [start, end] (one prefix-sum
+    difference). format: as for /rotation.
+    """
+    rows = _history_rows(as_of, start, end)
+    if isinstance(rows, Response):
+        return rows
+    if not snapshot_index.has_flows:
+        return Response(f"Flows are only indexed for universes of up to {SNAPSHOT_INDEX_FLOW_MAX_SECTORS} groups",
+                        status_code=404)
+
+    flow_matrix = snapshot_index.flow_matrix(*rows)
+    return _rotation_response(request, flow_matrix, format, _history_headers(*rows))
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return scheduler.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus text format: snapshot cache counters, freshness of every
+    snapshot, and (when SRA_METRICS is on) stage / request histograms.
+    """
+    stats = scheduler.stats()
+    now = time.time()
+    snapshots = [({"period": period, "window": window}, snapshot)
+                 for (period, window), snapshot in sorted(scheduler.snapshots().items())]
+
+    gauges = [
+        ("sra_snapshots", "Snapshots held by the refresh scheduler.", [({}, stats["snapshots"])]),
+        ("sra_refresh_jobs", "(period, window) keys refreshed in the background.", [({}, stats["jobs"])]),
+        ("sra_last_refresh_seconds", "Duration of the last background refresh.",
+         [({}, stats["last_refresh_seconds"])]),
+        ("sra_snapshot_age_seconds", "Seconds since the snapshot was computed.",
+         [(labels, now - s.computed_at) for labels, s in snapshots]),
+        ("sra_snapshot_as_of_timestamp_seconds", "Date of the last market bar in the snapshot (Unix time).",
+         [(labels, s.as_of.timestamp() if s.as_of is not None else None) for labels, s in snapshots]),
+        ("sra_snapshot_stale", "1 when the snapshot is older than the staleness threshold.",
+         [(labels, int(scheduler.is_stale(s))) for labels, s in snapshots]),
+        ("sra_snapshot_fetch_failures", "Tickers that could not be refreshed for the snapshot.",
+         [(labels, len(getattr(s.result, "failures", []))) for labels, s in snapshots]),
+    ]
+    counters = [
+        ("sra_snapshot_hits_total", "Requests served from an existing snapshot.", [({}, stats["hits"])]),
+        ("sra_snapshot_misses_total", "Requests that had to compute a snapshot.", [({}, stats["misses"])]),
+        ("sra_snapshot_coalesced_total", "Computations joined instead of started.", [({}, stats["coalesced"])]),
+        ("sra_refreshes_total", "Background refresh rounds.", [({}, stats["refreshes"])]),
+        ("sra_refresh_failures_total", "Failed background job computations.", [({}, stats["refresh_failures"])]),
+    ]
+    return Response(metrics.render(gauges, counters), media_type="text/plain; version=0.0.4")
+
+@app.websocket("/live/ws")
+async def live_updates(websocket: WebSocket):
+    """
+    Live intraday updates: a snapshot on connect, then "tick" messages
+    (changed clusters, rotation flows when they moved) and "close" messages
+    (committed days and their rotations). A client that falls behind loses
+    its oldest queued messages and gets a fresh snapshot instead.
+    """
+    await websocket.accept()
+    if live_feed is None:
+        await websocket.close(code=1013, reason="Live mode is disabled")
+        return
+
+    subscriber = broadcaster.subscribe()
+    # Waiting on the receive side too notices a disconnect while no messages
+    # are published, instead of at the next send
+    receive = asyncio.ensure_future(websocket.receive())
+    get = None
+    try:
+        if live_feed.engine is not None:
+            await websocket.send_json(live_feed.engine.snapshot())
+        dropped = 0
+        get = asyncio.ensure_future(subscriber.queue.get())
+        while True:
+            await asyncio.wait((receive, get), return_when=asyncio.FIRST_COMPLETED)
+            if receive.done():
+                if receive.result()["type"] == "websocket.disconnect":
+                    break
+                # Client messages are ignored
+                receive = asyncio.ensure_future(websocket.receive())
+            if not get.done():
+                continue
+
+            message = get.result()
+            if subscriber.dropped > dropped:
+                # Missed messages: resync from the current state
+                message = dict(live_feed.engine.snapshot(), dropped=subscriber.dropped - dropped)
+                dropped = subscriber.dropped
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+            await websocket.send_json(message)
+            get = asyncio.ensure_future(subscriber.queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in (receive, get):
+            if task is not None:
+                task.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+
+@app.get("/live/status")
+def get_live_status():
+    if live_feed is None:
+        return {"enabled": False}
+    return dict(live_feed.status(), enabled=True)
+
 
-    return data
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,235 @@
+import numpy as np
+
+# -----------------------------
+# Batched K-Means kernel
+# -----------------------------
+# Clusters many small, independent problems at once. Input is a
+# (windows x sectors x features) tensor; every step (standardization,
+# k-means++ seeding, Lloyd iterations) is vectorized over windows and over
+# the n_init restarts, so thousands of windows cost a handful of NumPy calls
+# instead of thousands of sklearn fits.
+
+
+def standardize_batch(values: np.ndarray, mask: np.ndarray = None):
+    """
+    Per-window z-score (population std, like StandardScaler).
+
+    values: array (windows x points x features)
+    mask: bool array (windows x points), False for points to ignore
+    Returns (scaled, mean, scale); masked points are set to 0.
+    """
+    if mask is None:
+        mask = np.ones(values.shape[:2], dtype=bool)
+
+    weights = mask[:, :, None]
+    counts = np.maximum(mask.sum(axis=1), 1)[:, None]
+    filled = np.where(weights, values, 0.0)
+
+    mean = filled.sum(axis=1) / counts
+    var = (np.where(weights, values - mean[:, None, :], 0.0) ** 2).sum(axis=1) / counts
+    scale = np.sqrt(var)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+
+    scaled = np.where(weights, (filled - mean[:, None, :]) / scale[:, None, :], 0.0)
+    return scaled, mean, scale
+
+
+def _sq_distances(points: np.ndarray, centers: np.ndarray, point_norms: np.ndarray = None) -> np.ndarray:
+    """
+    points: (P x n x f), centers: (P x k x f) -> (P x n x k)
+    Uses |x|^2 - 2 x.c + |c|^2 (one batched matmul) rather than broadcasting
+    the (P x n x k x f) differences.
+    """
+    if point_norms is None:
+        point_norms = (points ** 2).sum(axis=2)
+    cross = points @ centers.transpose(0, 2, 1)
+    distances = point_norms[:, :, None] - 2 * cross + (centers ** 2).sum(axis=2)[:, None, :]
+    return np.maximum(distances, 0.0)
+
+
+def _kmeans_plus_plus(points, mask, n_clusters, rng):
+    """
+    Greedy k-means++ seeding (as in sklearn) for every problem at once:
+    each new center is the best of 2 + log(k) candidates drawn proportional
+    to the squared distance to the closest existing center.
+    points: (P x n x f), mask: (P x n)
+    """
+    n_problems, n_points, n_features = points.shape
+    rows = np.arange(n_problems)
+    centers = np.empty((n_problems, n_clusters, n_features))
+    n_trials = 2 + int(np.log(n_clusters))
+
+    # First center: uniform over valid points
+    first = _sample(mask.astype("float64"), rng)
+    centers[:, 0] = points[rows, first]
+    closest = np.where(mask, ((points - centers[:, :1]) ** 2).sum(axis=2), 0.0)
+
+    for c in range(1, n_clusters):
+        # Degenerate problems (all points on existing centers) fall back to uniform
+        weights = np.where(closest.sum(axis=1, keepdims=True) > 0, closest, mask.astype("float64"))
+
+        best_closest, best_idx, best_potential = None, None, None
+        for _ in range(n_trials):
+            candidate = _sample(weights, rng)
+            dist = np.where(mask, ((points - points[rows, candidate][:, None, :]) ** 2).sum(axis=2), 0.0)
+            trial_closest = np.minimum(closest, dist)
+            potential = trial_closest.sum(axis=1)
+
+            if best_potential is None:
+                best_closest, best_idx, best_potential = trial_closest, candidate, potential
+            else:
+                better = potential < best_potential
+                best_closest = np.where(better[:, None], trial_closest, best_closest)
+                best_idx = np.where(better, candidate, best_idx)
+                best_potential = np.minimum(potential, best_potential)
+
+        centers[:, c] = points[rows, best_idx]
+        closest = best_closest
+
+    return centers
+
+
+def _sample(weights, rng):
+    """
+    Draw one index per row with probability proportional to `weights`.
+    """
+    cumulative = np.cumsum(weights, axis=1)
+    draws = rng.random(len(weights)) * cumulative[:, -1]
+    idx = (cumulative <= draws[:, None]).sum(axis=1)
+    return np.minimum(idx, weights.shape[1] - 1)
+
+
+def _lloyd_batch(points, mask, centers, max_iter, tol):
+    """
+    Lloyd iterations for every problem at once.
+    Empty clusters are reseeded on the point farthest from its center.
+    """
+    n_problems, n_points, _ = points.shape
+    n_clusters = centers.shape[1]
+    centers = centers.copy()
+    tol = np.broadcast_to(tol, (n_problems,))
+
+    # Problems still iterating; converged ones are left alone (as sklearn stops per fit)
+    active = np.arange(n_problems)
+
+    norms = (points ** 2).sum(axis=2)
+
+    for _ in range(max_iter):
+        pts, msk, ctr = points[active], mask[active], centers[active]
+        rows = np.arange(len(active))
+
+        distances = _sq_distances(pts, ctr, norms[active])
+        labels = distances.argmin(axis=2)
+        own = np.where(msk, np.take_along_axis(distances, labels[:, :, None], axis=2)[:, :, 0], -1.0)
+
+        # Per (problem, cluster) counts and coordinate sums as flat bincounts
+        flat = (rows[:, None] * n_clusters + labels)[msk]
+        size = len(active) * n_clusters
+        counts = np.bincount(flat, minlength=size).reshape(-1, n_clusters)
+        sums = np.stack([
+            np.bincount(flat, weights=pts[:, :, f][msk], minlength=size) for f in range(pts.shape[2])
+        ], axis=1).reshape(-1, n_clusters, pts.shape[2])
+        new_centers = np.where(counts[:, :, None] > 0, sums / np.maximum(counts, 1)[:, :, None], ctr)
+
+        for k in range(n_clusters):
+            empty = counts[:, k] == 0
+            if empty.any():
+                far = own[empty].argmax(axis=1)
+                new_centers[empty, k] = pts[rows[empty], far]
+                own[rows[empty], far] = -1.0
+
+        shift = ((new_centers - ctr) ** 2).sum(axis=(1, 2))
+        centers[active] = new_centers
+        active = active[shift > tol[active]]
+        if not len(active):
+            break
+
+    distances = _sq_distances(points, centers, norms)
+    labels = distances.argmin(axis=2)
+    own = np.take_along_axis(distances, labels[:, :, None], axis=2)[:, :, 0]
+    inertia = np.where(mask, own, 0.0).sum(axis=1)
+    labels = np.where(mask, labels, -1)
+    return labels, centers, inertia
+
+
+def _mean_variance(points, mask):
+    """
+    Mean per-feature variance of the valid points of each problem.
+    """
+    weights = mask[:, :, None]
+    counts = np.maximum(mask.sum(axis=1), 1)[:, None]
+    mean = np.where(weights, points, 0.0).sum(axis=1) / counts
+    var = (np.where(weights, points - mean[:, None, :], 0.0) ** 2).sum(axis=1) / counts
+    return var.mean(axis=1)
+
+
+def batched_kmeans(values: np.ndarray, n_clusters: int = 3, mask: np.ndarray = None,
+                   n_init: int = 10, max_iter: int = 300, tol: float = 1e-4,
+                   random_state: int = 42, standardize: bool = True, chunk_size: int = None):
+    """
+    Cluster every window of `values` independently.
+
+    values: array (windows x points x features), float32 or float64
+    mask: bool array (windows x points); defaults to points without NaNs
+    chunk_size: windows processed per vectorized step (bounds memory); None
+                sizes chunks so the (restarts x windows x points x clusters)
+                intermediates stay around a few million cells
+    Returns (labels, centers, inertia):
+        labels  (windows x points), -1 for masked points
+        centers (windows x n_clusters x features), in standardized units
+        inertia (windows,)
+    """
+    values = np.asarray(values)
+    if mask is None:
+        mask = ~np.isnan(values).any(axis=2)
+
+    n_windows, n_points, n_features = values.shape
+    rng = np.random.default_rng(random_state)
+
+    if chunk_size is None:
+        cells = n_init * n_points * n_clusters * n_features
+        chunk_size = max(1, 8_000_000 // max(1, cells))
+
+    labels = np.full((n_windows, n_points), -1)
+    centers = np.zeros((n_windows, n_clusters, n_features))
+    inertia = np.zeros(n_windows)
+
+    for lo in range(0, n_windows, chunk_size):
+        hi = min(lo + chunk_size, n_windows)
+
+        # Windows are independent, so standardizing per chunk is exact
+        chunk = values[lo:hi].astype("float64")
+        if standardize:
+            points, _, _ = standardize_batch(chunk, mask[lo:hi])
+        else:
+            points = np.where(mask[lo:hi, :, None], chunk, 0.0)
+
+        labels[lo:hi], centers[lo:hi], inertia[lo:hi] = _cluster_chunk(
+            points, mask[lo:hi], n_clusters, n_init, max_iter, tol, rng
+        )
+
+    return labels, centers, inertia
+
+
+def _cluster_chunk(points, mask, n_clusters, n_init, max_iter, tol, rng):
+    n_windows, n_points, n_features = points.shape
+
+    # Same convention as sklearn: tol is relative to the mean feature variance
+    abs_tol = tol * _mean_variance(points, mask)
+
+    # Run all restarts side by side: problem p = init * n_windows + window
+    tiled_points = np.tile(points, (n_init, 1, 1))
+    tiled_mask = np.tile(mask, (n_init, 1))
+    tiled_tol = np.tile(abs_tol, n_init)
+
+    seeds = _kmeans_plus_plus(tiled_points, tiled_mask, n_clusters, rng)
+    labels, centers, inertia = _lloyd_batch(tiled_points, tiled_mask, seeds, max_iter, tiled_tol)
+
+    # Keep the best restart per window
+    inertia = inertia.reshape(n_init, n_windows)
+    best = inertia.argmin(axis=0)
+    windows = np.arange(n_windows)
+    labels = labels.reshape(n_init, n_windows, n_points)[best, windows]
+    centers = centers.reshape(n_init, n_windows, n_clusters, n_features)[best, windows]
+
+    return labels, centers, inertia[best, windows]
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+from models.batched_kmeans import batched_kmeans
+from models.cluster_matching import cluster_means
+from models.kmeans import performance_labels
+
+# -----------------------------
+# Bootstrap cluster confidence
+# -----------------------------
+# How robust is one hard K-Means assignment of a handful of sectors? Each
+# replicate resamples the daily returns of the feature window with a moving
+# block bootstrap (the same days for every sector and the market, so their
+# co-movement is kept), recomputes the /clusters features from them
+# (build_cluster_features: window return, relative strength, volatility) and
+# clusters them. Over all replicates we count, per sector, how often it
+# landed in each performance tier, and per pair of sectors how often they
+# shared a cluster (co-assignment; cluster ids need no matching for that).
+#
+# Replicates are clustered together by the batched kernel, in fixed-size
+# chunks. Chunk i draws from the i-th child of SeedSequence(seed), so results
+# only depend on (seed, n_bootstrap) - not on how many workers ran the chunks
+# or in which order they finished (the counts are integers).
+
+CHUNK_SIZE = 128
+
+
+class ClusterConfidence:
+    def __init__(self, sectors, labels: list, tier_counts: np.ndarray, valid_counts: np.ndarray,
+                 pair_counts: np.ndarray, pair_valid: np.ndarray, n_bootstrap: int):
+        """
+        tier_counts: (sectors x tiers) replicates that put a sector in each tier
+        valid_counts: (sectors,) replicates in which a sector had all features
+        pair_counts: (sectors x sectors) replicates that clustered a pair together
+        pair_valid: (sectors x sectors) replicates in which both were clustered
+        """
+        self.sectors = pd.Index(sectors)
+        self.labels = labels
+        self.tier_counts = tier_counts
+        self.valid_counts = valid_counts
+        self.pair_counts = pair_counts
+        self.pair_valid = pair_valid
+        self.n_bootstrap = n_bootstrap
+
+    @classmethod
+    def combine(cls, sectors, labels: list, chunks, n_bootstrap: int) -> "ClusterConfidence":
+        """
+        Sum the count arrays returned by bootstrap_chunk.
+        """
+        totals = [sum(parts) for parts in zip(*chunks)]
+        return cls(sectors, labels, *totals, n_bootstrap)
+
+    def probabilities(self) -> pd.DataFrame:
+        """
+        Share of replicates putting each sector in each tier (sectors x labels).
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = self.tier_counts / self.valid_counts[:, None]
+        return pd.DataFrame(values, index=self.sectors, columns=self.labels)
+
+    def coassignment(self) -> pd.DataFrame:
+        """
+        Share of replicates clustering each pair of sectors together.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = self.pair_counts / self.pair_valid
+        return pd.DataFrame(values, index=self.sectors, columns=self.sectors)
+
+    def confidence(self, performance: pd.Series) -> pd.Series:
+        """
+        Probability of each sector's given performance label (e.g. the
+        'performance' column of a hard clustering).
+        """
+        probabilities = self.probabilities()
+        performance = performance.reindex(self.sectors)
+        columns = pd.Index(self.labels).get_indexer(performance)
+        values = probabilities.to_numpy()[np.arange(len(self.sectors)), np.maximum(columns, 0)]
+        return pd.Series(np.where(columns >= 0, values, np.nan), index=self.sectors, name="confidence")
+
+
+def window_returns(sector_prices: pd.DataFrame, market_prices: pd.Series, window: int = 30):
+    """
+    The last `window` daily returns of every sector (window x sectors) and of
+    the market (window,): what build_cluster_features' latest features use.
+    """
+    market = market_prices.reindex(sector_prices.index)
+    returns = sector_prices.pct_change().to_numpy(dtype="float64")[-window:]
+    return returns, market.pct_change().to_numpy(dtype="float64")[-window:]
+
+
+def resample_features(returns: np.ndarray, market: np.ndarray, rng: np.random.Generator,
+                      n_samples: int, block: int = 5) -> np.ndarray:
+    """
+    Moving block bootstrap of the return days, then the cluster features
+    (ret_short, rel_strength, volatility) of every replicate:
+    array (replicates x sectors x 3).
+    """
+    window = len(returns)
+    block = max(1, min(block, window))
+    n_blocks = -(-window // block)
+
+    starts = rng.integers(0, window - block + 1, size=(n_samples, n_blocks))
+    days = (starts[:, :, None] + np.arange(block)).reshape(n_samples, -1)[:, :window]
+
+    sampled = returns[days]                       # replicates x window x sectors
+    ret_short = np.prod(1 + sampled, axis=1) - 1
+    market_ret = np.prod(1 + market[days], axis=1) - 1
+    volatility = sampled.std(axis=1, ddof=1) if window > 1 else np.full_like(ret_short, np.nan)
+
+    return np.stack([ret_short, ret_short - market_ret[:, None], volatility], axis=2)
+
+
+def _tiers(labels: np.ndarray, ret_short: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    Performance tier of every point (0 = best mean ret_short), -1 where masked.
+    """
+    means = cluster_means(ret_short, labels, n_clusters)
+    order = np.argsort(-np.where(np.isnan(means), -np.inf, means), axis=1, kind="stable")
+    rank = np.argsort(order, axis=1)
+    return np.where(labels >= 0, np.take_along_axis(rank, np.maximum(labels, 0), axis=1), -1)
+
+
+def bootstrap_chunk(returns: np.ndarray, market: np.ndarray, n_samples: int, seed: np.random.SeedSequence,
+                    n_clusters: int = 3, block: int = 5):
+    """
+    One chunk of replicates, resampled and clustered in one batched call.
+    Returns the counts ClusterConfidence sums:
+    (tier_counts, valid_counts, pair_counts, pair_valid)
+    """
+    resample_seed, kmeans_seed = seed.spawn(2)
+    values = resample_features(returns, market, np.random.default_rng(resample_seed), n_samples, block)
+    labels, _, _ = batched_kmeans(values, n_clusters, random_state=int(kmeans_seed.generate_state(1)[0]))
+    tiers = _tiers(labels, values[:, :, 0], n_clusters)
+
+    valid = labels >= 0
+    one_hot = (labels[:, :, None] == np.arange(n_clusters)).astype("float64")
+    tier_hot = (tiers[:, :, None] == np.arange(n_clusters)).astype(np.int64)
+    valid_f = valid.astype("float64")
+
+    return (
+        tier_hot.sum(axis=0),
+        valid.sum(axis=0),
+        np.rint(np.einsum("bik,bjk->ij", one_hot, one_hot)).astype(np.int64),
+        np.rint(valid_f.T @ valid_f).astype(np.int64),
+    )
+
+
+def bootstrap_cluster_confidence(sector_prices: pd.DataFrame, market_prices: pd.Series, n_bootstrap: int = 500,
+                                 window: int = 30, block: int = 5, n_clusters: int = 3, seed: int = 0,
+                                 executor=None) -> ClusterConfidence:
+    """
+    Cluster confidence of the latest window from n_bootstrap replicates.
+
+    block: days per bootstrap block (keeps short-range autocorrelation)
+    executor: concurrent.futures executor the chunks are spread over (e.g. a
+              process pool); None runs them here
+    """
+    returns, market = window_returns(sector_prices, market_prices, window)
+
+    sizes = [min(CHUNK_SIZE, n_bootstrap - lo) for lo in range(0, n_bootstrap, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(returns, market, size, chunk_seed, n_clusters, block) for size, chunk_seed in zip(sizes, seeds)]
+
+    if executor is None:
+        chunks = [bootstrap_chunk(*a) for a in args]
+    else:
+        chunks = list(executor.map(bootstrap_chunk, *zip(*args)))
+
+    return ClusterConfidence.combine(sector_prices.columns, performance_labels(n_clusters), chunks, n_bootstrap)
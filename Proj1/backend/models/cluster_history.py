@@ -0,0 +1,253 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Columnar cluster history
+# -----------------------------
+# Performance tiers per (window end date, sector) are stored as small integer
+# codes into a label table (best tier first, -1 = sector not clustered that
+# day). Rotation events are a structured array with one row per change.
+# Queries slice these arrays; Python objects are only built by the explicit
+# to_frame() / to_dict() / to_records() conversions.
+
+# Event direction codes
+ROTATION_OUT = -1
+UNKNOWN = 0
+ROTATION_IN = 1
+
+DIRECTION_NAMES = {ROTATION_OUT: "Rotation OUT", UNKNOWN: "Unknown", ROTATION_IN: "Rotation IN"}
+
+EVENT_DTYPE = np.dtype([
+    ("date", "datetime64[D]"),
+    ("sector", "int32"),      # index into the history's sectors
+    ("from", "int16"),        # tier code before, -1 when the sector was missing
+    ("to", "int16"),          # tier code after
+    ("direction", "int8"),    # ROTATION_IN / ROTATION_OUT / UNKNOWN
+])
+
+
+def _code_dtype(n_labels: int):
+    return np.int8 if n_labels < np.iinfo(np.int8).max else np.int16
+
+
+def date_bounds(dates: np.ndarray, start=None, end=None):
+    """
+    Index range of sorted datetime64[D] `dates` falling in [start, end].
+    """
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date(), "D"))
+    hi = len(dates) if end is None else np.searchsorted(
+        dates, np.datetime64(pd.Timestamp(end).date(), "D"), side="right"
+    )
+    return lo, hi
+
+
+class ClusterHistory:
+    def __init__(self, dates, sectors, labels, codes: np.ndarray = None):
+        """
+        dates: window end dates (sorted)
+        sectors: sector names
+        labels: tier names, best first; codes index into it
+        codes: array (dates x sectors), -1 where a sector was not clustered
+        """
+        dates = np.asarray(pd.DatetimeIndex(dates).values, dtype="datetime64[D]")
+        self.sectors = pd.Index(sectors)
+        self.labels = list(labels)
+        if codes is None:
+            codes = np.full((len(dates), len(self.sectors)), -1, dtype=_code_dtype(len(self.labels)))
+
+        # Buffers grow geometrically so append() is amortized O(sectors)
+        self._dates = dates
+        self._codes = codes
+        self._size = len(dates)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[:self._size]
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._codes[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def append(self, date, codes: np.ndarray) -> "RotationEvents":
+        """
+        Add the tiers of one new date (after the last one).
+        Returns the rotations between the previous date and this one.
+        """
+        if self._size == len(self._dates):
+            capacity = max(16, 2 * self._size)
+            self._dates = np.resize(self._dates, capacity)
+            grown = np.full((capacity, len(self.sectors)), -1, dtype=self._codes.dtype)
+            grown[:self._size] = self.codes
+            self._codes = grown
+
+        self._dates[self._size] = np.datetime64(pd.Timestamp(date).date(), "D")
+        self._codes[self._size] = codes
+        self._size += 1
+
+        return self.detect_rotations(start=self._size - 1)
+
+    def sector_codes(self, sectors) -> np.ndarray:
+        return self.sectors.get_indexer(sectors)
+
+    def label_codes(self, labels) -> np.ndarray:
+        """
+        Tier names -> codes (-1 for missing / unknown names).
+        """
+        return pd.Categorical(labels, categories=self.labels).codes.astype(self.codes.dtype)
+
+    def query(self, sector=None, start=None, end=None) -> "ClusterHistory":
+        """
+        History restricted to a sector (or list of sectors) and a date range.
+        Date slicing is a view of the code array.
+        """
+        lo, hi = date_bounds(self.dates, start, end)
+        codes = self.codes[lo:hi]
+        sectors = self.sectors
+
+        if sector is not None:
+            names = [sector] if isinstance(sector, str) else list(sector)
+            columns = self.sector_codes(names)
+            if (columns < 0).any():
+                raise KeyError(f"Unknown sectors: {[n for n, c in zip(names, columns) if c < 0]}")
+            codes = codes[:, columns]
+            sectors = self.sectors[columns]
+
+        return ClusterHistory(self.dates[lo:hi], sectors, self.labels, codes)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        DataFrame (dates x sectors) of categorical tier labels.
+        """
+        return pd.DataFrame(
+            {s: pd.Categorical.from_codes(self.codes[:, i], categories=self.labels)
+             for i, s in enumerate(self.sectors)},
+            index=pd.DatetimeIndex(self.dates, name="Date"),
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Legacy layout: date string -> {sector: label}, missing sectors left out.
+        """
+        labels = np.asarray(self.labels, dtype=object)
+        history = {}
+        for date, row in zip(self.dates.astype(str), self.codes):
+            present = np.nonzero(row >= 0)[0]
+            history[date] = dict(zip(self.sectors[present], labels[row[present]]))
+        return history
+
+    def detect_rotations(self, start: int = 1) -> "RotationEvents":
+        """
+        Every change of tier between consecutive dates, as one vectorized diff.
+        A sector appearing after being missing is reported with direction
+        UNKNOWN; a sector dropping out is not reported.
+        start: first row compared with its predecessor (to diff only new rows)
+        """
+        start = max(start, 1)
+        prev, curr = self.codes[start - 1:-1], self.codes[start:]
+        changed = (curr >= 0) & (prev != curr)
+        date_idx, sector_idx = np.nonzero(changed)
+
+        before = prev[date_idx, sector_idx]
+        after = curr[date_idx, sector_idx]
+
+        events = np.empty(len(date_idx), dtype=EVENT_DTYPE)
+        events["date"] = self.dates[start:][date_idx]
+        events["sector"] = sector_idx
+        events["from"] = before
+        events["to"] = after
+        # Lower code = better tier
+        events["direction"] = np.where(before < 0, UNKNOWN, np.where(after < before, ROTATION_IN, ROTATION_OUT))
+
+        return RotationEvents(events, self.sectors, self.labels)
+
+
+class RotationEvents:
+    def __init__(self, events: np.ndarray, sectors, labels):
+        """
+        events: structured array with EVENT_DTYPE, sorted by date
+        sectors / labels: tables the sector and tier codes index into
+        """
+        self._events = events
+        self._size = len(events)
+        self.sectors = pd.Index(sectors)
+        self.labels = list(labels)
+
+    @property
+    def events(self) -> np.ndarray:
+        return self._events[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, other: "RotationEvents"):
+        """
+        Append events dated after the current last one (amortized O(new events)).
+        """
+        needed = self._size + len(other)
+        if needed > len(self._events):
+            grown = np.empty(max(16, needed, 2 * len(self._events)), dtype=EVENT_DTYPE)
+            grown[:self._size] = self.events
+            self._events = grown
+
+        self._events[self._size:needed] = other.events
+        self._size = needed
+
+    def query(self, sector=None, start=None, end=None, direction=None) -> "RotationEvents":
+        """
+        sector: name or list of names
+        start / end: date range (inclusive)
+        direction: ROTATION_IN / ROTATION_OUT / UNKNOWN, or its name ("Rotation IN", ...)
+        """
+        lo, hi = date_bounds(self.events["date"], start, end)
+        events = self.events[lo:hi]
+
+        if sector is not None:
+            names = [sector] if isinstance(sector, str) else list(sector)
+            events = events[np.isin(events["sector"], self.sectors.get_indexer(names))]
+
+        if direction is not None:
+            if isinstance(direction, str):
+                direction = {name: code for code, name in DIRECTION_NAMES.items()}[direction]
+            events = events[events["direction"] == direction]
+
+        return RotationEvents(events, self.sectors, self.labels)
+
+    def counts(self) -> dict:
+        """
+        Number of events per direction name.
+        """
+        codes, counts = np.unique(self.events["direction"], return_counts=True)
+        return {DIRECTION_NAMES[int(c)]: int(n) for c, n in zip(codes, counts)}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per event with categorical sector / from / to / direction.
+        """
+        directions = [DIRECTION_NAMES[c] for c in sorted(DIRECTION_NAMES)]
+        return pd.DataFrame({
+            "date": pd.DatetimeIndex(self.events["date"]),
+            "sector": pd.Categorical.from_codes(self.events["sector"], categories=self.sectors),
+            "from": pd.Categorical.from_codes(self.events["from"], categories=self.labels),
+            "to": pd.Categorical.from_codes(self.events["to"], categories=self.labels),
+            "direction": pd.Categorical.from_codes(self.events["direction"] - ROTATION_OUT, categories=directions),
+        })
+
+    def to_records(self) -> list:
+        """
+        Legacy layout: list of {"date", "sector", "from", "to", "direction"} dicts.
+        """
+        labels = np.asarray(self.labels + [None], dtype=object)
+        sectors = np.asarray(self.sectors, dtype=object)
+        return [
+            {
+                "date": str(date),
+                "sector": sectors[sector],
+                "from": labels[before],
+                "to": labels[after],
+                "direction": DIRECTION_NAMES[int(direction)],
+            }
+            for date, sector, before, after, direction in self.events.tolist()
+        ]
@@ -0,0 +1,192 @@
+import itertools
+import numpy as np
+
+# -----------------------------
+# Stable cluster identities
+# -----------------------------
+# K-Means cluster ids are arbitrary per window, and ranking clusters by mean
+# short-term return flips tiers whenever two clusters' means cross by noise.
+# ClusterTracker follows clusters through time instead:
+#   1. each window's centroids are matched to the previous window's by a
+#      minimum-cost assignment on standardized centroid distances, and
+#      matched clusters keep the previous cluster's stable id;
+#   2. a cluster keeps its performance tier unless the tiers are out of order
+#      by more than `hysteresis` x (best - worst cluster mean return), in
+#      which case the window is re-ranked from scratch.
+# hysteresis=0 gives the same tiers as ranking every window independently.
+
+DEFAULT_HYSTERESIS = 0.1
+
+# Up to this many clusters the assignment is solved by vectorized enumeration
+# of permutations over all windows at once; above it, per window with scipy
+_MAX_ENUMERATED_CLUSTERS = 6
+
+
+def cluster_means(values: np.ndarray, labels: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    Per (window, cluster) mean of the last axis of `values`.
+
+    values: (windows x points) or (windows x points x features)
+    labels: (windows x points) cluster ids, -1 for masked points
+    Returns (windows x n_clusters [x features]); NaN for empty clusters
+    """
+    squeeze = values.ndim == 2
+    if squeeze:
+        values = values[:, :, None]
+
+    n_windows, _, n_features = values.shape
+    valid = labels >= 0
+    flat = (np.arange(n_windows)[:, None] * n_clusters + labels)[valid]
+    size = n_windows * n_clusters
+
+    counts = np.bincount(flat, minlength=size)
+    points = np.nan_to_num(values[valid].astype("float64"))
+    sums = np.stack([np.bincount(flat, weights=points[:, f], minlength=size) for f in range(n_features)], axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts[:, None] > 0, sums / counts[:, None], np.nan)
+    means = means.reshape(n_windows, n_clusters, n_features)
+    return means[:, :, 0] if squeeze else means
+
+
+def feature_scales(values: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """
+    Per-window standard deviation of each feature over the clustered points
+    (windows x features); 1 where it is zero or undefined.
+    """
+    valid = (labels >= 0)[:, :, None]
+    counts = valid.sum(axis=1)
+    filled = np.where(valid, values, 0.0).astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = filled.sum(axis=1) / counts
+        var = np.where(valid, (values - mean[:, None, :]) ** 2, 0.0).sum(axis=1) / counts
+    scale = np.sqrt(var)
+    return np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+
+
+def _assign(cost: np.ndarray) -> np.ndarray:
+    """
+    Minimum-cost perfect matching per window.
+    cost: (windows x k x k), rows = previous clusters, columns = new clusters
+    Returns (windows x k): column matched to each row.
+    """
+    n_windows, k, _ = cost.shape
+    if k <= _MAX_ENUMERATED_CLUSTERS:
+        perms = np.array(list(itertools.permutations(range(k))))
+        # total[w, p] = sum_i cost[w, i, perms[p, i]]
+        total = cost[:, np.arange(k)[None, :], perms].sum(axis=2)
+        return perms[total.argmin(axis=1)]
+
+    from scipy.optimize import linear_sum_assignment
+    assignment = np.empty((n_windows, k), dtype=np.int64)
+    for w in range(n_windows):
+        rows, cols = linear_sum_assignment(cost[w])
+        assignment[w, rows] = cols
+    return assignment
+
+
+def _rank(means: np.ndarray) -> np.ndarray:
+    """
+    Tier of each cluster by mean return (0 = best; empty clusters last).
+    """
+    order = np.argsort(-np.where(np.isnan(means), -np.inf, means), kind="stable")
+    tiers = np.empty(len(means), dtype=np.int64)
+    tiers[order] = np.arange(len(means))
+    return tiers
+
+
+class ClusterTracker:
+    def __init__(self, n_clusters: int, hysteresis: float = DEFAULT_HYSTERESIS):
+        """
+        hysteresis: fraction of the spread of cluster mean returns by which
+                    the current tiers must be out of order before they change
+        """
+        self.n_clusters = n_clusters
+        self.hysteresis = hysteresis
+
+        # Previous window, indexed by stable id: centroids (feature units) and tiers
+        self.centers = None
+        self.tiers = None
+
+    def reset(self):
+        self.centers = None
+        self.tiers = None
+
+    def update(self, centers: np.ndarray, means: np.ndarray, scale: np.ndarray):
+        """
+        One window. centers: (k x features) centroid of each K-Means cluster,
+        means: (k,) mean short-term return, scale: (features,) used to
+        standardize centroid distances.
+        Returns (stable id, tier) of each K-Means cluster.
+        """
+        ids, tiers = self.update_batch(centers[None], means[None], scale[None])
+        return ids[0], tiers[0]
+
+    def update_batch(self, centers: np.ndarray, means: np.ndarray, scales: np.ndarray):
+        """
+        Consecutive windows: centers (windows x k x features), means
+        (windows x k), scales (windows x features).
+        Returns (stable ids, tiers), both (windows x k), per K-Means cluster.
+        """
+        n_windows, k, _ = centers.shape
+
+        # Match every window to its predecessor in one vectorized solve;
+        # the first is matched to the tracker's state
+        first = self.centers if self.centers is not None else centers[0]
+        previous = np.concatenate([first[None], centers[:-1]])
+        diff = (previous[:, :, None, :] - centers[:, None, :, :]) / scales[:, None, None, :]
+        cost = np.nan_to_num((diff ** 2).sum(axis=3), nan=1e12)
+        assignment = _assign(cost)
+
+        ids = np.empty((n_windows, k), dtype=np.int64)
+        tiers = np.empty((n_windows, k), dtype=np.int64)
+        prev_ids = np.arange(k)
+        prev_tiers = self.tiers
+
+        for w in range(n_windows):
+            ranked = _rank(means[w])
+            if prev_tiers is None:
+                # No history: stable ids start as the tiers (0 = best)
+                ids[w] = ranked
+                tiers[w] = ranked
+            else:
+                ids[w, assignment[w]] = prev_ids
+                kept = prev_tiers[ids[w]]
+                tiers[w] = ranked if self._reorder(kept, means[w]) else kept
+
+            prev_ids = ids[w]
+            prev_tiers = np.empty(k, dtype=np.int64)
+            prev_tiers[ids[w]] = tiers[w]
+
+        self.tiers = prev_tiers
+        self.centers = np.empty_like(centers[-1])
+        self.centers[ids[-1]] = centers[-1]
+        return ids, tiers
+
+    def _reorder(self, tiers: np.ndarray, means: np.ndarray) -> bool:
+        """
+        Whether the kept tiers are out of order by more than the hysteresis.
+        """
+        if not np.isfinite(means).all():
+            return True
+
+        spread = means.max() - means.min()
+        # worse[a, b]: cluster a currently ranks above cluster b
+        worse = tiers[:, None] < tiers[None, :]
+        overtaken = means[None, :] - means[:, None] > self.hysteresis * spread
+        return bool((worse & overtaken).any())
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def to_arrays(self, prefix: str = "tracker_") -> dict:
+        return {
+            prefix + "centers": np.empty((0, 0)) if self.centers is None else self.centers,
+            prefix + "tiers": np.empty(0, dtype=np.int64) if self.tiers is None else self.tiers,
+        }
+
+    def restore(self, arrays, prefix: str = "tracker_"):
+        centers, tiers = arrays[prefix + "centers"], arrays[prefix + "tiers"]
+        self.centers = np.array(centers, dtype="float64") if centers.size else None
+        self.tiers = np.array(tiers, dtype=np.int64) if tiers.size else None
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+from models.rotation_flow import iter_daily_flows
+
+# -----------------------------
+# Rotation flow graph
+# -----------------------------
+# Daily rotation flows kept as one sparse sectors x sectors matrix per day:
+# (source, target, weight) triplets sorted by day, with day_ptr[d]:day_ptr[d + 1]
+# locating day d (the layout of a CSR matrix whose rows are days).
+#
+# Dense prefix sums are checkpointed every `block` days, so the flows over
+# any date range are two checkpoints plus at most two partial blocks of
+# triplets: the cost does not grow with the length of the range. `block` is
+# 1 (a prefix sum per day) unless that would exceed CHECKPOINT_CELLS.
+#
+# Flow weights are sums of half-integer rank changes, so every total is exact.
+
+CHECKPOINT_CELLS = 8_000_000
+
+
+class FlowGraph:
+    def __init__(self, sectors, dates, day_ptr: np.ndarray, source: np.ndarray, target: np.ndarray,
+                 weight: np.ndarray, block: int = None):
+        """
+        sectors: node names; source / target index into them
+        dates: one per day (the day a flow happened)
+        day_ptr: (days + 1,) offsets of each day's triplets
+        block: days between prefix-sum checkpoints; sized from CHECKPOINT_CELLS by default
+        """
+        self.sectors = pd.Index(sectors)
+        self.dates = pd.DatetimeIndex(dates)
+        self.day_ptr = day_ptr
+        self.source = source
+        self.target = target
+        self.weight = weight
+
+        n_days, n_cells = len(self.dates), len(self.sectors) ** 2
+        if block is None:
+            block = max(1, -(-(n_days + 1) * n_cells // CHECKPOINT_CELLS))
+        self.block = block
+
+        # checkpoints[b] = flows of days [0, b * block)
+        n_checkpoints = n_days // block + 1
+        per_block = np.zeros((n_checkpoints, n_cells))
+        if len(self.weight):
+            days = np.repeat(np.arange(n_days), np.diff(day_ptr))
+            cells = (days // block + 1) * n_cells + self._cells(0, len(self.weight))
+            in_range = days // block + 1 < n_checkpoints
+            per_block = np.bincount(cells[in_range], weights=self.weight[in_range],
+                                    minlength=n_checkpoints * n_cells).reshape(n_checkpoints, n_cells)
+        self._checkpoints = np.cumsum(per_block, axis=0)
+
+    @classmethod
+    def from_rolling_strength(cls, rolling_strength: pd.DataFrame, chunk_size: int = None,
+                              block: int = None) -> "FlowGraph":
+        """
+        Daily flows of models/rotation_flow.py; day i is the move from row i to
+        row i + 1 of rolling_strength, dated with row i + 1.
+        """
+        days, sources, targets, weights = [], [], [], []
+        offset = 0
+        for chunk_dates, daily in iter_daily_flows(rolling_strength, chunk_size):
+            day, src, tgt = np.nonzero(daily)
+            days.append(day + offset)
+            sources.append(src.astype(np.int32))
+            targets.append(tgt.astype(np.int32))
+            weights.append(daily[day, src, tgt])
+            offset += len(chunk_dates)
+
+        n_days = max(0, len(rolling_strength) - 1)
+        day = np.concatenate(days) if days else np.empty(0, dtype=np.int64)
+        day_ptr = np.zeros(n_days + 1, dtype=np.int64)
+        np.cumsum(np.bincount(day, minlength=n_days), out=day_ptr[1:])
+
+        return cls(
+            rolling_strength.columns, rolling_strength.index[1:], day_ptr,
+            np.concatenate(sources) if sources else np.empty(0, dtype=np.int32),
+            np.concatenate(targets) if targets else np.empty(0, dtype=np.int32),
+            np.concatenate(weights) if weights else np.empty(0),
+            block,
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _cells(self, lo: int, hi: int) -> np.ndarray:
+        return self.source[lo:hi].astype(np.int64) * len(self.sectors) + self.target[lo:hi]
+
+    # -----------------------------
+    # Range aggregation
+    # -----------------------------
+
+    def bounds(self, start=None, end=None):
+        """
+        Day range [lo, hi) of the dates in [start, end].
+        """
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return int(lo), int(max(lo, hi))
+
+    def _prefix(self, day: int) -> np.ndarray:
+        """
+        Flows of days [0, day), flattened (sectors * sectors).
+        """
+        b = day // self.block
+        total = self._checkpoints[b].copy()
+        lo, hi = self.day_ptr[b * self.block], self.day_ptr[day]
+        if hi > lo:
+            total += np.bincount(self._cells(lo, hi), weights=self.weight[lo:hi], minlength=len(total))
+        return total
+
+    def matrix(self, lo: int = 0, hi: int = None) -> np.ndarray:
+        """
+        Flows summed over days [lo, hi) as a dense (sectors x sectors) array,
+        rows = source.
+        """
+        hi = len(self) if hi is None else hi
+        n = len(self.sectors)
+        return (self._prefix(hi) - self._prefix(lo)).reshape(n, n)
+
+    def flow_matrix(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Same layout as compute_rotation_flow_matrix, over the days in [start, end].
+        """
+        return pd.DataFrame(self.matrix(*self.bounds(start, end)), index=self.sectors, columns=self.sectors)
+
+    def sparse(self, lo: int = 0, hi: int = None):
+        """
+        Flows over days [lo, hi) as a scipy.sparse CSR matrix.
+        """
+        from scipy.sparse import csr_matrix
+        hi = len(self) if hi is None else hi
+        a, b = self.day_ptr[lo], self.day_ptr[hi]
+        n = len(self.sectors)
+        # Duplicate (source, target) entries are summed on conversion
+        return csr_matrix((self.weight[a:b], (self.source[a:b], self.target[a:b])), shape=(n, n))
+
+    # -----------------------------
+    # Graph metrics
+    # -----------------------------
+
+    def net_inflow(self, lo: int = 0, hi: int = None) -> pd.DataFrame:
+        """
+        Per sector: flow received, flow sent and their difference over days
+        [lo, hi), sorted by net inflow (largest first).
+        """
+        matrix = self.matrix(lo, hi)
+        inflow, outflow = matrix.sum(axis=0), matrix.sum(axis=1)
+        df = pd.DataFrame({"sector": self.sectors, "inflow": inflow, "outflow": outflow,
+                           "net": inflow - outflow})
+        return df.sort_values("net", ascending=False, kind="stable", ignore_index=True)
+
+    def top_flows(self, lo: int = 0, hi: int = None, k: int = 10) -> pd.DataFrame:
+        """
+        The k largest (source, target, weight) flows over days [lo, hi).
+        """
+        matrix = self.matrix(lo, hi).ravel()
+        k = min(k, int((matrix > 0).sum()))
+        top = np.argpartition(-matrix, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+        top = top[np.argsort(-matrix[top], kind="stable")]
+
+        n = len(self.sectors)
+        return pd.DataFrame({
+            "source": self.sectors.to_numpy()[top // n],
+            "target": self.sectors.to_numpy()[top % n],
+            "weight": matrix[top],
+        })
+
+    def path_persistence(self, path, lo: int = 0, hi: int = None) -> dict:
+        """
+        How consistently money moved along `path` (sector names, e.g.
+        ["Energy", "Utilities", "Technology"]) over days [lo, hi). A sector
+        cannot gain and lose on the same day, so the path is followed one hop
+        per day: it starts on day d when hop i carried flow on day d + i.
+        Returns, over the possible start days, how many followed the path,
+        their share and the longest run of consecutive ones, plus the share
+        of days each hop carried flow.
+        """
+        hi = len(self) if hi is None else hi
+        nodes = self.sectors.get_indexer(path)
+        if len(nodes) < 2 or (nodes < 0).any():
+            raise KeyError(f"Path needs at least two known sectors: {list(path)}")
+
+        n_days = hi - lo
+        a, b = self.day_ptr[lo], self.day_ptr[hi]
+        days = np.repeat(np.arange(n_days), np.diff(self.day_ptr[lo:hi + 1]))
+        cells = self._cells(a, b)
+
+        hops = np.zeros((len(nodes) - 1, n_days), dtype=bool)
+        for i, (src, tgt) in enumerate(zip(nodes[:-1], nodes[1:])):
+            hops[i, days[cells == src * len(self.sectors) + tgt]] = True
+
+        n_starts = max(0, n_days - len(hops) + 1)
+        followed = np.ones(n_starts, dtype=bool)
+        for i, hop in enumerate(hops):
+            followed &= hop[i:i + n_starts]
+
+        # Longest run of consecutive True
+        padded = np.concatenate([[False], followed, [False]]).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        longest = int((edges[1::2] - edges[::2]).max()) if len(edges) else 0
+
+        return {
+            "path": list(path),
+            "days": int(n_starts),
+            "active_days": int(followed.sum()),
+            "persistence": float(followed.mean()) if n_starts else 0.0,
+            "longest_run": longest,
+            "hop_persistence": (hops.mean(axis=1) if n_days else np.zeros(len(hops))).tolist(),
+        }
@@ -1,27 +1,211 @@
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
+from models.batched_kmeans import batched_kmeans
+from models.cluster_matching import ClusterTracker, cluster_means, feature_scales
+
+PERFORMANCE_LABELS = ["Outperforming", "Neutral", "Underperforming"]
+
+
+def performance_labels(n_clusters: int) -> list:
+    """
+    Labels for clusters ranked by mean short-term return, best first.
+    Three clusters use PERFORMANCE_LABELS; with more, the middle tiers are
+    numbered ("Neutral 1" is the better one).
+    """
+    if n_clusters == 1:
+        return ["Neutral"]
+    if n_clusters == 3:
+        return list(PERFORMANCE_LABELS)
+
+    middle = [f"Neutral {i}" for i in range(1, n_clusters - 1)]
+    return ["Outperforming"] + middle + ["Underperforming"]
+
+
+class _CentroidModel:
+    """
+    Result of a warm-started Lloyd run; exposes the parts of the KMeans API
+    the rest of SectorKMeans relies on.
+    """
+
+    def __init__(self, cluster_centers, labels, inertia):
+        self.cluster_centers_ = cluster_centers
+        self.labels_ = labels
+        self.inertia_ = inertia
+
+    def predict(self, scaled_features):
+        distances = ((scaled_features[:, None, :] - self.cluster_centers_[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+
+def _lloyd(scaled_features, centers, max_iter, tol=1e-6):
+    """
+    Plain Lloyd iterations from the given initial centers.
+    An empty cluster is reseeded on the point farthest from its own center,
+    the same relocation rule sklearn uses.
+    """
+    centers = centers.copy()
+    for _ in range(max_iter):
+        distances = ((scaled_features[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        own_distance = distances[np.arange(len(labels)), labels]
+
+        new_centers = centers.copy()
+        for k in range(len(centers)):
+            members = labels == k
+            if members.any():
+                new_centers[k] = scaled_features[members].mean(axis=0)
+            else:
+                far = own_distance.argmax()
+                new_centers[k] = scaled_features[far]
+                labels[far] = k
+                own_distance[far] = 0.0
+
+        shift = ((new_centers - centers) ** 2).sum()
+        centers = new_centers
+        if shift <= tol:
+            break
+
+    distances = ((scaled_features[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    labels = distances.argmin(axis=1)
+    inertia = float(distances[np.arange(len(labels)), labels].sum())
+    return _CentroidModel(centers, labels, inertia)
+
+
 class SectorKMeans:
-    def __init__(self, n_clusters=3, random_state=42):
+    def __init__(self, n_clusters=3, random_state=42, warm_start=False,
+                 warm_max_iter=10, restart_tolerance=0.25, backend="sklearn", hysteresis=None):
+        """
+        backend: "sklearn" or "numpy". Only affects fit_predict_batch: "numpy"
+                 clusters all windows together with the batched kernel in
+                 models/batched_kmeans.py; "sklearn" fits them one by one.
+        warm_start: temporal mode for consecutive, overlapping windows. Each fit
+                    is seeded with the previous fit's centroids (one init, at most
+                    warm_max_iter Lloyd iterations) instead of a 10-init restart.
+        restart_tolerance: fall back to a full restart when the warm fit's inertia
+                           is more than this fraction above the previous window's.
+        hysteresis: track clusters across consecutive windows (see
+                    models/cluster_matching.py): 'cluster' becomes a stable id and
+                    tiers only change when out of order by more than this fraction
+                    of the spread of cluster returns. None labels every window
+                    independently.
+        """
+        if backend not in ("sklearn", "numpy"):
+            raise ValueError(f"Unknown clustering backend: {backend}")
+
         self.n_clusters = n_clusters
         self.random_state = random_state
+        self.backend = backend
+        self.performance_labels = performance_labels(n_clusters)
+
+        # sklearn is imported here rather than at module level so the API can
+        # import this module without paying for it at startup
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.cluster import KMeans
         self.scaler = StandardScaler()
         self.model = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
 
+        self.warm_start = warm_start
+        self.warm_max_iter = warm_max_iter
+        self.restart_tolerance = restart_tolerance
+
+        # Temporal state: previous centroids in original feature units
+        self._prev_centers = None
+        self._prev_inertia = None
+        self.n_restarts = 0
+        self.n_warm_fits = 0
+
+        self.tracker = None if hysteresis is None else ClusterTracker(n_clusters, hysteresis)
+        # Columns the last fit clustered on (centroids for the tracker)
+        self._feature_columns = None
+
+    def reset(self):
+        """
+        Forget temporal state so the next fit is a full restart.
+        """
+        self._prev_centers = None
+        self._prev_inertia = None
+        if self.tracker is not None:
+            self.tracker.reset()
+
+    def warm_state(self) -> dict:
+        """
+        Temporal state (previous centroids in feature units and their inertia),
+        for persisting a warm-started model.
+        """
+        return {"centers": self._prev_centers, "inertia": self._prev_inertia}
+
+    def restore_warm_state(self, centers, inertia):
+        self._prev_centers = None if centers is None else np.asarray(centers, dtype="float64")
+        self._prev_inertia = None if inertia is None else float(inertia)
+
+    def _standardize(self, feature_df: pd.DataFrame):
+        """
+        Z-score the features. In warm-start mode the scaler statistics are
+        refreshed directly from the window (no sklearn validation overhead).
+        """
+        if not self.warm_start:
+            return self.scaler.fit_transform(feature_df)
+
+        values = np.asarray(feature_df, dtype="float64")
+        mean = values.mean(axis=0)
+        var = values.var(axis=0)
+        scale = np.sqrt(var)
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+
+        # Keep the fitted-scaler interface (transform / inverse_transform) working
+        self.scaler.mean_, self.scaler.var_, self.scaler.scale_ = mean, var, scale
+        self.scaler.n_features_in_ = values.shape[1]
+        self.scaler.n_samples_seen_ = values.shape[0]
+        if isinstance(feature_df, pd.DataFrame):
+            self.scaler.feature_names_in_ = np.asarray(feature_df.columns, dtype=object)
+
+        return (values - mean) / scale
+
+    def _fit_scaled(self, scaled_features):
+        """
+        Fit K-Means on standardized features, warm-starting when possible.
+        Returns labels.
+        """
+        can_warm = (
+            self.warm_start
+            and self._prev_centers is not None
+            and self._prev_centers.shape[1] == scaled_features.shape[1]
+            and len(scaled_features) >= self.n_clusters
+        )
+
+        if can_warm:
+            # Previous centroids mapped into this window's standardized space
+            init = (self._prev_centers - self.scaler.mean_) / self.scaler.scale_
+            model = _lloyd(scaled_features, init, self.warm_max_iter)
+
+            if model.inertia_ <= self._prev_inertia * (1 + self.restart_tolerance) + 1e-12:
+                self.n_warm_fits += 1
+                return self._remember(model, model.labels_)
+
+        # Full restart
+        from sklearn.cluster import KMeans
+        model = KMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init=10)
+        labels = model.fit_predict(scaled_features)
+        self.n_restarts += 1
+        return self._remember(model, labels)
+
+    def _remember(self, model, labels):
+        self.model = model
+        if self.warm_start:
+            self._prev_centers = model.cluster_centers_ * self.scaler.scale_ + self.scaler.mean_
+            self._prev_inertia = model.inertia_
+        return labels
+
     def fit(self, feature_df: pd.DataFrame):
         """
         feature_df: rows = sectors, columns = features
         """
 
         # 1. Standardize features (Z-score)
-        scaled_features = self.scaler.fit_transform(feature_df)
+        scaled_features = self._standardize(feature_df)
 
         # 2. Fit K-Means
-        self.model.fit(scaled_features)
+        self._fit_scaled(scaled_features)
 
         return self
 
@@ -40,16 +224,80 @@ class SectorKMeans:
         Convenience method: fit + predict
         """
 
-        scaled_features = self.scaler.fit_transform(feature_df)
-        labels = self.model.fit_predict(scaled_features)
+        scaled_features = self._standardize(feature_df)
+        labels = self._fit_scaled(scaled_features)
 
         return labels
 
+    def fit_predict_batch(self, values: np.ndarray, mask: np.ndarray = None):
+        """
+        Cluster many windows at once.
+
+        values: array (windows x sectors x features)
+        mask: bool array (windows x sectors); defaults to sectors without NaNs
+        Returns labels (windows x sectors), -1 for masked sectors
+        (raw K-Means ids; see stable_codes_batch)
+        """
+        values = np.asarray(values)
+        if mask is None:
+            mask = ~np.isnan(values).any(axis=2)
+
+        if self.backend == "numpy":
+            labels, _, _ = batched_kmeans(values, self.n_clusters, mask=mask,
+                                          random_state=self.random_state)
+            return labels
+
+        labels = np.full(mask.shape, -1)
+        for w in range(len(values)):
+            labels[w, mask[w]] = self.fit_predict(values[w][mask[w]].astype("float64"))
+        return labels
+
+    def performance_codes_batch(self, labels: np.ndarray, ret_short: np.ndarray):
+        """
+        Vectorized label_clusters_by_performance for many windows.
+
+        labels: (windows x sectors) cluster ids, -1 for masked sectors
+        ret_short: (windows x sectors)
+        Returns (windows x sectors) indices into self.performance_labels, -1 where masked
+        """
+        valid = labels >= 0
+        means = cluster_means(ret_short, labels, self.n_clusters)
+        means = np.where(np.isnan(means), -np.inf, means)
+
+        # rank[w, cluster] = position of the cluster when sorted by mean return (desc)
+        order = np.argsort(-means, axis=1, kind="stable")
+        rank = np.argsort(order, axis=1)
+
+        codes = np.take_along_axis(rank, np.maximum(labels, 0), axis=1)
+        return np.where(valid, codes, -1)
+
+    def stable_codes_batch(self, labels: np.ndarray, values: np.ndarray, ret_short: np.ndarray):
+        """
+        performance_codes_batch for consecutive windows, through the tracker
+        when hysteresis is set (continuing from the previous call).
+
+        values: (windows x sectors x features) the windows were clustered on
+        Returns (cluster ids, tier codes), both (windows x sectors), -1 where
+        masked; ids are stable across windows when tracking.
+        """
+        if self.tracker is None:
+            return labels, self.performance_codes_batch(labels, ret_short)
+
+        centers = cluster_means(values, labels, self.n_clusters)
+        means = cluster_means(ret_short, labels, self.n_clusters)
+        ids, tiers = self.tracker.update_batch(centers, means, feature_scales(values, labels))
+
+        valid = labels >= 0
+        raw = np.maximum(labels, 0)
+        return (np.where(valid, np.take_along_axis(ids, raw, axis=1), -1),
+                np.where(valid, np.take_along_axis(tiers, raw, axis=1), -1))
+
     def get_clustered_dataframe(self, feature_df: pd.DataFrame):
         """
         Returns feature_df with an added 'cluster' column
         """
 
+        self._feature_columns = list(feature_df.columns)
         labels = self.fit_predict(feature_df)
 
         clustered_df = feature_df.copy()
@@ -76,53 +324,39 @@ class SectorKMeans:
     def label_clusters_by_performance(self,clustered_df):
         """
         Adds a 'performance' column based on mean short-term return per cluster
+        (self.performance_labels, best cluster first)
+        With hysteresis set, 'cluster' is replaced by the stable id and tiers
+        carry over from the previous window (see models/cluster_matching.py).
         """
-        cluster_means = clustered_df.groupby("cluster")["ret_short"].mean()
-        sorted_clusters = cluster_means.sort_values(ascending=False).index.tolist()
-        performance_map = {
-            sorted_clusters[0]: "Outperforming",
-            sorted_clusters[1]: "Neutral",
-            sorted_clusters[2]: "Underperforming"
-        }
+        if self.tracker is not None:
+            return self._label_tracked(clustered_df)
+
+        return_means = clustered_df.groupby("cluster")["ret_short"].mean()
+        sorted_clusters = return_means.sort_values(ascending=False).index.tolist()
+        performance_map = dict(zip(sorted_clusters, self.performance_labels))
         clustered_df["performance"] = clustered_df["cluster"].map(performance_map)
         return clustered_df
 
-    def plot_clusters(self, clustered_df: pd.DataFrame):
-        if "performance" not in clustered_df.columns:
-            clustered_df = self.label_clusters_by_performance(clustered_df)
+    def _label_tracked(self, clustered_df):
+        columns = self._feature_columns or [c for c in clustered_df.columns if c not in ("cluster", "performance")]
+        raw = clustered_df["cluster"].to_numpy()
+        labels = raw[None, :]
+        values = clustered_df[columns].to_numpy(dtype="float64")[None]
 
-        df = clustered_df.reset_index().rename(columns={"index": "sector"})
-
-        # Plot 3D scatter
-        fig = px.scatter_3d(
-            df,
-            x="ret_short",
-            y="rel_strength",
-            z="volatility",
-            color="performance",       # use human-readable labels
-            text="sector",             # sector names on points
-            title="Sector Clusters Labeled by Performance",
-            color_discrete_map={
-                "Outperforming": "green",
-                "Neutral": "yellow",
-                "Underperforming": "red"
-            },
-            labels={
-                "ret_short": "Short-Term Return",
-                "rel_strength": "Relative Strength",
-                "volatility": "Volatility",
-                "performance": "Cluster Performance"
-            },
-            hover_data={"cluster": True, "ret_medium": True}  # optional extra info
-        )
+        centers = cluster_means(values, labels, self.n_clusters)[0]
+        means = cluster_means(clustered_df["ret_short"].to_numpy(dtype="float64")[None], labels, self.n_clusters)[0]
+        ids, tiers = self.tracker.update(centers, means, feature_scales(values, labels)[0])
 
-        fig.update_traces(marker=dict(size=8), textposition="top center")
-        fig.update_layout(
-            width=1000,
-            height=800,
-            template="plotly_dark",
-            legend_title="Performance"
-        )
+        clustered_df["cluster"] = ids[raw].astype(raw.dtype)
+        clustered_df["performance"] = np.asarray(self.performance_labels, dtype=object)[tiers[raw]]
+        return clustered_df
 
-        fig.show()
-        fig.update_layout(template="plotly_dark")
\ No newline at end of file
+    def plot_clusters(self, clustered_df: pd.DataFrame):
+        """
+        3D scatter of the clusters (visualization/cluster_plot.py, imported on first use).
+        """
+        from visualization.cluster_plot import plot_clusters
+
+        if "performance" not in clustered_df.columns:
+            clustered_df = self.label_clusters_by_performance(clustered_df)
+        return plot_clusters(clustered_df)
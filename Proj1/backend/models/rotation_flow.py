@@ -1,6 +1,5 @@
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from data.dataGetter import get_sector_prices, get_market_prices
 # -----------------------------
 # Core Calculations
 # -----------------------------
@@ -28,85 +27,164 @@ def compute_rolling_strength(rel_strength: pd.DataFrame, window: int = 5) -> pd.
     rolling = rel_strength.rolling(window=window).mean().dropna()
     return rolling
 
-def compute_rotation_flow(rolling_strength: pd.DataFrame) -> pd.DataFrame:
+def compute_rolling_strengths(rel_strength: pd.DataFrame, windows) -> dict:
     """
-    Detect capital rotation between consecutive rolling windows using rank changes.
-    
-    Returns a DataFrame with columns: source, target, weight
+    compute_rolling_strength for several windows (horizons) at once, from a
+    single cumulative sum of the relative strength.
+
+    Returns window -> DataFrame with the same rows as compute_rolling_strength
+    (a window containing a NaN is NaN, and rows with any NaN are dropped).
+    """
+    values = rel_strength.to_numpy(dtype="float64")
+    n_dates, n_sectors = values.shape
+    missing = np.isnan(values)
+
+    # Centered per sector so differences of long cumulative sums stay precise
+    counts = (~missing).sum(axis=0)
+    center = np.where(counts > 0, np.where(missing, 0.0, values).sum(axis=0) / np.maximum(counts, 1), 0.0)
+
+    csum = np.zeros((n_dates + 1, n_sectors))
+    np.cumsum(np.where(missing, 0.0, values - center), axis=0, out=csum[1:])
+    cmissing = np.zeros((n_dates + 1, n_sectors), dtype=np.int64)
+    np.cumsum(missing, axis=0, out=cmissing[1:])
+
+    strengths = {}
+    for window in windows:
+        window = int(window)
+        if window < 1:
+            raise ValueError(f"Rolling window must be at least 1, got {window}")
+        if window > n_dates:
+            strengths[window] = pd.DataFrame(columns=rel_strength.columns, index=rel_strength.index[:0],
+                                             dtype="float64")
+            continue
+
+        # Row i covers dates [i, i + window), labelled with its last date
+        means = (csum[window:] - csum[:-window]) / window + center
+        means[cmissing[window:] - cmissing[:-window] > 0] = np.nan
+
+        rolling = pd.DataFrame(means, index=rel_strength.index[window - 1:], columns=rel_strength.columns)
+        strengths[window] = rolling.dropna()
+
+    return strengths
+
+def rank_descending(values: np.ndarray) -> np.ndarray:
     """
-    flows = []
+    Row-wise descending rank with ties averaged, like
+    DataFrame.rank(axis=1, ascending=False). NaNs stay NaN.
+
+    values: array (dates x sectors)
+    Sort-based, so memory stays O(dates x sectors) for large universes.
+    """
+    n_dates, n_sectors = values.shape
+    missing = np.isnan(values)
+
+    # Descending order with NaNs last
+    keys = np.where(missing, np.inf, -values)
+    order = np.argsort(keys, axis=1, kind="stable")
+    ordered = np.take_along_axis(keys, order, axis=1)
+
+    # Tied runs share the average of their first and last position
+    positions = np.broadcast_to(np.arange(1, n_sectors + 1, dtype="float64"), ordered.shape)
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    last = np.minimum.accumulate(np.where(ends, positions, np.inf)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2, axis=1)
+    ranks[missing] = np.nan
+    return ranks
 
-    dates = rolling_strength.index
+
+def compute_rotation_flow_matrix(rolling_strength: pd.DataFrame, chunk_size: int = None) -> pd.DataFrame:
+    """
+    Rank-change rotation flows accumulated into a dense matrix.
+
+    Returns a DataFrame (sectors x sectors): entry [source, target] is the total
+    weight that moved from `source` (lost rank) to `target` (gained rank),
+    where each day contributes min(rank lost, rank gained) per pair.
+    """
     sectors = rolling_strength.columns
+    matrix = np.zeros((len(sectors), len(sectors)))
+    for _, daily in iter_daily_flows(rolling_strength, chunk_size):
+        matrix += daily.sum(axis=0)
 
-    for i in range(1, len(dates)):
-        prev = rolling_strength.iloc[i - 1]
-        curr = rolling_strength.iloc[i]
-
-        # Rank sectors by relative strength
-        prev_rank = prev.rank(ascending=False)
-        curr_rank = curr.rank(ascending=False)
-
-        # Compute rank change (positive = improved, negative = declined)
-        rank_change = curr_rank - prev_rank
-
-        # Sectors that gained relative strength
-        gaining = rank_change[rank_change < 0].sort_values()  # rank decreased → moved up
-        # Sectors that lost relative strength
-        losing = rank_change[rank_change > 0].sort_values(ascending=False)  # rank increased → moved down
-
-        # Pair losing → gaining sectors
-        for loser in losing.index:
-            for gainer in gaining.index:
-                weight = min(losing[loser], -gaining[gainer])  # use magnitude of rank change
-                if weight > 0:
-                    flows.append({
-                        "source": loser,
-                        "target": gainer,
-                        "weight": float(weight)
-                    })
-
-    flow_df = pd.DataFrame(flows)
-    if flow_df.empty:
-        return pd.DataFrame(columns=["source", "target", "weight"])
-    
-    # Aggregate duplicate flows
-    flow_df = flow_df.groupby(["source", "target"], as_index=False)["weight"].sum()
+    return pd.DataFrame(matrix, index=sectors, columns=sectors)
 
-    return flow_df
 
-# -----------------------------
-# Visualization
-# -----------------------------
+def iter_daily_flows(rolling_strength: pd.DataFrame, chunk_size: int = None):
+    """
+    Each day's contribution to the flow matrix, in chunks of consecutive days.
+    Yields (dates, array (dates x sectors x sectors)); day i holds the flows
+    between the previous row of rolling_strength and the row dated dates[i].
+    """
+    values = rolling_strength.to_numpy()
+    n_dates, n_sectors = values.shape
 
-def plot_sector_to_sector_sankey(flow_df: pd.DataFrame):
+    # Bound the (dates x sectors x sectors) intermediates to a few million cells
+    if chunk_size is None:
+        chunk_size = max(2, 4_000_000 // max(1, n_sectors * n_sectors))
+
+    # Chunks overlap by one date so every consecutive pair is diffed once
+    for lo in range(0, max(0, n_dates - 1), chunk_size - 1):
+        hi = min(lo + chunk_size, n_dates)
+        ranks = rank_descending(values[lo:hi].astype("float64"))
+
+        # Rank change (positive = declined, negative = improved)
+        rank_change = np.nan_to_num(np.diff(ranks, axis=0))
+        losing = np.maximum(rank_change, 0)
+        gaining = np.maximum(-rank_change, 0)
+
+        # Pair every losing sector with every gaining sector
+        yield rolling_strength.index[lo + 1:hi], np.minimum(losing[:, :, None], gaining[:, None, :])
+
+
+def compute_rotation_flow_matrices(rolling_strengths: dict, chunk_size: int = None) -> dict:
     """
-    Plot a Sankey diagram from a rotation flow DataFrame.
+    Flow matrix per horizon: window -> compute_rotation_flow_matrix(strength).
+    rolling_strengths: output of compute_rolling_strengths
     """
-    sector_returns = compute_sector_returns(get_sector_prices())
-    market_returns = get_market_prices().pct_change().dropna()
-    rel_strength = compute_relative_strength(sector_returns, market_returns)
-    flows = []
-    rolling_strength = compute_rolling_strength(rel_strength, window=5)
+    return {window: compute_rotation_flow_matrix(strength, chunk_size)
+            for window, strength in rolling_strengths.items()}
 
-    for i in range(1, len(rolling_strength)):
-        prev = rolling_strength.iloc[i-1]
-        curr = rolling_strength.iloc[i]
 
-        # Rank sectors
-        prev_rank = prev.rank(ascending=False)
-        curr_rank = curr.rank(ascending=False)
+def flow_matrix_to_edges(flow_matrix: pd.DataFrame) -> pd.DataFrame:
+    """
+    Edge list (source, target, weight) of the non-zero flows, sorted by
+    source then target.
+    """
+    matrix = flow_matrix.to_numpy()
+    src, tgt = np.nonzero(matrix > 0)
+    if not len(src):
+        return pd.DataFrame(columns=["source", "target", "weight"])
 
-        # Rank changes
-        rank_change = prev_rank - curr_rank  # positive = gained
-        gained = rank_change[rank_change > 0]
-        lost = rank_change[rank_change < 0]
+    flow_df = pd.DataFrame({
+        "source": flow_matrix.index.to_numpy()[src],
+        "target": flow_matrix.columns.to_numpy()[tgt],
+        "weight": matrix[src, tgt],
+    })
+    return flow_df.sort_values(["source", "target"], ignore_index=True)
 
-        for src in lost.index:
-            for tgt in gained.index:
-                weight = abs(rank_change[src]) + rank_change[tgt]  # sum of magnitude
-                flows.append({"source": src, "target": tgt, "weight": float(weight)})
 
-    flow_df = pd.DataFrame(flows)
-    flow_df = flow_df.groupby(["source", "target"], as_index=False).sum()
-    return flow_df
\ No newline at end of file
+def compute_rotation_flow(rolling_strength: pd.DataFrame) -> pd.DataFrame:
+    """
+    Detect capital rotation between consecutive rolling windows using rank changes.
+    
+    Returns a DataFrame with columns: source, target, weight
+    """
+    return flow_matrix_to_edges(compute_rotation_flow_matrix(rolling_strength))
+
+# -----------------------------
+# Visualization
+# -----------------------------
+
+def plot_sector_to_sector_sankey(flow_df: pd.DataFrame):
+    """
+    See visualization/rotation_sankey.py (imported on first use: plotting is
+    not needed for the computations above).
+    """
+    from visualization.rotation_sankey import plot_sector_to_sector_sankey
+    return plot_sector_to_sector_sankey(flow_df)
@@ -1,33 +1,130 @@
+import numpy as np
 import pandas as pd
-from features.feature_engineering import build_feature_matrix
+from features.rolling_features import build_rolling_features
+from models.cluster_matching import DEFAULT_HYSTERESIS
 from models.kmeans import SectorKMeans
 
-def build_rotation_frames(sector_prices, market_prices, window_size=30):
-    kmeans = SectorKMeans(n_clusters=3)
-    frames = []
+def build_rotation_frames(sector_prices, market_prices, window_size=30, warm_start=False, backend="sklearn",
+                          n_clusters=3, hysteresis=DEFAULT_HYSTERESIS):
+    """
+    warm_start: seed each window's K-Means with the previous window's centroids
+    (see SectorKMeans); much faster and keeps cluster ids stable between frames.
+    backend: "numpy" clusters every window in one batched call instead of
+    one sklearn fit per window.
+    hysteresis: match clusters between consecutive frames so 'cluster' is a
+    stable id and tiers only flip on real moves (models/cluster_matching.py);
+    None labels every frame independently.
+    """
+    if backend == "numpy":
+        # One batched call; no need to split into per-window frames
+        kmeans = SectorKMeans(n_clusters=n_clusters, backend=backend, hysteresis=hysteresis)
+        rolling_features = build_rolling_features(sector_prices, market_prices, window_size)
+        frame, _ = _batched_frame(kmeans, rolling_features, np.arange(len(rolling_features)))
+        return frame
 
-    dates = sector_prices.index
+    frames = list(iter_rotation_frames(sector_prices, market_prices, window_size, warm_start=warm_start,
+                                       n_clusters=n_clusters, hysteresis=hysteresis))
 
-    for i in range(window_size, len(dates)):
-        end_date = dates[i]
-        window_data = sector_prices.iloc[i - window_size:i]
+    rotation_frames_df = pd.concat(frames, ignore_index=True)
+    return rotation_frames_df
 
-        features = build_feature_matrix(window_data, market_prices.loc[window_data.index])
-        clustered_df = kmeans.get_clustered_dataframe(features)
-        clustered_df = kmeans.label_clusters_by_performance(clustered_df)
 
-        # --- SCALE ret_medium for bubble size (CRITICAL FIX) ---
-        min_size = 6
-        max_size = 40
+def iter_rotation_frames(sector_prices, market_prices, window_size=30, start=None, end=None, stride=1,
+                         warm_start=False, backend="sklearn", chunk_size=64, n_clusters=3,
+                         hysteresis=DEFAULT_HYSTERESIS):
+    """
+    Yields one frame (rows = sectors) per window end, as soon as it is computed.
 
-        ret_med = clustered_df["ret_medium"]
-        size_scaled = (ret_med - ret_med.min()) / (ret_med.max() - ret_med.min())
-        clustered_df["size"] = size_scaled * (max_size - min_size) + min_size
+    start / end: only windows whose end date falls in [start, end]
+    stride: keep every stride-th window end
+    chunk_size: windows whose features are computed (and, with the numpy
+                backend, clustered) per step, so memory is bounded by the
+                chunk rather than the range; None = all at once
+    """
+    kmeans = SectorKMeans(n_clusters=n_clusters, warm_start=warm_start, backend=backend, hysteresis=hysteresis)
 
-        clustered_df["date"] = str(end_date.date())
-        clustered_df["sector"] = clustered_df.index
+    # Window k covers rows [k, k + window_size) and is labelled dates[k + window_size]
+    end_dates = sector_prices.index[window_size:]
+    lo = 0 if start is None else end_dates.searchsorted(pd.Timestamp(start))
+    hi = len(end_dates) if end is None else end_dates.searchsorted(pd.Timestamp(end), side="right")
+    selected = np.arange(lo, hi, stride)
 
-        frames.append(clustered_df.reset_index(drop=True))
+    step = chunk_size or max(1, len(selected))
+    for c in range(0, len(selected), step):
+        chunk = selected[c:c + step]
 
-    rotation_frames_df = pd.concat(frames, ignore_index=True)
-    return rotation_frames_df
\ No newline at end of file
+        # Features only for the price rows this chunk's windows need
+        rows = slice(chunk[0], chunk[-1] + window_size + 1)
+        rolling_features = build_rolling_features(sector_prices.iloc[rows], market_prices, window_size)
+        windows = chunk - chunk[0]
+
+        if backend == "numpy":
+            frame, bounds = _batched_frame(kmeans, rolling_features, windows)
+            for w in range(len(bounds) - 1):
+                yield frame.iloc[bounds[w]:bounds[w + 1]].reset_index(drop=True)
+            continue
+
+        for k in windows:
+            yield _window_frame(kmeans, rolling_features, k)
+
+
+def _window_frame(kmeans, rolling_features, k):
+    """
+    One window clustered on its own (sklearn backend).
+    """
+    features = rolling_features.frame(k)
+    clustered_df = kmeans.get_clustered_dataframe(features)
+    clustered_df = kmeans.label_clusters_by_performance(clustered_df)
+
+    # --- SCALE ret_medium for bubble size (CRITICAL FIX) ---
+    min_size = 6
+    max_size = 40
+
+    ret_med = clustered_df["ret_medium"]
+    size_scaled = (ret_med - ret_med.min()) / (ret_med.max() - ret_med.min())
+    clustered_df["size"] = size_scaled * (max_size - min_size) + min_size
+
+    clustered_df["date"] = str(rolling_features.dates[k].date())
+    clustered_df["sector"] = clustered_df.index
+
+    return clustered_df.reset_index(drop=True)
+
+
+def _batched_frame(kmeans, rolling_features, windows):
+    """
+    Same rows as the per-window loop, for a chunk of windows clustered in
+    one batched call and assembled from arrays.
+    Returns (long frame, bounds): rows of window w are bounds[w]:bounds[w + 1].
+    """
+    values = rolling_features.values[windows]
+    labels = kmeans.fit_predict_batch(values)
+    labels, codes = kmeans.stable_codes_batch(labels, values, values[:, :, 0])
+
+    # Sectors with missing features are left out of the frame
+    window_idx, sector_idx = np.nonzero(labels >= 0)
+    rows = values[window_idx, sector_idx]
+
+    # --- SCALE ret_medium for bubble size ---
+    min_size = 6
+    max_size = 40
+
+    ret_med = np.where(labels >= 0, values[:, :, 1], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lo = np.nanmin(ret_med, axis=1, initial=np.inf, where=labels >= 0)
+        hi = np.nanmax(ret_med, axis=1, initial=-np.inf, where=labels >= 0)
+        size_scaled = (ret_med - lo[:, None]) / (hi - lo)[:, None]
+    size = size_scaled * (max_size - min_size) + min_size
+
+    dates = np.array([str(rolling_features.dates[k].date()) for k in windows], dtype=object)
+    sectors = np.asarray(rolling_features.sectors, dtype=object)
+
+    frame = pd.DataFrame(rows, columns=rolling_features.feature_names)
+    frame["cluster"] = labels[window_idx, sector_idx].astype("int32")
+    frame["performance"] = np.asarray(kmeans.performance_labels, dtype=object)[codes[window_idx, sector_idx]]
+    frame["size"] = size[window_idx, sector_idx]
+    frame["date"] = dates[window_idx]
+    frame["sector"] = sectors[sector_idx]
+
+    # Rows are ordered by window
+    bounds = np.searchsorted(window_idx, np.arange(len(windows) + 1))
+    return frame, bounds
@@ -1,92 +1,267 @@
+import copy
+import json
+import os
+import numpy as np
 import pandas as pd
-from typing import Dict, List
+from models.cluster_history import EVENT_DTYPE, ClusterHistory, RotationEvents
+from models.cluster_matching import DEFAULT_HYSTERESIS
 from models.kmeans import SectorKMeans
-from features.feature_engineering import build_feature_matrix
+from features.rolling_features import (
+    CORRELATION_FEATURES, FEATURE_NAMES, RollingFeatures, RollingFeatureState, build_rolling_features
+)
+
+MODEL_FORMAT_VERSION = 2
 
 
 class SectorRotationModel:
-    def __init__(self, window_size=30, n_clusters=3):
+    def __init__(self, window_size=30, n_clusters=3, warm_start=False, backend="sklearn", features=None,
+                 hysteresis=DEFAULT_HYSTERESIS):
         self.window_size = window_size
         self.n_clusters = n_clusters
-        self.kmeans = SectorKMeans(n_clusters=n_clusters)
+        # features: subset of FEATURE_NAMES + CORRELATION_FEATURES to cluster on
+        # (FEATURE_NAMES by default); performance tiers are always ranked by ret_short
+        self.features = list(features or FEATURE_NAMES)
+        unknown = set(self.features) - set(FEATURE_NAMES + CORRELATION_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features: {sorted(unknown)}")
+        # Rolling covariances are only computed when clustered on
+        self.correlation = bool(set(self.features) & set(CORRELATION_FEATURES))
+        # warm_start: seed each window with the previous window's centroids
+        # backend="numpy": cluster all windows in one batched call
+        # hysteresis: follow clusters across windows so tiers only change on real
+        # moves (see models/cluster_matching.py); None ranks every window afresh
+        self.kmeans = SectorKMeans(n_clusters=n_clusters, warm_start=warm_start, backend=backend,
+                                   hysteresis=hysteresis)
+
+        # (dates x sectors) tier codes, see models/cluster_history.py
+        self.cluster_history: ClusterHistory = None
+
+        # Detected rotations (structured array of events)
+        self.rotations: RotationEvents = None
 
-        # date -> {sector -> performance_label}
-        self.cluster_history: Dict[str, Dict[str, str]] = {}
+        # Features of every window clustered by run() (not extended by update())
+        self.rolling_features: RollingFeatures = None
 
-        # List of detected rotations
-        self.rotations: List[dict] = []
+        # Rolling feature state for update(); set by run() / load()
+        self._state: RollingFeatureState = None
 
     def run(self, sector_prices: pd.DataFrame, market_prices: pd.DataFrame):
         """
         Main pipeline: builds rolling windows, clusters each window,
         stores history, and detects rotations.
+        Returns (ClusterHistory, RotationEvents); use .to_dict() / .to_records()
+        for the older dict / list-of-dicts layouts.
         """
 
-        dates = sector_prices.index
+        self.kmeans.reset()
 
-        for i in range(self.window_size, len(dates)):
-            end_date = dates[i]
-            window_data = sector_prices.iloc[i - self.window_size:i]
+        # 1. Build features for every window in one pass
+        rolling_features = build_rolling_features(sector_prices, market_prices, self.window_size,
+                                                  correlation=self.correlation)
+        self.rolling_features = rolling_features
+        self.cluster_history = ClusterHistory(rolling_features.dates, rolling_features.sectors,
+                                              self.kmeans.performance_labels)
+        # Where update() picks up
+        self._state = RollingFeatureState.from_prices(sector_prices, market_prices, self.window_size,
+                                                      self.correlation)
 
-            # 1. Build features for this window
-            features = build_feature_matrix(window_data, market_prices.loc[window_data.index])
+        if self.kmeans.backend == "numpy":
+            self._cluster_batched(rolling_features)
+            self._detect_rotations()
+            return self.cluster_history, self.rotations
 
+        history = self.cluster_history
+        for k in range(len(rolling_features)):
             # 2. Cluster
-            clustered_df = self.kmeans.get_clustered_dataframe(features)
-            clustered_df = self.kmeans.label_clusters_by_performance(clustered_df)
+            columns, codes = self._cluster_window(rolling_features.frame(k))
 
             # 3. Store snapshot
-            snapshot = clustered_df["performance"].to_dict()
-            self.cluster_history[str(end_date.date())] = snapshot
+            history.codes[k, columns] = codes
 
         # 4. Detect rotations after building history
         self._detect_rotations()
 
         return self.cluster_history, self.rotations
 
+    def _cluster_window(self, features: pd.DataFrame):
+        """
+        Cluster one window's feature matrix (rows = sectors).
+        Returns (sector positions, tier codes).
+        """
+        clustered_df = self.kmeans.get_clustered_dataframe(features[self.features])
+        clustered_df["ret_short"] = features["ret_short"]
+        clustered_df = self.kmeans.label_clusters_by_performance(clustered_df)
+
+        history = self.cluster_history
+        return history.sector_codes(clustered_df.index), history.label_codes(clustered_df["performance"])
+
+    def _cluster_batched(self, rolling_features):
+        """
+        Cluster and label every window at once (numpy backend).
+        """
+        selected = [rolling_features.feature_names.index(f) for f in self.features]
+        values = rolling_features.values[:, :, selected]
+        labels = self.kmeans.fit_predict_batch(values)
+        _, codes = self.kmeans.stable_codes_batch(labels, values, rolling_features.values[:, :, 0])
+
+        # Codes already index into kmeans.performance_labels
+        self.cluster_history.codes[:] = codes
+
     def _detect_rotations(self):
         """
         Compare consecutive snapshots to detect sector movement
         """
-        dates = list(self.cluster_history.keys())
+        self.rotations = self.cluster_history.detect_rotations()
+
+    # -----------------------------
+    # Incremental updates
+    # -----------------------------
+
+    def update(self, sector_prices: pd.DataFrame, market_prices: pd.Series) -> RotationEvents:
+        """
+        Append new trading days without recomputing the history.
 
-        for i in range(1, len(dates)):
-            prev_date = dates[i - 1]
-            curr_date = dates[i]
+        Rows dated after the last one seen are pushed through the rolling
+        feature state; only each new window is clustered (warm-started from the
+        previous window when warm_start=True), and only its snapshot and
+        rotations are appended, so a day costs the same however long the
+        history is. With warm_start=True and the sklearn backend the result is
+        the same as run() over the extended history.
+        Returns the rotations added.
+        """
+        self._check_state()
+        added = RotationEvents(np.empty(0, dtype=EVENT_DTYPE), self.cluster_history.sectors,
+                               self.cluster_history.labels)
+        for _, _, _, events in self.iter_update(sector_prices, market_prices):
+            added.extend(events)
+        return added
+
+    def iter_update(self, sector_prices: pd.DataFrame, market_prices: pd.Series):
+        """
+        update() one window at a time: yields (date, features DataFrame,
+        tier codes, RotationEvents) for every window appended.
+        The model's rotations are extended as windows are yielded.
+        """
+        self._check_state()
+        history = self.cluster_history
+        sectors = history.sectors
 
-            prev_snapshot = self.cluster_history[prev_date]
-            curr_snapshot = self.cluster_history[curr_date]
+        sector_prices = sector_prices.reindex(columns=sectors)
+        if self._state.last_date is not None:
+            sector_prices = sector_prices[sector_prices.index > self._state.last_date]
+        market = market_prices.reindex(sector_prices.index).to_numpy(dtype="float64")
 
-            for sector in curr_snapshot:
-                prev_label = prev_snapshot.get(sector)
-                curr_label = curr_snapshot.get(sector)
+        for date, row, level in zip(sector_prices.index, sector_prices.to_numpy(dtype="float64"), market):
+            values = self._state.push(date, row, level)
+            if values is None:
+                continue
 
-                if prev_label != curr_label:
-                    rotation = {
-                        "date": curr_date,
-                        "sector": sector,
-                        "from": prev_label,
-                        "to": curr_label,
-                        "direction": self._classify_direction(prev_label, curr_label)
-                    }
-                    self.rotations.append(rotation)
+            # Only drop rows where ALL values are NaN (as RollingFeatures.frame)
+            features = pd.DataFrame(values, index=sectors, columns=self._state.feature_names).dropna(how="all")
+            codes = np.full(len(sectors), -1, dtype=history.codes.dtype)
+            columns, tier_codes = self._cluster_window(features)
+            codes[columns] = tier_codes
 
-    def _classify_direction(self, from_label: str, to_label: str) -> str:
+            events = history.append(date, codes)
+            self.rotations.extend(events)
+            yield date, features, codes, events
+
+    def preview(self, sector_row: np.ndarray, market_value: float):
         """
-        Classify rotation direction: IN / OUT / NEUTRAL
+        Cluster the window that would end with a provisional price row (e.g.
+        today's intraday prices) without changing the model: the feature
+        state, warm-start centroids and cluster tracker are used on copies.
+        Returns (features DataFrame, tier codes per sector, -1 where missing),
+        or None while the history is shorter than one window.
         """
-        order = {
-            "Underperforming": 0,
-            "Neutral": 1,
-            "Outperforming": 2
+        self._check_state()
+        values = self._state.preview(sector_row, market_value)
+        if values is None:
+            return None
+
+        sectors = self.cluster_history.sectors
+        features = pd.DataFrame(values, index=sectors, columns=self._state.feature_names).dropna(how="all")
+
+        scratch = copy.copy(self)
+        scratch.kmeans = copy.deepcopy(self.kmeans)
+        codes = np.full(len(sectors), -1, dtype=self.cluster_history.codes.dtype)
+        columns, tier_codes = scratch._cluster_window(features)
+        codes[columns] = tier_codes
+        return features, codes
+
+    def _check_state(self):
+        if self._state is None:
+            raise RuntimeError("SectorRotationModel.update() needs a model from run() or load()")
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def save(self, path: str):
+        """
+        Write the model (history, rotations, feature and clustering state) to
+        one .npz file, atomically.
+        """
+        if self._state is None:
+            raise RuntimeError("Nothing to save: run() the model first")
+
+        meta = {
+            "version": MODEL_FORMAT_VERSION,
+            "window_size": self.window_size,
+            "n_clusters": self.n_clusters,
+            "features": self.features,
+            "warm_start": self.kmeans.warm_start,
+            "backend": self.kmeans.backend,
+            "random_state": self.kmeans.random_state,
+            "hysteresis": None if self.kmeans.tracker is None else self.kmeans.tracker.hysteresis,
+            "sectors": [str(s) for s in self.cluster_history.sectors],
+            "labels": self.cluster_history.labels,
         }
+        warm = self.kmeans.warm_state()
+
+        arrays = {
+            "meta": np.array(json.dumps(meta)),
+            "history_dates": self.cluster_history.dates,
+            "history_codes": self.cluster_history.codes,
+            "rotations": self.rotations.events,
+            "kmeans_centers": np.empty((0, 0)) if warm["centers"] is None else warm["centers"],
+            "kmeans_inertia": np.array(np.nan if warm["inertia"] is None else warm["inertia"]),
+        }
+        arrays.update(self._state.to_arrays())
+        if self.kmeans.tracker is not None:
+            arrays.update(self.kmeans.tracker.to_arrays())
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SectorRotationModel":
+        """
+        Model saved with save(), ready for update().
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            if meta["version"] not in (1, MODEL_FORMAT_VERSION):
+                raise ValueError(f"Unsupported model file version: {meta['version']}")
+
+            # Version 1 files predate cluster tracking
+            model = cls(window_size=meta["window_size"], n_clusters=meta["n_clusters"],
+                        warm_start=meta["warm_start"], backend=meta["backend"], features=meta["features"],
+                        hysteresis=meta.get("hysteresis"))
+            model.kmeans.random_state = meta["random_state"]
+
+            sectors, labels = meta["sectors"], meta["labels"]
+            model.cluster_history = ClusterHistory(arrays["history_dates"], sectors, labels,
+                                                   np.array(arrays["history_codes"]))
+            model.rotations = RotationEvents(np.array(arrays["rotations"]), sectors, labels)
+            model._state = RollingFeatureState.from_arrays(arrays, sectors)
 
-        if from_label is None or to_label is None:
-            return "Unknown"
+            centers, inertia = arrays["kmeans_centers"], float(arrays["kmeans_inertia"])
+            model.kmeans.restore_warm_state(centers if centers.size else None,
+                                            None if np.isnan(inertia) else inertia)
+            if model.kmeans.tracker is not None:
+                model.kmeans.tracker.restore(arrays)
 
-        if order[to_label] > order[from_label]:
-            return "Rotation IN"
-        elif order[to_label] < order[from_label]:
-            return "Rotation OUT"
-        else:
-            return "No Change"
\ No newline at end of file
+        return model
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import time
+import numpy as np
+import pandas as pd
+from models.cluster_matching import DEFAULT_HYSTERESIS
+from models.rotation_flow import (
+    compute_relative_strength, compute_rolling_strength, compute_sector_returns, flow_matrix_to_edges,
+    iter_daily_flows
+)
+from models.sector_rotation import SectorRotationModel
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Live intraday mode
+# -----------------------------
+# Bars from a bar source (data/bar_sources.py) update the analysis as they
+# arrive, without recomputing the history:
+#   - every bar is a provisional close for its day: the window ending with
+#     it is clustered on copies of the model state (SectorRotationModel.preview)
+#     and today's rolling relative strength is the committed tail plus the
+#     provisional day, so a tick costs one small K-Means fit;
+#   - the first bar of a later day commits the previous day's last prices
+#     through SectorRotationModel.update(), which appends one window and its
+#     rotations.
+# Each tick publishes the sectors whose tier changed and, when they moved,
+# the rotation flows from the last close to now. Subscribers (WebSockets)
+# get bounded queues: a slow consumer loses its oldest messages and is sent
+# a full snapshot to resync instead of stalling the feed.
+
+
+class _GroupPrices:
+    """
+    Bar symbols -> one price per analysed group. Symbols that are group names,
+    or the only member of their group, set its price; groups with several
+    members move by the mean return of the members that traded since their
+    previous bar (chain-linked, like the daily equal-weighted index).
+    """
+
+    def __init__(self, sectors, closes: np.ndarray, mapping: pd.Series = None, member_closes: dict = None):
+        """
+        member_closes: ticker -> last daily close, so a member's first bar
+                       moves its group by the return since that close
+        """
+        self.sectors = pd.Index(sectors)
+        self.levels = closes.copy()
+        mapping = mapping if mapping is not None else pd.Series(dtype=object)
+        mapping = mapping[mapping.isin(self.sectors)]
+
+        sizes = mapping.value_counts()
+        single = mapping[mapping.map(sizes) == 1]
+        self.direct = {str(s): i for i, s in enumerate(self.sectors)}
+        self.direct.update({str(t): self.sectors.get_loc(g) for t, g in single.items()})
+        self.members = {str(t): self.sectors.get_loc(g) for t, g in mapping[mapping.map(sizes) > 1].items()}
+        self.last = {t: p for t, p in (member_closes or {}).items() if t in self.members and p == p}
+
+    def apply(self, prices: dict) -> np.ndarray:
+        sums = np.zeros(len(self.sectors))
+        counts = np.zeros(len(self.sectors))
+        for symbol, price in prices.items():
+            if symbol in self.direct:
+                self.levels[self.direct[symbol]] = price
+            elif symbol in self.members:
+                previous = self.last.get(symbol)
+                if previous:
+                    sums[self.members[symbol]] += price / previous - 1
+                    counts[self.members[symbol]] += 1
+                self.last[symbol] = price
+
+        moved = counts > 0
+        self.levels[moved] *= 1 + sums[moved] / counts[moved]
+        return self.levels.copy()
+
+
+class LiveEngine:
+    def __init__(self, sector_prices: pd.DataFrame, market_prices: pd.Series, market_ticker: str,
+                 window_size: int = 30, rs_window: int = 5, n_clusters: int = 3,
+                 hysteresis=DEFAULT_HYSTERESIS, mapping: pd.Series = None, features=None,
+                 member_prices: pd.DataFrame = None):
+        """
+        sector_prices / market_prices: daily history the live day continues
+        market_ticker: bar symbol of the market
+        rs_window: days in the rolling relative strength (compute_rolling_strength)
+        mapping: universe ticker -> group at the analysed level, for bars keyed by ticker
+        features: clustered on (see SectorRotationModel)
+        member_prices: daily closes by universe ticker, for groups with several
+                       members (their last close before the live day seeds
+                       the chain-linking)
+        """
+        self.model = SectorRotationModel(window_size, n_clusters, warm_start=True, hysteresis=hysteresis,
+                                         features=features)
+        self.model.run(sector_prices, market_prices)
+        self.sectors = self.model.cluster_history.sectors
+        self.labels = self.model.cluster_history.labels
+        self.market_ticker = market_ticker
+        self.rs_window = rs_window
+
+        # Last committed day
+        sector_prices = sector_prices.reindex(columns=self.sectors).ffill()
+        self.day = sector_prices.index[-1].normalize()
+        self.closes = sector_prices.iloc[-1].to_numpy(dtype="float64")
+        self.market_close = float(market_prices.ffill().iloc[-1])
+
+        rel_strength = compute_relative_strength(compute_sector_returns(sector_prices),
+                                                 market_prices.pct_change().dropna())
+        rolling = compute_rolling_strength(rel_strength, rs_window)
+        self.rolling = rolling.iloc[-1].to_numpy() if len(rolling) else np.full(len(self.sectors), np.nan)
+        # The rs_window - 1 committed days today's rolling strength averages with
+        self._rel_tail = rel_strength.to_numpy(dtype="float64")[len(rel_strength) - (rs_window - 1):]
+
+        # The day in progress
+        member_closes = None
+        if member_prices is not None:
+            member_prices = member_prices[member_prices.index <= self.day].ffill()
+            if len(member_prices):
+                member_closes = {str(t): float(p) for t, p in member_prices.iloc[-1].items()}
+        self.groups = _GroupPrices(self.sectors, self.closes, mapping, member_closes)
+        self.prices = self.closes.copy()
+        self.market_price = self.market_close
+        self.pending_day = None
+        self.timestamp = None
+
+        # What subscribers were last told
+        self.codes = np.full(len(self.sectors), -1)
+        self.edges = []
+
+        self.n_bars = 0
+        self.n_stale = 0
+        self.last_tick_seconds = None
+
+    @classmethod
+    def before(cls, sector_prices: pd.DataFrame, market_prices: pd.Series, timestamp, **kwargs) -> "LiveEngine":
+        """
+        Engine seeded with the daily history strictly before timestamp's day
+        (the day the bars belong to).
+        """
+        day = pd.Timestamp(timestamp).normalize()
+        return cls(sector_prices[sector_prices.index < day], market_prices[market_prices.index < day], **kwargs)
+
+    def on_bar(self, bar) -> list:
+        """
+        Apply one bar. Returns the messages to publish (possibly none).
+        """
+        started = time.perf_counter()
+        day = bar.timestamp.normalize()
+        if day <= self.day:
+            # Already covered by the daily history
+            self.n_stale += 1
+            return []
+
+        messages = []
+        if self.pending_day is not None and day > self.pending_day:
+            with stage("live_commit"):
+                messages.append(self._commit())
+
+        with stage("live_tick"):
+            self.prices = self.groups.apply(bar.prices)
+            if self.market_ticker in bar.prices:
+                self.market_price = bar.prices[self.market_ticker]
+            self.pending_day = day
+            self.timestamp = bar.timestamp
+            messages.append(self._tick())
+
+        self.n_bars += 1
+        self.last_tick_seconds = time.perf_counter() - started
+        return messages
+
+    def _tick(self) -> dict:
+        preview = self.model.preview(self.prices, self.market_price)
+        codes = preview[1] if preview is not None else np.full(len(self.sectors), -1)
+
+        changed = np.flatnonzero(codes != self.codes)
+        clusters = [
+            {"sector": self.sectors[i], "performance": self._label(codes[i]), "previous": self._label(self.codes[i])}
+            for i in changed
+        ]
+        self.codes = codes
+
+        message = {"type": "tick", "timestamp": self.timestamp.isoformat(), "clusters": clusters}
+        edges = self._edges()
+        if edges != self.edges:
+            self.edges = edges
+            message["flows"] = edges
+        return message
+
+    def _edges(self) -> list:
+        """
+        Rotation flows from the last close's rolling strength to now.
+        """
+        rel = (self.prices / self.closes - 1) - (self.market_price / self.market_close - 1)
+        rolling = (self._rel_tail.sum(axis=0) + rel) / self.rs_window
+        frame = pd.DataFrame([self.rolling, rolling], index=[self.day, self.pending_day], columns=self.sectors)
+        _, daily = next(iter_daily_flows(frame))
+        flow_matrix = pd.DataFrame(daily[0], index=self.sectors, columns=self.sectors)
+        edges = flow_matrix_to_edges(flow_matrix)
+        return [
+            {"source": s, "target": t, "weight": float(w)}
+            for s, t, w in zip(edges["source"], edges["target"], edges["weight"])
+        ]
+
+    def _commit(self) -> dict:
+        """
+        Close the pending day with its last prices.
+        """
+        day = self.pending_day
+        events = self.model.update(pd.DataFrame([self.prices], index=[day], columns=self.sectors),
+                                   pd.Series([self.market_price], index=[day]))
+
+        rel = (self.prices / self.closes - 1) - (self.market_price / self.market_close - 1)
+        self.rolling = (self._rel_tail.sum(axis=0) + rel) / self.rs_window
+        self._rel_tail = np.concatenate([self._rel_tail, rel[None]])[1:] if self.rs_window > 1 else self._rel_tail
+        self.closes = self.prices.copy()
+        self.market_close = self.market_price
+        self.day = day
+        self.pending_day = None
+
+        return {"type": "close", "date": str(day.date()), "rotations": events.to_records()}
+
+    def _label(self, code):
+        return self.labels[code] if code >= 0 else None
+
+    def snapshot(self) -> dict:
+        """
+        Full current state, sent to new subscribers and after dropped messages.
+        """
+        return {
+            "type": "snapshot",
+            "timestamp": None if self.timestamp is None else self.timestamp.isoformat(),
+            "day": str((self.pending_day or self.day).date()),
+            "clusters": [{"sector": s, "performance": self._label(c)} for s, c in zip(self.sectors, self.codes)],
+            "flows": self.edges,
+        }
+
+
+# -----------------------------
+# Fan-out with backpressure
+# -----------------------------
+
+class Subscriber:
+    def __init__(self, maxsize: int = 64):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # Messages dropped because the consumer fell behind
+        self.dropped = 0
+
+    def offer(self, message: dict):
+        """
+        Queue a message, dropping the oldest one when the queue is full.
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class Broadcaster:
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.subscribers = set()
+        self.published = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.maxsize)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, message: dict):
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            subscriber.offer(message)
+
+    def dropped(self) -> int:
+        return sum(s.dropped for s in self.subscribers)
+
+
+class LiveFeed:
+    def __init__(self, source, make_engine, broadcaster: Broadcaster = None):
+        """
+        source: bar source (data/bar_sources.py)
+        make_engine: first bar -> LiveEngine (seeded with the history before it)
+        """
+        self.source = source
+        self.make_engine = make_engine
+        self.broadcaster = broadcaster or Broadcaster()
+        self.engine = None
+
+    async def run(self):
+        """
+        Consume the source until it ends. Engine work runs in a thread so
+        the event loop keeps serving subscribers between bars.
+        """
+        async for bar in self.source.bars():
+            try:
+                if self.engine is None:
+                    self.engine = await asyncio.to_thread(self.make_engine, bar)
+                    self.broadcaster.publish(self.engine.snapshot())
+                for message in await asyncio.to_thread(self.engine.on_bar, bar):
+                    self.broadcaster.publish(message)
+            except Exception:
+                logger.exception("Live update failed for %s", bar)
+
+    def status(self) -> dict:
+        engine = self.engine
+        return {
+            "running": engine is not None,
+            "bars": 0 if engine is None else engine.n_bars,
+            "stale_bars": 0 if engine is None else engine.n_stale,
+            "last_tick_seconds": None if engine is None else engine.last_tick_seconds,
+            "timestamp": None if engine is None or engine.timestamp is None else engine.timestamp.isoformat(),
+            "subscribers": len(self.broadcaster.subscribers),
+            "published": self.broadcaster.published,
+            "dropped": self.broadcaster.dropped(),
+        }
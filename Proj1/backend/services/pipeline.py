@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+from data.dataGetter import get_universe, get_universe_prices, split_universe_prices
+from features.feature_engineering import build_cluster_features
+from models.flow_graph import FlowGraph
+from models.kmeans import SectorKMeans
+from models.rotation_flow import compute_relative_strength, compute_rolling_strengths, compute_sector_returns
+from utils.metrics import collect, stage
+from utils.config import UNIVERSE_LEVEL, N_CLUSTERS, ROTATION_WINDOWS, MAX_EXTRA_HORIZONS, MAX_CONFIDENCE_RESULTS
+
+# -----------------------------
+# Shared analysis pipeline
+# -----------------------------
+# prices -> returns -> features -> clusters / rotation flows, computed once
+# per (universe, period, window) and shared by every endpoint and request
+# (services/scheduler.py keeps the results as snapshots).
+
+
+class AnalysisResult:
+    def __init__(self, key, sector_prices, market_prices, clustered_df, rel_strength, rolling_strengths,
+                 flow_graphs, window, failures=None, timings=None, max_extra_horizons=MAX_EXTRA_HORIZONS,
+                 max_confidence=MAX_CONFIDENCE_RESULTS):
+        """
+        max_extra_horizons: horizons derived on demand (horizon_flow_graphs)
+                            kept besides the precomputed ones, least recently
+                            used dropped first
+        max_confidence: cluster confidence results kept, least recently used
+                        dropped first
+        """
+        self.key = key
+        self.sector_prices = sector_prices
+        self.market_prices = market_prices
+        # rows = sectors, columns = features + cluster + performance
+        self.clustered_df = clustered_df
+        self.rel_strength = rel_strength
+        # horizon (rolling window) -> rolling relative strength / daily flow
+        # graph (see models/flow_graph.py) / total flow matrix
+        # (sectors x sectors, rows = source, columns = target)
+        self.rolling_strengths = rolling_strengths
+        self.flow_graphs = flow_graphs
+        self.flow_matrices = {w: graph.flow_matrix() for w, graph in flow_graphs.items()}
+        # The result's own window
+        self.rolling_strength = rolling_strengths[window]
+        self.flow_graph = flow_graphs[window]
+        self.flow_matrix = self.flow_matrices[window]
+        self.max_extra_horizons = max_extra_horizons
+        # Derived horizons, least recently used first; the precomputed ones stay
+        self._extra_horizons = OrderedDict()
+        # Request threads share the result: guards the memo dicts
+        self._lock = threading.Lock()
+        self.failures = failures or []
+        # (n_bootstrap, block, seed) -> ClusterConfidence, filled on demand
+        # by /clusters/confidence; least recently used first
+        self.confidence = OrderedDict()
+        self.max_confidence = max_confidence
+        # stage -> seconds spent computing this result (see utils/metrics.py)
+        self.timings = timings or {}
+
+        self.computed_at = time.time()
+        self.as_of = sector_prices.index[-1] if len(sector_prices) else None
+
+    def __getstate__(self):
+        # Results come back from worker processes; locks do not pickle
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def cached_confidence(self, key):
+        """
+        ClusterConfidence stored for (n_bootstrap, block, seed), or None.
+        """
+        with self._lock:
+            confidence = self.confidence.get(key)
+            if confidence is not None:
+                self.confidence.move_to_end(key)
+            return confidence
+
+    def store_confidence(self, key, confidence):
+        with self._lock:
+            self.confidence[key] = confidence
+            self.confidence.move_to_end(key)
+            while len(self.confidence) > self.max_confidence:
+                self.confidence.popitem(last=False)
+
+    def horizon_flow_graphs(self, windows) -> dict:
+        """
+        window -> flow graph for the requested horizons. Horizons that were
+        not precomputed are derived from rel_strength and kept for later calls
+        (up to max_extra_horizons of them).
+        """
+        return {w: graph for w, (graph, _) in self._horizons(windows).items()}
+
+    def horizon_flow_matrices(self, windows) -> dict:
+        """
+        window -> total flow matrix for the requested horizons.
+        """
+        return {w: matrix for w, (_, matrix) in self._horizons(windows).items()}
+
+    def _horizons(self, windows) -> dict:
+        """
+        window -> (flow graph, flow matrix), deriving missing horizons.
+        """
+        with self._lock:
+            missing = [w for w in windows if w not in self.flow_graphs]
+            if missing:
+                strengths = compute_rolling_strengths(self.rel_strength, missing)
+                self.rolling_strengths.update(strengths)
+                for w, rolling_strength in strengths.items():
+                    self.flow_graphs[w] = FlowGraph.from_rolling_strength(rolling_strength)
+                    self.flow_matrices[w] = self.flow_graphs[w].flow_matrix()
+                    self._extra_horizons[w] = None
+
+            for w in windows:
+                if w in self._extra_horizons:
+                    self._extra_horizons.move_to_end(w)
+            horizons = {w: (self.flow_graphs[w], self.flow_matrices[w]) for w in windows}
+
+            # Evict after reading so a request larger than the limit still gets all its horizons
+            while len(self._extra_horizons) > self.max_extra_horizons:
+                w, _ = self._extra_horizons.popitem(last=False)
+                del self.rolling_strengths[w], self.flow_graphs[w], self.flow_matrices[w]
+        return horizons
+
+
+class AnalysisPipeline:
+    def __init__(self, load_prices=get_universe_prices):
+        """
+        load_prices: period -> FetchReport with a universe frame (see data/dataGetter.py)
+        """
+        self.load_prices = load_prices
+
+    def key(self, period: str = "6mo", window: int = 20):
+        return get_universe().name, UNIVERSE_LEVEL, N_CLUSTERS, period, window
+
+    def compute(self, period: str = "6mo", window: int = 20) -> AnalysisResult:
+        """
+        One run of the whole pipeline.
+        """
+        with collect() as timings:
+            # 1. Prices (sectors + market in one fetch)
+            report = self.load_prices(period)
+            sector_prices, market_prices = split_universe_prices(report.prices)
+
+            # 2. Clusters on latest features
+            with stage("features"):
+                feature_df = build_cluster_features(sector_prices, market_prices)
+            with stage("kmeans"):
+                km = SectorKMeans(n_clusters=N_CLUSTERS)
+                clustered_df = km.get_clustered_dataframe(feature_df)
+                clustered_df = km.label_clusters_by_performance(clustered_df)
+
+            # 3. Rotation flows from rolling relative strength, for this window
+            #    and every configured horizon in one pass
+            with stage("relative_strength"):
+                sector_returns = compute_sector_returns(sector_prices)
+                market_returns = market_prices.pct_change().dropna()
+                rel_strength = compute_relative_strength(sector_returns, market_returns)
+                windows = sorted(set(ROTATION_WINDOWS) | {window})
+                rolling_strengths = compute_rolling_strengths(rel_strength, windows)
+            with stage("rotation_flow"):
+                flow_graphs = {w: FlowGraph.from_rolling_strength(rs) for w, rs in rolling_strengths.items()}
+
+        return AnalysisResult(self.key(period, window), sector_prices, market_prices, clustered_df,
+                              rel_strength, rolling_strengths, flow_graphs, window,
+                              report.failures, timings.seconds)
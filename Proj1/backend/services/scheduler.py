@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from services.pipeline import AnalysisPipeline
+from utils.metrics import observe_stages
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Background refresh scheduler
+# -----------------------------
+# Recomputes the analysis pipeline on a fixed interval (CPU-bound work runs
+# in a process pool) and keeps the latest result per (period, window) as a
+# snapshot. Handlers await get(), which returns the current snapshot
+# immediately and only computes when there is none yet.
+#
+# Keys come from clients, so get() only accepts the configured periods and
+# windows. Keys beyond the background jobs are computed on demand, kept in a
+# bounded LRU and recomputed once stale (they are not refreshed in the
+# background).
+
+
+class UnknownSnapshotKey(ValueError):
+    """
+    A (period, window) the scheduler does not serve.
+    """
+
+
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class Snapshot:
+    def __init__(self, result, computed_at: float):
+        self.result = result
+        self.computed_at = computed_at
+
+    @property
+    def as_of(self):
+        """
+        Date of the last market bar the snapshot was computed from.
+        """
+        return self.result.as_of
+
+
+def compute_analysis(period: str, window: int):
+    """
+    One pipeline run. Module-level so it can be sent to a process pool.
+    """
+    return AnalysisPipeline().compute(period, window)
+
+
+class RefreshScheduler:
+    def __init__(self, compute=compute_analysis, interval: float = 300.0, stale_after: float = None,
+                 clock=None, executor=None, jobs=(("6mo", 20),), max_jobs: int = 16,
+                 periods=None, windows=None, max_snapshots: int = 32):
+        """
+        compute: (period, window) -> AnalysisResult; must be picklable when
+                 executor is a process pool
+        interval: seconds between background refreshes
+        stale_after: age (seconds) after which a snapshot is flagged stale
+        clock: object with time() and async sleep(seconds); SystemClock by default
+        executor: concurrent.futures executor for compute(); None runs it in
+                  the event loop's default thread pool
+        jobs: (period, window) keys refreshed in the background; keys first
+              requested on demand are added, up to max_jobs
+        periods / windows: values get() accepts (None accepts any)
+        max_snapshots: snapshots kept for keys that are not jobs
+        """
+        self.compute = compute
+        self.interval = interval
+        self.stale_after = 2 * interval if stale_after is None else stale_after
+        self.clock = clock or SystemClock()
+        self.executor = executor
+        self.jobs = list(jobs)
+        self.max_jobs = max_jobs
+        self.periods = None if periods is None else set(periods)
+        self.windows = None if windows is None else set(windows)
+        self.max_snapshots = max_snapshots
+
+        # Least recently used first
+        self._snapshots = OrderedDict()
+        self._in_flight = {}
+        self._task = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_seconds = None
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh_once()
+            await self.clock.sleep(self.interval)
+
+    # -----------------------------
+    # Computation
+    # -----------------------------
+
+    async def refresh_once(self):
+        """
+        Recompute every registered job; a failed job keeps its previous snapshot.
+        """
+        started = self.clock.time()
+        for period, window in list(self.jobs):
+            try:
+                await self._compute(period, window)
+            except Exception:
+                self.refresh_failures += 1
+                logger.exception("Background refresh failed for period=%s window=%s", period, window)
+
+        self.refreshes += 1
+        self.last_refresh_seconds = self.clock.time() - started
+
+    async def _compute(self, period: str, window: int) -> Snapshot:
+        """
+        Run compute() off the event loop; concurrent calls for a key share one run.
+        """
+        key = (period, window)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.get_running_loop().create_task(self._compute_and_store(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key) -> Snapshot:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        result = await loop.run_in_executor(self.executor, self.compute, *key)
+
+        # Stages timed inside compute() (possibly in a worker process) plus the
+        # whole run as the server saw it, pickling included
+        observe_stages(dict(getattr(result, "timings", {}), compute=time.perf_counter() - started))
+
+        snapshot = Snapshot(result, self.clock.time())
+        self._snapshots[key] = snapshot
+        self._snapshots.move_to_end(key)
+        self._evict()
+        return snapshot
+
+    def _evict(self):
+        """
+        Drop the least recently used on-demand snapshots over max_snapshots.
+        """
+        extra = [key for key in self._snapshots if key not in self.jobs]
+        for key in extra[:max(0, len(extra) - self.max_snapshots)]:
+            del self._snapshots[key]
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+
+    def snapshots(self) -> dict:
+        """
+        (period, window) -> current Snapshot.
+        """
+        return dict(self._snapshots)
+
+    def latest(self, period: str = "6mo", window: int = 20):
+        return self._snapshots.get((period, window))
+
+    def validate(self, period: str, window: int):
+        """
+        Raise UnknownSnapshotKey for a key outside the configured periods / windows.
+        """
+        if self.periods is not None and period not in self.periods:
+            raise UnknownSnapshotKey(f"period must be one of {', '.join(sorted(self.periods))}, got {period!r}")
+        if self.windows is not None and window not in self.windows:
+            raise UnknownSnapshotKey(f"window must be one of {', '.join(map(str, sorted(self.windows)))}, "
+                                     f"got {window!r}")
+
+    async def get(self, period: str = "6mo", window: int = 20) -> Snapshot:
+        """
+        Latest snapshot for the key, computing it first only if none exists
+        (or, for keys not refreshed in the background, once it is stale).
+        """
+        self.validate(period, window)
+        key = (period, window)
+        snapshot = self.latest(period, window)
+        if snapshot is not None and (key in self.jobs or not self.is_stale(snapshot)):
+            self.hits += 1
+            self._snapshots.move_to_end(key)
+            return snapshot
+
+        self.misses += 1
+        if key not in self.jobs and len(self.jobs) < self.max_jobs:
+            self.jobs.append(key)
+        return await self._compute(period, window)
+
+    def invalidate(self, period: str = None, window: int = None):
+        """
+        Drop one snapshot, or all of them when period is None; the next get()
+        for a dropped key computes it again.
+        """
+        if period is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop((period, window), None)
+
+    def age(self, snapshot: Snapshot) -> float:
+        return self.clock.time() - snapshot.computed_at
+
+    def is_stale(self, snapshot: Snapshot) -> bool:
+        return self.age(snapshot) > self.stale_after
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "snapshots": len(self._snapshots),
+            "jobs": len(self.jobs),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "interval_seconds": self.interval,
+            "stale_after_seconds": self.stale_after,
+        }
+
+
+def make_process_pool(workers: int):
+    """
+    Process pool for the CPU-bound pipeline, or None to use threads.
+    """
+    return ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
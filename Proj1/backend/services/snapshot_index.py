@@ -0,0 +1,403 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+from data.dataGetter import get_universe, get_universe_prices, split_universe_prices
+from features.rolling_features import FEATURE_NAMES
+from models.cluster_history import ClusterHistory, date_bounds
+from models.rotation_flow import (
+    compute_relative_strength, compute_rolling_strengths, compute_sector_returns, iter_daily_flows
+)
+from models.sector_rotation import SectorRotationModel
+from utils.config import (
+    UNIVERSE_LEVEL, N_CLUSTERS, CLUSTER_FEATURES, SNAPSHOT_INDEX_DIR, SNAPSHOT_INDEX_PERIOD, SNAPSHOT_INDEX_WINDOW,
+    SNAPSHOT_INDEX_FLOW_WINDOW, SNAPSHOT_INDEX_FLOW_MAX_SECTORS
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Point-in-time snapshot index
+# -----------------------------
+# For every window end date: the performance tier of each sector, its
+# features, and the cumulative rotation flows up to that day, so "what did
+# clusters / rotations look like on date X (or over [start, end])" is a binary
+# search plus an array slice instead of a recompute.
+#
+# Layout of an index directory:
+#   meta.json                    settings, sectors, labels, row count, current generation
+#   dates.<gen>.npy              (capacity,) datetime64[D], sorted
+#   codes.<gen>.npy              (capacity, sectors) tier codes, -1 = not clustered
+#   features.<gen>.npy           (capacity, sectors, features) float32
+#   flows.<gen>.npy              (capacity, sectors, sectors) float64 prefix sums of the
+#                                daily flow matrices (only up to SNAPSHOT_INDEX_FLOW_MAX_SECTORS)
+#   model.<rows>.npz             SectorRotationModel state to extend from
+#
+# Arrays have spare capacity; extend() writes new rows past the committed
+# count, then publishes them by atomically replacing meta.json. Readers
+# memory-map the arrays read-only (all worker processes share the page cache)
+# and only look at the rows meta.json counts. When the capacity runs out the
+# arrays are copied into a new generation, so maps held by readers stay valid.
+
+INDEX_FORMAT_VERSION = 1
+
+
+def index_path(root: str = SNAPSHOT_INDEX_DIR, window: int = SNAPSHOT_INDEX_WINDOW,
+               flow_window: int = SNAPSHOT_INDEX_FLOW_WINDOW, n_clusters: int = N_CLUSTERS) -> str:
+    """
+    Directory of the index for the configured universe and these settings.
+    """
+    return os.path.join(root, f"{get_universe().name}-{UNIVERSE_LEVEL}-w{window}-f{flow_window}-k{n_clusters}")
+
+
+class SnapshotIndex:
+    def __init__(self, path: str):
+        """
+        path: index directory (see layout above); see index_path()
+        """
+        self.path = path
+        self._meta_stamp = None
+        # (meta, arrays) published as one value: readers take it once, so
+        # they never pair one generation's meta with another's arrays
+        self._view = (None, {})
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+
+    def refresh(self) -> bool:
+        """
+        Pick up rows published since the last call (one stat() when nothing
+        changed). Returns whether the index exists.
+        """
+        try:
+            stat = os.stat(self._file("meta.json"))
+        except FileNotFoundError:
+            self._view, self._meta_stamp = (None, {}), None
+            return False
+
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp != self._meta_stamp:
+            with open(self._file("meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot index version: {meta.get('version')}")
+
+            old, arrays = self._view
+            if old is None or meta["generation"] != old["generation"]:
+                arrays = {
+                    name: np.load(self._file(f"{name}.{meta['generation']}.npy"), mmap_mode="r")
+                    for name in ("dates", "codes", "features") + (("flows",) if meta["has_flows"] else ())
+                }
+            self._view, self._meta_stamp = (meta, arrays), stamp
+        return True
+
+    @property
+    def meta(self) -> dict:
+        return self._view[0]
+
+    def __len__(self):
+        meta = self.meta
+        return meta["size"] if meta else 0
+
+    @property
+    def dates(self) -> np.ndarray:
+        meta, arrays = self._view
+        return arrays["dates"][:meta["size"]]
+
+    @property
+    def sectors(self) -> pd.Index:
+        return pd.Index(self.meta["sectors"])
+
+    @property
+    def labels(self) -> list:
+        return self.meta["labels"]
+
+    @property
+    def has_flows(self) -> bool:
+        return bool(self.meta and self.meta["has_flows"])
+
+    def position(self, as_of) -> int:
+        """
+        Row of the last date on or before `as_of` (-1 when it precedes the index).
+        """
+        day = np.datetime64(pd.Timestamp(as_of).date(), "D")
+        return int(np.searchsorted(self.dates, day, side="right")) - 1
+
+    def bounds(self, start=None, end=None):
+        """
+        Row range [lo, hi) of the dates in [start, end].
+        """
+        return date_bounds(self.dates, start, end)
+
+    def history(self, start=None, end=None) -> ClusterHistory:
+        """
+        Tier codes over [start, end] (a view of the mapped array).
+        """
+        meta, arrays = self._view
+        dates = arrays["dates"][:meta["size"]]
+        lo, hi = date_bounds(dates, start, end)
+        return ClusterHistory(dates[lo:hi], meta["sectors"], meta["labels"], arrays["codes"][lo:hi])
+
+    def frames(self, lo: int, hi: int, stride: int = 1) -> pd.DataFrame:
+        """
+        Long-format frames of rows lo..hi-1 (every stride-th): one row per
+        (date, clustered sector) with its features and performance tier.
+        """
+        meta, arrays = self._view
+        rows = np.arange(lo, hi, stride)
+        codes = arrays["codes"][rows]
+        row_idx, sector_idx = np.nonzero(codes >= 0)
+
+        df = pd.DataFrame({
+            "date": arrays["dates"][rows][row_idx].astype(str),
+            "sector": np.asarray(meta["sectors"], dtype=object)[sector_idx],
+        })
+        features = arrays["features"][rows[row_idx], sector_idx]
+        for f, name in enumerate(meta["features"]):
+            df[name] = features[:, f]
+        df["performance"] = np.asarray(meta["labels"], dtype=object)[codes[row_idx, sector_idx]]
+        return df
+
+    def flow_matrix(self, lo: int, hi: int) -> pd.DataFrame:
+        """
+        Flows summed over the days of rows lo..hi-1, each day being the move
+        from the previous trading day (sectors x sectors, rows = source).
+        """
+        meta, arrays = self._view
+        flows = arrays["flows"]
+        matrix = np.array(flows[hi - 1]) if hi > lo else np.zeros(flows.shape[1:])
+        if lo > 0 and hi > lo:
+            matrix -= flows[lo - 1]
+        sectors = pd.Index(meta["sectors"])
+        return pd.DataFrame(matrix, index=sectors, columns=sectors)
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+
+    def build(self, sector_prices: pd.DataFrame, market_prices: pd.Series, window: int = SNAPSHOT_INDEX_WINDOW,
+              flow_window: int = SNAPSHOT_INDEX_FLOW_WINDOW, n_clusters: int = N_CLUSTERS,
+              features=CLUSTER_FEATURES) -> int:
+        """
+        Compute the index over the whole price history, replacing any existing one.
+        features: clustered on (see SectorRotationModel); stored are FEATURE_NAMES
+                  plus the correlation features when they are among them
+        Returns the number of rows.
+        """
+        model = SectorRotationModel(window_size=window, n_clusters=n_clusters, warm_start=True, features=features)
+        history, _ = model.run(sector_prices, market_prices)
+        rolling = model.rolling_features
+
+        sectors = history.sectors
+        meta = {
+            "version": INDEX_FORMAT_VERSION,
+            "window": window,
+            "flow_window": flow_window,
+            "n_clusters": n_clusters,
+            "sectors": [str(s) for s in sectors],
+            "labels": history.labels,
+            "features": rolling.feature_names,
+            "cluster_features": model.features,
+            "has_flows": len(sectors) <= SNAPSHOT_INDEX_FLOW_MAX_SECTORS,
+            "generation": (self.meta["generation"] + 1) if self.refresh() else 0,
+            "size": 0,
+            "model": None,
+        }
+        rows = {
+            "dates": history.dates,
+            "codes": history.codes,
+            "features": rolling.values.astype("float32"),
+        }
+        if meta["has_flows"]:
+            rows["flows"] = _daily_flows(sector_prices, market_prices, flow_window, history.dates)
+
+        os.makedirs(self.path, exist_ok=True)
+        arrays = self._allocate(meta, rows, capacity=len(history) + 256)
+        self._write_rows(arrays, meta, rows, previous_total=None)
+        self._commit(meta, model, old=self.meta)
+        return len(history)
+
+    def extend(self, sector_prices: pd.DataFrame, market_prices: pd.Series) -> int:
+        """
+        Append the windows ending after the last indexed date.
+        sector_prices / market_prices: history reaching back at least one
+        flow window before the new dates
+        Returns the number of rows added.
+        """
+        if not self.refresh():
+            raise RuntimeError(f"No snapshot index at {self.path}; build() it first")
+        meta, arrays = self._view
+        meta = dict(meta)
+
+        model = SectorRotationModel.load(self._file(meta["model"]))
+        added = list(model.iter_update(sector_prices, market_prices))
+        if not added:
+            return 0
+
+        sectors = self.sectors
+        rows = {
+            "dates": np.array([np.datetime64(pd.Timestamp(d).date(), "D") for d, _, _, _ in added]),
+            "codes": np.stack([codes for _, _, codes, _ in added]),
+            "features": np.stack([
+                f.reindex(index=sectors, columns=meta["features"]).to_numpy(dtype="float32")
+                for _, f, _, _ in added
+            ]),
+        }
+        if meta["has_flows"]:
+            rows["flows"] = _daily_flows(sector_prices, market_prices, meta["flow_window"], rows["dates"])
+
+        size = meta["size"]
+        if size + len(added) > len(arrays["dates"]):
+            # Out of capacity: copy into a new generation
+            meta["generation"] += 1
+            previous = {name: arrays[name][:size] for name in arrays}
+            arrays = self._allocate(meta, previous, capacity=max(2 * len(arrays["dates"]), size + len(added)))
+            for name, values in previous.items():
+                arrays[name][:size] = values
+        else:
+            # Spare rows of the current generation; readers do not look past `size`
+            arrays = {name: np.load(self._file(f"{name}.{meta['generation']}.npy"), mmap_mode="r+")
+                      for name in arrays}
+
+        previous_total = np.array(arrays["flows"][size - 1]) if meta["has_flows"] and size else None
+        self._write_rows(arrays, meta, rows, previous_total)
+        self._commit(meta, model, old=self.meta)
+        return len(added)
+
+    def _allocate(self, meta: dict, rows: dict, capacity: int) -> dict:
+        arrays = {}
+        for name, values in rows.items():
+            arrays[name] = np.lib.format.open_memmap(
+                self._file(f"{name}.{meta['generation']}.npy"), mode="w+",
+                dtype=values.dtype, shape=(capacity,) + values.shape[1:],
+            )
+        arrays["codes"][:] = -1
+        return arrays
+
+    def _write_rows(self, arrays: dict, meta: dict, rows: dict, previous_total):
+        lo = meta["size"]
+        hi = lo + len(rows["dates"])
+        for name, values in rows.items():
+            if name == "flows":
+                # Daily matrices -> running totals
+                values = np.cumsum(values, axis=0)
+                if previous_total is not None:
+                    values += previous_total
+            arrays[name][lo:hi] = values
+
+        for values in arrays.values():
+            values.flush()
+        meta["size"] = hi
+
+    def _commit(self, meta: dict, model: SectorRotationModel, old: dict = None):
+        """
+        Save the model for the new row count, then publish meta.json; files
+        the previous meta pointed to are removed afterwards.
+        """
+        meta["model"] = f"model.{meta['size']}.npz"
+        model.save(self._file(meta["model"]))
+
+        with open(self._file("meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+        if old is not None:
+            stale = [] if old["model"] == meta["model"] else [old["model"]]
+            if old["generation"] != meta["generation"]:
+                stale += [f"{name}.{old['generation']}.npy" for name in ("dates", "codes", "features", "flows")]
+            for name in stale:
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+
+        self.refresh()
+
+
+def _daily_flows(sector_prices: pd.DataFrame, market_prices: pd.Series, flow_window: int, dates) -> np.ndarray:
+    """
+    Flow matrix of each of `dates` (the move from the previous row of the
+    rolling relative strength); zero on dates without a rolling strength row.
+    """
+    dates = pd.DatetimeIndex(dates)
+
+    # Only the tail of the prices reaches the requested dates: flow_window
+    # returns before the first one (more when rows with gaps are dropped)
+    start = int(sector_prices.index.searchsorted(dates[0]))
+    lookback = flow_window + 2
+    while True:
+        lo = max(0, start - lookback)
+        tail = sector_prices.iloc[lo:]
+        market_tail = market_prices[market_prices.index >= tail.index[0]] if len(tail) else market_prices
+        rel_strength = compute_relative_strength(compute_sector_returns(tail), market_tail.pct_change().dropna())
+        if lo == 0 or int(rel_strength.index.searchsorted(dates[0])) >= flow_window:
+            break
+        lookback *= 2
+    strength = compute_rolling_strengths(rel_strength, [flow_window])[flow_window]
+
+    # Only rank the rows needed: the first requested date's predecessor onwards
+    first = max(0, int(strength.index.searchsorted(dates[0])) - 1)
+    strength = strength.iloc[first:]
+
+    n_sectors = sector_prices.shape[1]
+    flows = np.zeros((len(dates), n_sectors, n_sectors))
+    for chunk_dates, daily in iter_daily_flows(strength):
+        positions = dates.get_indexer(chunk_dates)
+        found = positions >= 0
+        flows[positions[found]] = daily[found]
+    return flows
+
+
+def _lock(path: str):
+    """
+    Exclusive non-blocking writer lock (file handle), or None when another
+    process holds it.
+    """
+    os.makedirs(path, exist_ok=True)
+    handle = open(os.path.join(path, ".lock"), "w")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def maintain_index(path: str = None, period: str = SNAPSHOT_INDEX_PERIOD) -> int:
+    """
+    Build the configured index if it does not exist yet, otherwise extend it
+    with the latest prices. Module-level so it can run in a process pool;
+    concurrent callers (other workers) skip while one is writing.
+    Returns the number of rows written.
+    """
+    path = path or index_path()
+    lock = _lock(path)
+    if lock is None:
+        return 0
+
+    try:
+        report = get_universe_prices(period)
+        sector_prices, market_prices = split_universe_prices(report.prices)
+
+        index = SnapshotIndex(path)
+        # Indexes written before cluster_features clustered on FEATURE_NAMES
+        if (not index.refresh() or list(index.sectors) != [str(s) for s in sector_prices.columns]
+                or index.meta.get("cluster_features", FEATURE_NAMES) != list(CLUSTER_FEATURES)):
+            rows = index.build(sector_prices, market_prices)
+            logger.info("Built snapshot index %s: %d dates", path, rows)
+            return rows
+        return index.extend(sector_prices, market_prices)
+    finally:
+        lock.close()
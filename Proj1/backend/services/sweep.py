@@ -0,0 +1,308 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from data.dataGetter import get_universe, get_universe_prices, split_universe_prices
+from features.rolling_features import FEATURE_NAMES
+from models.sector_rotation import SectorRotationModel
+from utils.config import SWEEP_DIR, SWEEP_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Parameter sweep runner
+# -----------------------------
+# Runs SectorRotationModel over a grid of (period, window, n_clusters,
+# feature set) configurations in a process pool.
+#
+# Layout of a sweep directory:
+#   prices/<period>/values.npy   dates x (sectors + market), read by workers as memmaps
+#   prices/<period>/dates.npy
+#   prices/<period>/columns.json
+#   runs/<config id>.csv         detected rotations of one configuration
+#   results.jsonl                one summary line per finished configuration
+#
+# Only the parent process writes results. A configuration counts as done once
+# its line is in results.jsonl, so an interrupted sweep resumes where it stopped
+# (failed configurations are retried). Prices saved for a period are reused on
+# resume, so every configuration of a sweep sees the same data.
+
+
+class SweepConfig:
+    def __init__(self, period: str, window: int, n_clusters: int, features=None):
+        self.period = period
+        self.window = int(window)
+        self.n_clusters = int(n_clusters)
+        self.features = tuple(features or FEATURE_NAMES)
+
+    @property
+    def id(self) -> str:
+        return f"{self.period}-w{self.window}-k{self.n_clusters}-{'+'.join(self.features)}"
+
+    def to_dict(self) -> dict:
+        return {
+            "period": self.period,
+            "window": self.window,
+            "n_clusters": self.n_clusters,
+            "features": list(self.features),
+        }
+
+
+def expand_grid(periods, windows, n_clusters, feature_sets=None) -> list:
+    """
+    Every combination of the given values, as SweepConfigs.
+    feature_sets: iterable of feature name lists; None = all features only
+    """
+    feature_sets = feature_sets or [FEATURE_NAMES]
+    return [
+        SweepConfig(period, window, k, features)
+        for period, window, k, features in itertools.product(periods, windows, n_clusters, feature_sets)
+    ]
+
+
+# -----------------------------
+# Shared prices
+# -----------------------------
+
+def save_prices(root: str, period: str, prices: pd.DataFrame) -> str:
+    """
+    Write a universe frame (sectors + market) where workers can memory-map it.
+    """
+    path = os.path.join(root, "prices", period)
+    os.makedirs(path, exist_ok=True)
+
+    np.save(os.path.join(path, "dates.npy"), prices.index.to_numpy(dtype="datetime64[D]"))
+    np.save(os.path.join(path, "values.npy"), np.ascontiguousarray(prices.to_numpy()))
+    # Written last: marks the directory as complete
+    with open(os.path.join(path, "columns.json"), "w") as f:
+        json.dump([str(c) for c in prices.columns], f)
+
+    return path
+
+
+def open_prices(path: str) -> pd.DataFrame:
+    """
+    Universe frame backed by the memory-mapped values (read-only, not copied).
+    """
+    with open(os.path.join(path, "columns.json")) as f:
+        columns = json.load(f)
+
+    dates = pd.DatetimeIndex(np.load(os.path.join(path, "dates.npy")), name="Date")
+    values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+    return pd.DataFrame(values, index=dates, columns=columns, copy=False)
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+
+def run_config(config: SweepConfig, prices_path: str, market_ticker: str):
+    """
+    One configuration. Module-level so it can be sent to a process pool.
+    Returns (summary dict, rotations DataFrame).
+    """
+    started = time.time()
+    sector_prices, market_prices = split_universe_prices(open_prices(prices_path), market_ticker)
+
+    model = SectorRotationModel(window_size=config.window, n_clusters=config.n_clusters,
+                                backend="numpy", features=config.features)
+    history, rotations = model.run(sector_prices, market_prices)
+
+    summary = dict(config.to_dict(), **_score(history, rotations, sector_prices))
+    summary["seconds"] = time.time() - started
+    return summary, rotations.to_frame()
+
+
+def _score(history, rotations, sector_prices: pd.DataFrame) -> dict:
+    """
+    Summary metrics of one run. tier_spread is the mean next-day return of the
+    best performance tier minus the worst, measured on each window's label
+    date (the day right after the window, so out of sample).
+    """
+    n_windows = len(history)
+    forward = (
+        sector_prices.pct_change(fill_method=None)
+        .reindex(index=pd.DatetimeIndex(history.dates), columns=history.sectors)
+        .to_numpy(dtype="float64")
+    )
+
+    spread = np.nan
+    if len(history.labels) > 1:
+        daily = _tier_mean(forward, history.codes == 0) - _tier_mean(forward, history.codes == len(history.labels) - 1)
+        daily = daily[np.isfinite(daily)]
+        if len(daily):
+            spread = daily.mean()
+
+    directions = rotations.counts()
+    return {
+        "windows": n_windows,
+        "rotations": len(rotations),
+        "rotations_per_window": len(rotations) / n_windows if n_windows else 0.0,
+        "rotations_in": directions.get("Rotation IN", 0),
+        "rotations_out": directions.get("Rotation OUT", 0),
+        "tier_spread": None if np.isnan(spread) else float(spread),
+    }
+
+
+def _tier_mean(forward: np.ndarray, members: np.ndarray) -> np.ndarray:
+    """
+    Per-date mean of `forward` over the masked sectors (NaN when none).
+    """
+    members = members & np.isfinite(forward)
+    counts = members.sum(axis=1)
+    sums = np.where(members, forward, 0.0).sum(axis=1)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+
+class SweepRunner:
+    def __init__(self, root: str = SWEEP_DIR, workers: int = SWEEP_WORKERS, load_prices=get_universe_prices):
+        """
+        root: sweep directory (see layout above); reusing it resumes the sweep
+        workers: processes; 0 runs configurations in this process
+        load_prices: period -> FetchReport with a universe frame (see data/dataGetter.py)
+        """
+        self.root = root
+        self.workers = workers
+        self.load_prices = load_prices
+        self.results_path = os.path.join(root, "results.jsonl")
+
+    def completed(self) -> set:
+        """
+        Ids of configurations with a successful result line.
+        """
+        done = set()
+        if not os.path.exists(self.results_path):
+            return done
+
+        with open(self.results_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn last line from an interrupted write
+                    continue
+                if record.get("status") == "ok":
+                    done.add(record["id"])
+        return done
+
+    def prices_path(self, period: str) -> str:
+        path = os.path.join(self.root, "prices", period)
+        if not os.path.exists(os.path.join(path, "columns.json")):
+            report = self.load_prices(period)
+            path = save_prices(self.root, period, report.prices)
+        return path
+
+    def run(self, configs) -> pd.DataFrame:
+        """
+        Run every configuration not finished yet; returns all results so far.
+        """
+        os.makedirs(os.path.join(self.root, "runs"), exist_ok=True)
+        self._terminate_last_line()
+        done = self.completed()
+        pending = [c for c in configs if c.id not in done]
+        logger.info("Sweep: %d configurations, %d already done", len(configs), len(configs) - len(pending))
+
+        market_ticker = get_universe().market
+        paths = {period: self.prices_path(period) for period in sorted({c.period for c in pending})}
+
+        if self.workers > 0 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(run_config, c, paths[c.period], market_ticker): c for c in pending}
+                for future in as_completed(futures):
+                    self._record(futures[future], future)
+        else:
+            for config in pending:
+                self._record(config, _Immediate(run_config, config, paths[config.period], market_ticker))
+
+        return self.results()
+
+    def _record(self, config: SweepConfig, future):
+        try:
+            summary, rotations = future.result()
+        except Exception as exc:
+            logger.warning("Sweep config %s failed: %s", config.id, exc)
+            self._append(dict(config.to_dict(), id=config.id, status="error", error=repr(exc)))
+            return
+
+        path = os.path.join(self.root, "runs", f"{config.id}.csv")
+        rotations.to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        self._append(dict(summary, id=config.id, status="ok"))
+
+    def _terminate_last_line(self):
+        """
+        After an interrupted write, start the next record on a fresh line.
+        """
+        if not os.path.exists(self.results_path) or not os.path.getsize(self.results_path):
+            return
+        with open(self.results_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _append(self, record: dict):
+        with open(self.results_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def results(self) -> pd.DataFrame:
+        """
+        Latest result line per configuration.
+        """
+        if not os.path.exists(self.results_path):
+            return pd.DataFrame()
+
+        records = []
+        with open(self.results_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+        df = pd.DataFrame(records)
+        return df.drop_duplicates("id", keep="last").reset_index(drop=True) if len(df) else df
+
+    def rotations(self, config: SweepConfig) -> pd.DataFrame:
+        return pd.read_csv(os.path.join(self.root, "runs", f"{config.id}.csv"))
+
+
+class _Immediate:
+    """
+    Future-like wrapper for running a configuration in-process.
+    """
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def result(self):
+        return self.fn(*self.args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep SectorRotationModel parameters")
+    parser.add_argument("--periods", nargs="+", default=["1y"])
+    parser.add_argument("--windows", nargs="+", type=int, default=[20, 30, 60])
+    parser.add_argument("--clusters", nargs="+", type=int, default=[3])
+    parser.add_argument("--features", nargs="+", action="append",
+                        help="one feature set per flag, e.g. --features ret_short volatility")
+    parser.add_argument("--out", default=SWEEP_DIR)
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    grid = expand_grid(args.periods, args.windows, args.clusters, args.features)
+    results = SweepRunner(args.out, args.workers).run(grid)
+    if len(results):
+        print(results.sort_values("tier_spread", ascending=False).to_string(index=False))
@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+# Modules import each other from the backend root (from data.fetcher import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """
+    The API (with its lifespan) on synthetic prices, computing in-process.
+    """
+    from fastapi.testclient import TestClient
+    from benchmarks.synthetic import SyntheticProvider
+    from data import dataGetter
+    import main
+
+    monkeypatch.setattr(dataGetter, "_store", None)
+    dataGetter.set_price_provider(SyntheticProvider(300), str(tmp_path / "prices"))
+    monkeypatch.setattr(main, "PROCESS_WORKERS", 0)
+    monkeypatch.setattr(main, "SNAPSHOT_INDEX_ENABLED", False)
+    with TestClient(main.app) as test_client:
+        yield test_client
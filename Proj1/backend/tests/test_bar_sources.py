@@ -0,0 +1,76 @@
+import asyncio
+import pandas as pd
+import pytest
+from data.bar_sources import ReplayBarSource, get_bar_source
+
+LONG = """timestamp,symbol,price
+2024-01-02 09:31,XLK,100.0
+2024-01-02 09:31,XLE,50.0
+2024-01-02 09:33,XLK,101.0
+2024-01-03 09:31,XLE,51.0
+2024-01-02 09:32,XLE,50.5
+"""
+
+WIDE = """timestamp,XLK,XLE
+2024-01-02 09:31,100.0,50.0
+2024-01-02 09:32,,50.5
+2024-01-02 09:33,101.0,
+2024-01-03 09:31,,51.0
+"""
+
+
+class RecordingSleep:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, seconds: float):
+        self.calls.append(seconds)
+
+
+def write(tmp_path, text: str) -> str:
+    path = tmp_path / "bars.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def replay(source) -> list:
+    async def collect():
+        return [bar async for bar in source.bars()]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("text", [LONG, WIDE])
+def test_layouts_read_the_same_bars(tmp_path, text):
+    bars = ReplayBarSource(write(tmp_path, text)).read()
+
+    assert [b.timestamp for b in bars] == list(pd.to_datetime(
+        ["2024-01-02 09:31", "2024-01-02 09:32", "2024-01-02 09:33", "2024-01-03 09:31"]))
+    assert [b.prices for b in bars] == [
+        {"XLE": 50.0, "XLK": 100.0}, {"XLE": 50.5}, {"XLK": 101.0}, {"XLE": 51.0},
+    ]
+
+
+def test_paced_within_a_day_only(tmp_path):
+    sleep = RecordingSleep()
+    bars = replay(ReplayBarSource(write(tmp_path, WIDE), speed=60, sleep=sleep))
+
+    assert len(bars) == 4
+    # A minute apart at 60x; the overnight gap is not waited for
+    assert sleep.calls == [1.0, 1.0]
+
+
+def test_speed_zero_does_not_wait(tmp_path):
+    sleep = RecordingSleep()
+    bars = replay(ReplayBarSource(write(tmp_path, LONG), speed=0, sleep=sleep))
+
+    assert len(bars) == 4
+    assert sleep.calls == []
+
+
+def test_get_bar_source(tmp_path):
+    source = get_bar_source(f"replay:{write(tmp_path, LONG)}", speed=2.0)
+    assert isinstance(source, ReplayBarSource) and source.speed == 2.0
+    with pytest.raises(ValueError):
+        get_bar_source("kafka:bars")
+    with pytest.raises(ValueError):
+        get_bar_source("replay:")
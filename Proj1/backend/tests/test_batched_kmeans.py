@@ -0,0 +1,90 @@
+import warnings
+import numpy as np
+import pytest
+from models.batched_kmeans import batched_kmeans
+from models.kmeans import SectorKMeans
+
+N_CLUSTERS = 3
+
+
+def blob_windows(n_windows=16, n_points=11, n_features=3, seed=0):
+    """
+    Windows of points around 3 well-separated centers (a unique optimum).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 5, size=(n_windows, N_CLUSTERS, n_features))
+    members = np.stack([rng.permutation(np.arange(n_points) % N_CLUSTERS) for _ in range(n_windows)])
+    noise = rng.normal(0, 0.3, size=(n_windows, n_points, n_features))
+    return np.take_along_axis(centers, members[:, :, None], axis=1) + noise
+
+
+def per_window(window: np.ndarray):
+    """
+    The per-window path: SectorKMeans (sklearn) on one window.
+    Returns (labels, centers in standardized units, inertia).
+    """
+    kmeans = SectorKMeans(N_CLUSTERS)
+    with warnings.catch_warnings():
+        # Degenerate windows: "Number of distinct clusters found smaller than n_clusters"
+        warnings.simplefilter("ignore")
+        labels = kmeans.fit_predict(window)
+    return labels, kmeans.model.cluster_centers_, kmeans.model.inertia_
+
+
+def same_partition(a: np.ndarray, b: np.ndarray) -> bool:
+    return np.array_equal(a[:, None] == a[None, :], b[:, None] == b[None, :])
+
+
+def matched_centers(labels_a, centers_a, labels_b, centers_b):
+    """
+    centers_b reordered so cluster ids follow labels_a (for occupied clusters).
+    """
+    order = {b: a for a, b in zip(labels_a, labels_b)}
+    return (np.array([centers_a[a] for a in order.values()]),
+            np.array([centers_b[b] for b in order]))
+
+
+def test_matches_per_window_kmeans():
+    values = blob_windows()
+    labels, centers, inertia = batched_kmeans(values, N_CLUSTERS)
+
+    for w, window in enumerate(values):
+        ref_labels, ref_centers, ref_inertia = per_window(window)
+        assert same_partition(labels[w], ref_labels)
+        expected, actual = matched_centers(ref_labels, ref_centers, labels[w], centers[w])
+        np.testing.assert_allclose(actual, expected, atol=1e-8)
+        assert inertia[w] == pytest.approx(ref_inertia, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("distinct", [1, 2])
+def test_degenerate_windows_with_fewer_distinct_points_than_k(distinct):
+    rng = np.random.default_rng(distinct)
+    points = rng.normal(size=(distinct, 3))
+    values = points[np.arange(9) % distinct][None]
+
+    labels, centers, inertia = batched_kmeans(values, N_CLUSTERS)
+    ref_labels, ref_centers, ref_inertia = per_window(values[0])
+
+    assert same_partition(labels[0], ref_labels)
+    assert inertia[0] == pytest.approx(0.0, abs=1e-12) and ref_inertia == pytest.approx(0.0, abs=1e-12)
+    expected, actual = matched_centers(ref_labels, ref_centers, labels[0], centers[0])
+    np.testing.assert_allclose(actual, expected, atol=1e-12)
+    assert np.isfinite(centers).all()
+
+
+def test_masked_points_are_left_out():
+    values = blob_windows(n_windows=4)
+    values[1, [2, 5]] = np.nan
+    labels, _, _ = batched_kmeans(values, N_CLUSTERS)
+
+    assert (labels[1, [2, 5]] == -1).all()
+    keep = ~np.isnan(values[1]).any(axis=1)
+    ref_labels, _, _ = per_window(values[1][keep])
+    assert same_partition(labels[1][keep], ref_labels)
+
+
+def test_backends_agree_in_fit_predict_batch():
+    values = blob_windows(seed=3)
+    numpy_labels = SectorKMeans(N_CLUSTERS, backend="numpy").fit_predict_batch(values)
+    sklearn_labels = SectorKMeans(N_CLUSTERS, backend="sklearn").fit_predict_batch(values)
+    assert all(same_partition(a, b) for a, b in zip(numpy_labels, sklearn_labels))
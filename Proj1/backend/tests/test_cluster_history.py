@@ -0,0 +1,175 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+import pytest
+from models.cluster_history import ROTATION_IN, ClusterHistory, RotationEvents
+
+LABELS = ["Outperforming", "Neutral", "Underperforming"]
+SECTORS = ["Energy", "Utilities", "Technology", "Financials", "Health Care"]
+
+
+def baseline_rotations(cluster_history: dict, labels: list) -> list:
+    # SectorRotationModel._detect_rotations / _classify_direction before the
+    # columnar history, over the date -> {sector: label} layout
+    def classify_direction(from_label, to_label):
+        order = {label: len(labels) - 1 - i for i, label in enumerate(labels)}
+
+        if from_label is None or to_label is None:
+            return "Unknown"
+
+        if order[to_label] > order[from_label]:
+            return "Rotation IN"
+        elif order[to_label] < order[from_label]:
+            return "Rotation OUT"
+        else:
+            return "No Change"
+
+    rotations = []
+    dates = list(cluster_history.keys())
+
+    for i in range(1, len(dates)):
+        prev_date = dates[i - 1]
+        curr_date = dates[i]
+
+        prev_snapshot = cluster_history[prev_date]
+        curr_snapshot = cluster_history[curr_date]
+
+        for sector in curr_snapshot:
+            prev_label = prev_snapshot.get(sector)
+            curr_label = curr_snapshot.get(sector)
+
+            if prev_label != curr_label:
+                rotation = {
+                    "date": curr_date,
+                    "sector": sector,
+                    "from": prev_label,
+                    "to": curr_label,
+                    "direction": classify_direction(prev_label, curr_label)
+                }
+                rotations.append(rotation)
+    return rotations
+
+
+@pytest.fixture(scope="module")
+def history():
+    # Sticky random tiers with some sectors missing for a few dates
+    rng = np.random.default_rng(3)
+    codes = np.zeros((120, len(SECTORS)), dtype=np.int8)
+    codes[0] = rng.integers(0, 3, len(SECTORS))
+    for t in range(1, len(codes)):
+        moved = rng.random(len(SECTORS)) < 0.2
+        codes[t] = np.where(moved, rng.integers(0, 3, len(SECTORS)), codes[t - 1])
+    codes[10:14, 1] = -1
+    codes[:5, 4] = -1
+    codes[60, :] = -1
+    return ClusterHistory(pd.bdate_range("2024-01-01", periods=len(codes)), SECTORS, LABELS, codes)
+
+
+@pytest.fixture(scope="module")
+def expected(history):
+    return baseline_rotations(history.to_dict(), LABELS)
+
+
+def test_detect_rotations_matches_the_baseline(history, expected):
+    events = history.detect_rotations()
+
+    assert events.to_records() == expected
+    assert len(expected) > 50
+    # Reappearing sectors come back as "Unknown"
+    assert {"date": "2024-01-19", "sector": "Utilities", "from": None, "to": LABELS[history.codes[14, 1]],
+            "direction": "Unknown"} in expected
+
+
+def test_append_matches_detect_rotations(history):
+    grown = ClusterHistory([], SECTORS, LABELS)
+    events = RotationEvents(np.empty(0, dtype=history.detect_rotations().events.dtype), SECTORS, LABELS)
+    for date, codes in zip(history.dates, history.codes):
+        events.extend(grown.append(date, codes))
+
+    np.testing.assert_array_equal(grown.codes, history.codes)
+    np.testing.assert_array_equal(events.events, history.detect_rotations().events)
+
+
+def test_to_dict_leaves_out_missing_sectors(history):
+    snapshot = history.to_dict()["2024-01-15"]
+    assert "Utilities" not in snapshot
+    assert list(snapshot) == ["Energy", "Technology", "Financials", "Health Care"]
+
+
+@pytest.mark.parametrize("sector", [None, "Energy", ["Technology", "Energy"]])
+@pytest.mark.parametrize("start, end", [(None, None), ("2024-02-01", None), (None, "2024-03-01"),
+                                        ("2024-02-03", "2024-02-04")])
+def test_history_query(history, sector, start, end):
+    result = history.query(sector=sector, start=start, end=end)
+
+    frame = history.frame().loc[start:end]
+    if sector is not None:
+        frame = frame[[sector] if isinstance(sector, str) else sector]
+    pd.testing.assert_frame_equal(result.frame(), frame)
+
+
+def test_history_query_unknown_sector(history):
+    with pytest.raises(KeyError):
+        history.query(sector=["Energy", "Materials"])
+
+
+def test_history_query_empty(history):
+    result = history.query(start="2030-01-01")
+    assert len(result) == 0
+    assert result.to_dict() == {}
+    assert len(result.detect_rotations()) == 0
+    assert result.frame().shape == (0, len(SECTORS))
+
+
+def filter_records(records, sector=None, start=None, end=None, direction=None) -> list:
+    names = None if sector is None else [sector] if isinstance(sector, str) else sector
+    return [r for r in records
+            if (names is None or r["sector"] in names)
+            and (start is None or r["date"] >= start) and (end is None or r["date"] <= end)
+            and (direction is None or r["direction"] == direction)]
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"sector": "Energy"},
+    {"sector": ["Utilities", "Health Care"]},
+    {"start": "2024-02-01", "end": "2024-03-15"},
+    {"end": "2024-01-10"},
+    {"direction": "Rotation IN"},
+    {"direction": "Unknown", "start": "2024-01-05"},
+    {"sector": "Technology", "start": "2024-03-01", "direction": "Rotation OUT"},
+])
+def test_events_query(history, expected, filters):
+    events = history.detect_rotations().query(**filters)
+    records = filter_records(expected, **filters)
+
+    assert events.to_records() == records
+    assert events.counts() == dict(Counter(r["direction"] for r in records))
+
+
+def test_events_query_direction_code(history):
+    events = history.detect_rotations()
+    assert events.query(direction=ROTATION_IN).to_records() == events.query(direction="Rotation IN").to_records()
+
+
+def test_events_to_frame(history, expected):
+    frame = history.detect_rotations().to_frame()
+
+    assert list(frame.columns) == ["date", "sector", "from", "to", "direction"]
+    assert list(frame["date"].dt.strftime("%Y-%m-%d")) == [r["date"] for r in expected]
+    for column in ("sector", "from", "to", "direction"):
+        # Missing "from" tiers are NaN in the categorical column
+        values = frame[column].astype(object).where(frame[column].notna(), None)
+        assert values.tolist() == [r[column] for r in expected]
+
+
+@pytest.mark.parametrize("filters", [{"start": "2030-01-01"}, {"sector": "Materials"},
+                                     {"start": "2024-01-01", "end": "2024-01-01"}])
+def test_events_query_empty(history, filters):
+    events = history.detect_rotations().query(**filters)
+
+    assert len(events) == 0
+    assert events.counts() == {}
+    assert events.to_records() == []
+    frame = events.to_frame()
+    assert frame.empty and list(frame.columns) == ["date", "sector", "from", "to", "direction"]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_prices
+from models import cluster_matching
+from models.cluster_history import ClusterHistory
+from models.cluster_matching import ClusterTracker, _assign, _rank
+from models.sector_rotation import SectorRotationModel
+
+CENTERS = np.array([[0.05, 0.1], [0.0, 0.0], [-0.05, -0.1]])
+SCALE = np.ones(2)
+
+
+@pytest.mark.parametrize("backend", ["sklearn", "numpy"])
+def test_zero_hysteresis_ranks_every_window_independently(backend):
+    sector_prices, market_prices = synthetic_prices(10, 140, 10, seed=11)
+
+    tracked = SectorRotationModel(30, backend=backend, hysteresis=0)
+    independent = SectorRotationModel(30, backend=backend, hysteresis=None)
+    tracked.run(sector_prices, market_prices)
+    independent.run(sector_prices, market_prices)
+
+    np.testing.assert_array_equal(tracked.cluster_history.codes, independent.cluster_history.codes)
+
+
+def test_zero_hysteresis_tiers_are_the_ranking():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(50, 4, 3))
+    means = rng.normal(size=(50, 4))
+
+    _, tiers = ClusterTracker(4, hysteresis=0).update_batch(centers, means, np.ones((50, 3)))
+
+    np.testing.assert_array_equal(tiers, np.stack([_rank(m) for m in means]))
+
+
+def test_ids_follow_clusters_when_kmeans_permutes_them():
+    tracker = ClusterTracker(3)
+    means = np.array([0.05, 0.0, -0.05])
+    ids, tiers = tracker.update(CENTERS, means, SCALE)
+
+    for perm in ([2, 0, 1], [1, 2, 0], [0, 2, 1]):
+        # Same clusters, moved a little, under other K-Means indices
+        moved_ids, moved_tiers = tracker.update(CENTERS[perm] + 0.001, means[perm], SCALE)
+        np.testing.assert_array_equal(moved_ids, ids[perm])
+        np.testing.assert_array_equal(moved_tiers, tiers[perm])
+
+
+def rotations(tiers: np.ndarray) -> int:
+    # Sector i sits in K-Means cluster i in every window
+    history = ClusterHistory(pd.date_range("2024-01-01", periods=len(tiers)).values,
+                             ["A", "B", "C"], ["Outperforming", "Neutral", "Underperforming"], tiers)
+    return len(history.detect_rotations())
+
+
+def test_tier_swap_needs_to_clear_the_hysteresis():
+    start = np.array([0.05, 0.0, -0.05])
+    # The two leaders cross by less / more than 0.1 x spread (0.0055 / 0.006)
+    below = np.array([0.0, 0.005, -0.05])
+    above = np.array([0.0, 0.02, -0.05])
+
+    tiers = [ClusterTracker(3).update_batch(np.stack([CENTERS] * 2), np.stack([start, m]), np.ones((2, 2)))[1]
+             for m in (below, above)]
+
+    np.testing.assert_array_equal(tiers[0][1], [0, 1, 2])
+    assert rotations(tiers[0]) == 0
+    np.testing.assert_array_equal(tiers[1][1], [1, 0, 2])
+    assert rotations(tiers[1]) == 2
+
+
+@pytest.mark.parametrize("k", [2, 4, 6])
+def test_enumerated_assignment_matches_scipy(monkeypatch, k):
+    cost = np.random.default_rng(k).random((40, k, k))
+    enumerated = _assign(cost)
+
+    monkeypatch.setattr(cluster_matching, "_MAX_ENUMERATED_CLUSTERS", 0)
+    np.testing.assert_array_equal(_assign(cost), enumerated)
+
+
+def test_scipy_assignment_above_the_enumeration_limit():
+    # k = 8 goes to scipy; a shuffled diagonal has one zero-cost matching
+    perm = np.random.default_rng(1).permutation(8)
+    cost = np.ones((3, 8, 8))
+    cost[:, np.arange(8), perm] = 0.0
+
+    np.testing.assert_array_equal(_assign(cost), np.tile(perm, (3, 1)))
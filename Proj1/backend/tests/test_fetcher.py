@@ -0,0 +1,79 @@
+import time
+import pandas as pd
+from data.fetcher import fetch_universe
+
+
+def closes(n=3):
+    return pd.Series(range(1, n + 1), index=pd.bdate_range("2024-01-01", periods=n), dtype="float64")
+
+
+class FlakyProvider:
+    """
+    fetch_many drops `batch_missing`; fetch fails `failures[ticker]` times
+    before answering with `answers[ticker]`.
+    """
+
+    def __init__(self, answers: dict, batch_missing=(), failures=None):
+        self.answers = answers
+        self.batch_missing = set(batch_missing)
+        self.failures = dict(failures or {})
+        self.single_calls = []
+
+    def fetch_many(self, tickers, period=None, start=None):
+        return {t: pd.Series(dtype="float64") if t in self.batch_missing else self.answers[t] for t in tickers}
+
+    def fetch(self, ticker, period=None, start=None):
+        self.single_calls.append(ticker)
+        if self.failures.get(ticker, 0):
+            self.failures[ticker] -= 1
+            raise ConnectionError("reset by peer")
+        return self.answers[ticker]
+
+
+def test_batch_returns_everything_without_single_calls():
+    provider = FlakyProvider({"A": closes(), "B": closes()})
+    report = fetch_universe(provider, ["A", "B"], period="6mo")
+    assert report.ok and set(report.series) == {"A", "B"}
+    assert provider.single_calls == []
+
+
+def test_retries_then_reports_failure():
+    provider = FlakyProvider({"A": closes(), "B": closes()}, batch_missing=["A", "B"], failures={"A": 1, "B": 5})
+    report = fetch_universe(provider, ["A", "B"], period="6mo", retries=1, backoff=0)
+    assert list(report.series) == ["A"]
+    assert [(f.ticker, f.attempts) for f in report.failures] == [("B", 2)]
+
+
+def test_empty_incremental_batch_entry_is_checked_per_ticker():
+    # B fails inside the batch (empty) but has bars when asked on its own
+    provider = FlakyProvider({"A": closes(), "B": closes()}, batch_missing=["B"])
+    report = fetch_universe(provider, ["A", "B"], start="2024-01-01")
+    assert provider.single_calls == ["B"]
+    assert len(report.series["B"]) == 3
+
+
+def test_empty_incremental_single_fetch_means_no_new_bars():
+    provider = FlakyProvider({"A": closes(), "B": closes(0)}, batch_missing=["B"])
+    report = fetch_universe(provider, ["A", "B"], start="2024-02-01")
+    assert report.ok and len(report.series["B"]) == 0
+
+
+class SlowFlakyProvider(FlakyProvider):
+    def __init__(self, answers: dict, delays: dict, **kwargs):
+        super().__init__(answers, **kwargs)
+        self.delays = delays
+
+    def fetch(self, ticker, period=None, start=None):
+        time.sleep(self.delays.get(ticker, 0.0))
+        return super().fetch(ticker, period, start)
+
+
+def test_backoffs_do_not_hold_up_other_tickers():
+    # B fails while A backs off: both retries wait out their backoff together
+    provider = SlowFlakyProvider({"A": closes(), "B": closes()}, {"B": 0.05},
+                                 batch_missing=["A", "B"], failures={"A": 1, "B": 1})
+    started = time.monotonic()
+    report = fetch_universe(provider, ["A", "B"], period="6mo", retries=1, backoff=0.5)
+
+    assert report.ok
+    assert time.monotonic() - started < 0.9
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_prices
+from models.flow_graph import FlowGraph
+from models.rotation_flow import (
+    compute_relative_strength, compute_rolling_strength, compute_sector_returns, iter_daily_flows
+)
+
+BLOCK = 7
+# Day ranges [lo, hi): empty, inside one block, on checkpoints, across one or many
+RANGES = [(0, None), (5, 5), (1, 6), (7, 14), (3, 10), (6, 8), (13, 50), (20, 111)]
+
+
+@pytest.fixture(scope="module")
+def strength():
+    sector_prices, market_prices = synthetic_prices(8, 120, 8, seed=9)
+    rel_strength = compute_relative_strength(compute_sector_returns(sector_prices),
+                                             market_prices.pct_change().dropna())
+    return compute_rolling_strength(rel_strength, 5)
+
+
+@pytest.fixture(scope="module")
+def graph(strength):
+    return FlowGraph.from_rolling_strength(strength, chunk_size=16, block=BLOCK)
+
+
+@pytest.fixture(scope="module")
+def dense(strength):
+    # (days, sectors, sectors): day i is the move from row i to row i + 1
+    return np.concatenate([daily for _, daily in iter_daily_flows(strength)])
+
+
+def test_layout(graph, dense, strength):
+    assert len(graph) == len(dense) == len(strength) - 1
+    assert graph.block == BLOCK
+    pd.testing.assert_index_equal(graph.dates, pd.DatetimeIndex(strength.index[1:]))
+    np.testing.assert_array_equal(graph.sparse().toarray(), dense.sum(axis=0))
+
+
+def test_default_block_is_one_day_for_small_graphs(strength, dense):
+    graph = FlowGraph.from_rolling_strength(strength)
+    assert graph.block == 1
+    np.testing.assert_array_equal(graph.matrix(3, 10), dense[3:10].sum(axis=0))
+
+
+@pytest.mark.parametrize("lo, hi", RANGES)
+def test_matrix(graph, dense, lo, hi):
+    np.testing.assert_array_equal(graph.matrix(lo, hi), dense[lo:hi].sum(axis=0))
+
+
+@pytest.mark.parametrize("lo, hi", [(0, 7), (3, 10), (13, 50), (40, 41)])
+def test_bounds(graph, lo, hi):
+    # Dates in [start, end] are exactly days [lo, hi)
+    dates = graph.dates
+    assert graph.bounds(dates[lo], dates[hi - 1]) == (lo, hi)
+    # Dates between trading days round inwards
+    assert graph.bounds(dates[lo] - pd.Timedelta(hours=1), dates[hi - 1] + pd.Timedelta(hours=1)) == (lo, hi)
+    assert graph.bounds(dates[lo] + pd.Timedelta(hours=1), dates[hi - 1] - pd.Timedelta(hours=1)) == (lo + 1, max(lo + 1, hi - 1))
+
+
+def test_bounds_outside_the_history(graph):
+    assert graph.bounds() == (0, len(graph))
+    assert graph.bounds(end=graph.dates[0] - pd.Timedelta(days=1)) == (0, 0)
+    assert graph.bounds(start=graph.dates[-1] + pd.Timedelta(days=1)) == (len(graph), len(graph))
+    assert graph.bounds(graph.dates[10], graph.dates[5]) == (10, 10)
+
+
+def test_flow_matrix_by_date(graph, dense):
+    expected = dense[3:10].sum(axis=0)
+    matrix = graph.flow_matrix(graph.dates[3], graph.dates[9])
+    np.testing.assert_array_equal(matrix.to_numpy(), expected)
+    pd.testing.assert_index_equal(matrix.index, graph.sectors)
+
+
+@pytest.mark.parametrize("lo, hi", RANGES)
+def test_net_inflow(graph, dense, lo, hi):
+    matrix = dense[lo:hi].sum(axis=0)
+    expected = []
+    for s, sector in enumerate(graph.sectors):
+        inflow, outflow = matrix[:, s].sum(), matrix[s, :].sum()
+        expected.append((sector, inflow, outflow, inflow - outflow))
+    # Largest net inflow first, ties in sector order
+    expected.sort(key=lambda row: -row[3])
+
+    net = graph.net_inflow(lo, hi)
+    assert list(net["sector"]) == [row[0] for row in expected]
+    np.testing.assert_array_equal(net[["inflow", "outflow", "net"]].to_numpy(),
+                                  np.array([row[1:] for row in expected]).reshape(-1, 3))
+
+
+@pytest.mark.parametrize("lo, hi", RANGES)
+@pytest.mark.parametrize("k", [1, 5, 100])
+def test_top_flows(graph, dense, lo, hi, k):
+    matrix = dense[lo:hi].sum(axis=0)
+    expected = sorted((w for w in matrix.ravel() if w > 0), reverse=True)[:k]
+
+    top = graph.top_flows(lo, hi, k)
+    np.testing.assert_array_equal(top["weight"].to_numpy(), expected)
+    cells = list(zip(top["source"], top["target"]))
+    assert len(set(cells)) == len(cells)
+    for (source, target), weight in zip(cells, top["weight"]):
+        assert matrix[graph.sectors.get_loc(source), graph.sectors.get_loc(target)] == weight
+
+
+def brute_persistence(graph, dense, path, lo, hi) -> dict:
+    nodes = [graph.sectors.get_loc(s) for s in path]
+    hops = list(zip(nodes[:-1], nodes[1:]))
+    days = dense[lo:hi]
+
+    followed = [all(days[d + i, src, tgt] > 0 for i, (src, tgt) in enumerate(hops))
+                for d in range(len(days) - len(hops) + 1)]
+    longest = run = 0
+    for f in followed:
+        run = run + 1 if f else 0
+        longest = max(longest, run)
+
+    return {
+        "path": list(path),
+        "days": len(followed),
+        "active_days": sum(followed),
+        "persistence": sum(followed) / len(followed) if followed else 0.0,
+        "longest_run": longest,
+        "hop_persistence": [float((days[:, src, tgt] > 0).mean()) if len(days) else 0.0 for src, tgt in hops],
+    }
+
+
+def busy_path(graph, dense, length) -> list:
+    # Follow the busiest hop out of each sector, so the path is actually taken
+    active = (dense > 0).sum(axis=0)
+    node = int(np.unravel_index(active.argmax(), active.shape)[0])
+    path = [node]
+    for _ in range(length - 1):
+        counts = active[path[-1]].copy()
+        counts[path] = -1
+        path.append(int(counts.argmax()))
+    return [graph.sectors[n] for n in path]
+
+
+@pytest.mark.parametrize("lo, hi", RANGES)
+@pytest.mark.parametrize("length", [2, 3])
+def test_path_persistence(graph, dense, lo, hi, length):
+    path = busy_path(graph, dense, length)
+    hi = len(graph) if hi is None else hi
+    result = graph.path_persistence(path, lo, hi)
+
+    expected = brute_persistence(graph, dense, path, lo, hi)
+    assert result == pytest.approx(expected)
+    if (lo, hi) == (0, len(graph)):
+        assert result["active_days"] > 0
+
+
+def test_path_persistence_needs_known_sectors(graph):
+    with pytest.raises(KeyError):
+        graph.path_persistence([graph.sectors[0]])
+    with pytest.raises(KeyError):
+        graph.path_persistence([graph.sectors[0], "Nowhere"])
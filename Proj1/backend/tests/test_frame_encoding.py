@@ -0,0 +1,166 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from utils.frame_encoding import COLUMNS, FrameEncoder, decimate_frames, decode_frames, iter_encoded_frames
+
+PRECISION = 1e-3
+LABELS = ["Outperforming", "Neutral", "Underperforming"]
+
+
+def make_frames(n_frames: int = 40, seed: int = 0) -> list:
+    """
+    Random-walk frames where sector "E" enters at frame 10, "B" leaves at
+    frame 15 and comes back at 25, "F" enters at 30, and a few coordinates
+    are NaN.
+    """
+    rng = np.random.default_rng(seed)
+    names = list("ABCDEF")
+    values = rng.normal(0, 0.05, (len(names), len(COLUMNS)))
+    clusters = rng.integers(0, 3, len(names))
+
+    frames = []
+    for t, date in enumerate(pd.bdate_range("2024-01-01", periods=n_frames)):
+        values += rng.normal(0, 0.002, values.shape)
+        # Labels change every few frames only
+        if t % 4 == 0:
+            clusters = rng.integers(0, 3, len(names))
+        present = [s for s in range(len(names))
+                   if not (names[s] == "E" and t < 10) and not (names[s] == "B" and 15 <= t < 25)
+                   and not (names[s] == "F" and t < 30)]
+        frame = pd.DataFrame(values[present], columns=COLUMNS)
+        frame.insert(0, "sector", [names[s] for s in present])
+        frame.insert(0, "date", str(date.date()))
+        frame["cluster"] = clusters[present]
+        frame["performance"] = [LABELS[c] for c in clusters[present]]
+        if 5 <= t < 8:
+            frame.loc[frame["sector"] == "C", "ret_short"] = np.nan
+        if t == 12:
+            frame.loc[frame["sector"] == "A", COLUMNS] = np.nan
+        # Row order is not fixed between frames
+        frames.append(frame.sample(frac=1, random_state=t).reset_index(drop=True))
+    return frames
+
+
+def decode(messages) -> pd.DataFrame:
+    # Messages go over the wire as JSON
+    return decode_frames(json.loads(json.dumps(list(messages))))
+
+
+def assert_round_trip(decoded: pd.DataFrame, frames: list):
+    expected = pd.concat(frames, ignore_index=True).sort_values(["date", "sector"], ignore_index=True)
+    decoded = decoded.sort_values(["date", "sector"], ignore_index=True)
+
+    assert list(decoded.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(decoded[["date", "sector", "performance"]],
+                                  expected[["date", "sector", "performance"]])
+    np.testing.assert_array_equal(decoded["cluster"].to_numpy(dtype=int), expected["cluster"].to_numpy())
+    for column in COLUMNS:
+        got, want = decoded[column].to_numpy(dtype=float), expected[column].to_numpy()
+        np.testing.assert_array_equal(np.isnan(got), np.isnan(want))
+        assert np.nanmax(np.abs(got - want)) <= PRECISION / 2 + 1e-12
+
+
+def test_round_trip():
+    frames = make_frames()
+    messages = list(iter_encoded_frames(frames, precision=PRECISION))
+
+    assert [m["type"] for m in messages] == ["key"] + ["delta"] * (len(frames) - 1)
+    assert messages[10]["sectors"] == ["E"]
+    assert "sectors" not in messages[25]
+    assert_round_trip(decode(messages), frames)
+
+
+def test_sectors_entering_and_leaving():
+    frames = make_frames()
+    messages = list(iter_encoded_frames(frames, precision=PRECISION))
+    decoded = decode(messages)
+
+    days = decoded.groupby("sector")["date"].agg(list)
+    dates = [frame["date"].iat[0] for frame in frames]
+    assert days["E"] == dates[10:]
+    assert days["B"] == dates[:15] + dates[25:]
+    assert days["F"] == dates[30:]
+    # B leaving and coming back resets its coordinates
+    b = messages[0]["sectors"].index("B")
+    assert [b, None] in messages[15]["reset"]["ret_short"]
+    assert any(i == b and q is not None for i, q in messages[25]["reset"]["ret_short"])
+
+
+def test_nan_coordinates():
+    frames = make_frames()
+    decoded = decode(iter_encoded_frames(frames, precision=PRECISION))
+
+    c = decoded[decoded["sector"] == "C"].set_index("date")["ret_short"]
+    dates = [frame["date"].iat[0] for frame in frames]
+    assert c[dates[5:8]].isna().all()
+    assert c.drop(dates[5:8]).notna().all()
+    a = decoded[(decoded["sector"] == "A") & (decoded["date"] == dates[12])]
+    assert a[COLUMNS].isna().all(axis=None)
+
+
+def test_per_column_precision():
+    frames = make_frames(10)
+    precision = {"ret_short": 1e-5, "size": 1e-1}
+    encoder = FrameEncoder(precision)
+    messages = [encoder.encode(frame) for frame in frames]
+
+    assert messages[0]["precision"]["ret_short"] == 1e-5
+    assert messages[0]["precision"]["volatility"] == 1e-4
+    decoded = decode(messages).sort_values(["date", "sector"], ignore_index=True)
+    expected = pd.concat(frames).sort_values(["date", "sector"], ignore_index=True)
+    for column, step in messages[0]["precision"].items():
+        assert np.nanmax(np.abs(decoded[column] - expected[column])) <= step / 2 + 1e-12
+
+
+@pytest.mark.parametrize("every", [1, 5, 7])
+def test_keyframe_every(every):
+    frames = make_frames()
+    messages = list(iter_encoded_frames(frames, precision=PRECISION, keyframe_every=every))
+
+    keys = [i for i, m in enumerate(messages) if m["type"] == "key"]
+    assert keys == list(range(0, len(frames), every))
+    assert_round_trip(decode(messages), frames)
+    # A client can start at any keyframe
+    for k in keys:
+        assert_round_trip(decode(messages[k:]), frames[k:])
+
+
+def test_single_keyframe_by_default():
+    messages = list(iter_encoded_frames(make_frames(), precision=PRECISION))
+    assert sum(m["type"] == "key" for m in messages) == 1
+
+
+def label_rows(frame) -> frozenset:
+    return frozenset(zip(frame["sector"], frame["cluster"], frame["performance"]))
+
+
+@pytest.mark.parametrize("stride", [1, 3, 10])
+def test_stride(stride):
+    frames = make_frames()
+    kept = list(decimate_frames(frames, stride=stride))
+
+    assert [f["date"].iat[0] for f in kept] == [f["date"].iat[0] for f in frames[::stride]]
+    assert_round_trip(decode(iter_encoded_frames(frames, precision=PRECISION, stride=stride)), frames[::stride])
+
+
+@pytest.mark.parametrize("stride", [1, 2])
+def test_on_label_change(stride):
+    frames = make_frames()
+    kept = list(decimate_frames(frames, stride=stride, on_label_change=True))
+
+    expected, last = [], None
+    for frame in frames[::stride]:
+        if label_rows(frame) != last:
+            expected.append(frame)
+            last = label_rows(frame)
+    assert len(expected) < len(frames[::stride])
+    assert [f["date"].iat[0] for f in kept] == [f["date"].iat[0] for f in expected]
+    assert kept[0] is frames[0]
+    assert_round_trip(decode(iter_encoded_frames(frames, precision=PRECISION, stride=stride,
+                                                 on_label_change=True)), expected)
+
+
+def test_no_frames():
+    assert decode_frames([]).empty
+    assert list(iter_encoded_frames([])) == []
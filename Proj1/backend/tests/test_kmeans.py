@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.kmeans import SectorKMeans, _lloyd
+
+
+def blobs(rng, centers, n_points=5, sd=0.3) -> np.ndarray:
+    return np.concatenate([c + rng.normal(0, sd, (n_points, 2)) for c in np.asarray(centers, dtype=float)])
+
+
+def same_partition(a: np.ndarray, b: np.ndarray) -> bool:
+    return np.array_equal(a[:, None] == a[None, :], b[:, None] == b[None, :])
+
+
+def cold_fit(window: np.ndarray) -> SectorKMeans:
+    kmeans = SectorKMeans(3)
+    kmeans.fit_predict(pd.DataFrame(window))
+    return kmeans
+
+
+@pytest.fixture
+def first_window():
+    return blobs(np.random.default_rng(0), [(-10, -10), (0, 10), (10, -10)])
+
+
+def test_stable_window_keeps_the_warm_centroids(first_window):
+    kmeans = SectorKMeans(3, warm_start=True)
+    kmeans.fit_predict(pd.DataFrame(first_window))
+    previous = kmeans._prev_centers
+
+    window = first_window + np.random.default_rng(1).normal(0, 0.05, first_window.shape)
+    labels = kmeans.fit_predict(pd.DataFrame(window))
+
+    assert (kmeans.n_restarts, kmeans.n_warm_fits) == (1, 1)
+    # Cluster ids carry over from the previous window
+    np.testing.assert_allclose(kmeans._prev_centers, previous, atol=0.2)
+    cold = cold_fit(window)
+    assert same_partition(labels, cold.model.labels_)
+    assert kmeans.model.inertia_ == pytest.approx(cold.model.inertia_)
+
+
+def test_shifted_window_restarts_and_matches_a_cold_fit(first_window):
+    kmeans = SectorKMeans(3, warm_start=True, restart_tolerance=0.25)
+    kmeans.fit_predict(pd.DataFrame(first_window))
+    previous_inertia = kmeans._prev_inertia
+
+    # One long cluster on the left where two of the old centroids land, and
+    # two on the right the third one has to cover alone
+    rng = np.random.default_rng(2)
+    window = np.concatenate([np.column_stack([np.linspace(-14, -2, 8), rng.normal(0, 0.3, 8)]),
+                             blobs(rng, [(10, 6), (10, -6)], n_points=4)])
+
+    # Warm Lloyd from the old centroids is stuck above the tolerance
+    scaled = (window - window.mean(axis=0)) / window.std(axis=0)
+    init = (kmeans._prev_centers - window.mean(axis=0)) / window.std(axis=0)
+    assert _lloyd(scaled, init, kmeans.warm_max_iter).inertia_ > previous_inertia * 1.25
+
+    labels = kmeans.fit_predict(pd.DataFrame(window))
+
+    assert (kmeans.n_restarts, kmeans.n_warm_fits) == (2, 0)
+    cold = cold_fit(window)
+    np.testing.assert_array_equal(labels, cold.model.labels_)
+    np.testing.assert_allclose(kmeans.model.cluster_centers_, cold.model.cluster_centers_)
+    assert kmeans.model.inertia_ == pytest.approx(cold.model.inertia_)
+    # The restart becomes the next window's warm start
+    assert kmeans._prev_inertia == pytest.approx(cold.model.inertia_)
+
+
+def test_reset_forces_a_restart(first_window):
+    kmeans = SectorKMeans(3, warm_start=True)
+    kmeans.fit_predict(pd.DataFrame(first_window))
+    kmeans.reset()
+    kmeans.fit_predict(pd.DataFrame(first_window))
+
+    assert (kmeans.n_restarts, kmeans.n_warm_fits) == (2, 0)
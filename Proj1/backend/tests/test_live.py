@@ -0,0 +1,117 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_prices
+from data.bar_sources import Bar
+from services.live import Broadcaster, LiveEngine, LiveFeed, _GroupPrices
+
+MAPPING = pd.Series({"a1": "A", "a2": "A", "b1": "B"})
+
+
+def test_first_member_bar_moves_from_the_daily_close():
+    groups = _GroupPrices(["A", "B"], np.array([100.0, 50.0]), MAPPING, {"a1": 10.0, "a2": 20.0, "b1": 5.0})
+
+    np.testing.assert_allclose(groups.apply({"a1": 11.0}), [110.0, 50.0])
+    # Mean of the members that traded since their previous bar, chain-linked
+    np.testing.assert_allclose(groups.apply({"a1": 12.1, "a2": 22.0}), [121.0, 50.0])
+    # Single members set their group's price
+    np.testing.assert_allclose(groups.apply({"b1": 6.0}), [121.0, 6.0])
+
+
+def test_members_without_a_close_start_at_their_first_bar():
+    groups = _GroupPrices(["A", "B"], np.array([100.0, 50.0]), MAPPING, {"a2": np.nan})
+
+    np.testing.assert_allclose(groups.apply({"a1": 11.0, "a2": 21.0}), [100.0, 50.0])
+    np.testing.assert_allclose(groups.apply({"a1": 12.1}), [110.0, 50.0])
+
+
+@pytest.fixture(scope="module")
+def history():
+    sector_prices, market_prices = synthetic_prices(6, 80, 6, seed=10)
+    member_prices = pd.DataFrame({"m1": np.linspace(10, 20, 80), "m2": np.linspace(30, 20, 80)},
+                                 index=sector_prices.index)
+    return sector_prices, market_prices, member_prices
+
+
+def test_engine_seeds_members_with_their_last_close(history):
+    sector_prices, market_prices, member_prices = history
+    group = sector_prices.columns[0]
+    mapping = pd.Series({"m1": group, "m2": group})
+    day = sector_prices.index[-1]
+
+    engine = LiveEngine.before(sector_prices, market_prices, day, market_ticker="MKT", mapping=mapping,
+                               member_prices=member_prices)
+    engine.on_bar(Bar(day + pd.Timedelta(hours=10), {"m1": member_prices["m1"].iloc[-2] * 1.05}))
+
+    assert engine.prices[0] == pytest.approx(sector_prices[group].iloc[-2] * 1.05)
+
+
+@pytest.fixture
+def live(client, monkeypatch):
+    # A feed without an engine yet: subscribers only get what is published
+    import main
+    monkeypatch.setattr(main, "live_feed", LiveFeed(None, None, main.broadcaster))
+    return main.broadcaster
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_websocket_forwards_published_messages(client, live):
+    with client.websocket_connect("/live/ws") as websocket:
+        assert wait_for(lambda: len(live.subscribers) == 1)
+        websocket.send_text("ignored")
+        client.portal.call(live.publish, {"type": "tick", "n": 1})
+        client.portal.call(live.publish, {"type": "tick", "n": 2})
+        assert websocket.receive_json() == {"type": "tick", "n": 1}
+        assert websocket.receive_json() == {"type": "tick", "n": 2}
+
+
+class FakeWebSocket:
+    """
+    Client that disconnects once `leave` is set.
+    """
+
+    def __init__(self):
+        self.leave = asyncio.Event()
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def receive(self):
+        await self.leave.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+def test_websocket_disconnect_unsubscribes_without_a_publish(monkeypatch):
+    import main
+    broadcaster = Broadcaster()
+    monkeypatch.setattr(main, "broadcaster", broadcaster)
+    monkeypatch.setattr(main, "live_feed", LiveFeed(None, None, broadcaster))
+
+    async def session():
+        websocket = FakeWebSocket()
+        handler = asyncio.ensure_future(main.live_updates(websocket))
+        await asyncio.sleep(0.01)
+        broadcaster.publish({"type": "tick"})
+        await asyncio.sleep(0.01)
+        assert websocket.sent == [{"type": "tick"}]
+
+        # Nothing is published after the client leaves
+        websocket.leave.set()
+        await asyncio.wait_for(handler, timeout=5)
+
+    asyncio.run(session())
+    assert not broadcaster.subscribers
@@ -0,0 +1,123 @@
+import main
+from utils import metrics
+from utils.metrics import Histogram, collect, server_timing, stage, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("sra_test_seconds", "Test timings.", "stage", buckets=(1.0, 0.1))
+    for seconds in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe("fit", seconds)
+    histogram.observe('say "hi"', 1.0)
+
+    assert histogram.render() == [
+        "# HELP sra_test_seconds Test timings.",
+        "# TYPE sra_test_seconds histogram",
+        'sra_test_seconds_bucket{stage="fit",le="0.1"} 2',
+        'sra_test_seconds_bucket{stage="fit",le="1"} 3',
+        'sra_test_seconds_bucket{stage="fit",le="+Inf"} 4',
+        'sra_test_seconds_sum{stage="fit"} 5.65',
+        'sra_test_seconds_count{stage="fit"} 4',
+        'sra_test_seconds_bucket{stage="say \\"hi\\"",le="0.1"} 0',
+        'sra_test_seconds_bucket{stage="say \\"hi\\"",le="1"} 1',
+        'sra_test_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 1',
+        'sra_test_seconds_sum{stage="say \\"hi\\""} 1',
+        'sra_test_seconds_count{stage="say \\"hi\\""} 1',
+    ]
+
+
+def test_render_gauges_and_counters(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    text = metrics.render(gauges=[("sra_snapshots", "Snapshots held.", [({}, 3), ({"key": "x"}, None)])],
+                          counters=[("sra_hits_total", "Hits.", [({"route": "/clusters"}, 2.5)])])
+
+    assert text == (
+        "# HELP sra_snapshots Snapshots held.\n"
+        "# TYPE sra_snapshots gauge\n"
+        "sra_snapshots 3\n"
+        "# HELP sra_hits_total Hits.\n"
+        "# TYPE sra_hits_total counter\n"
+        'sra_hits_total{route="/clusters"} 2.5\n'
+    )
+
+
+def test_disabled_stage_is_the_shared_noop(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    assert stage("fit") is metrics._NOOP
+    assert stage("other") is metrics._NOOP
+
+    # A collector still gets its stages
+    with collect() as timings:
+        assert stage("fit") is not metrics._NOOP
+        with stage("fit"):
+            pass
+    assert list(timings.seconds) == ["fit"]
+
+
+def test_enabled_stage_feeds_the_histogram(monkeypatch):
+    histogram = Histogram("sra_stage_duration_seconds", "", "stage")
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics, "STAGE_SECONDS", histogram)
+
+    with stage("fit"):
+        pass
+    timed("decorated")(lambda: None)()
+
+    assert {k: v["count"] for k, v in histogram.snapshot().items()} == {"fit": 1, "decorated": 1}
+
+
+def test_collect_captures_nested_stages(monkeypatch):
+    histogram = Histogram("sra_stage_duration_seconds", "", "stage")
+    monkeypatch.setattr(metrics, "STAGE_SECONDS", histogram)
+
+    with collect() as outer:
+        with stage("request"):
+            with stage("fit"):
+                pass
+            with stage("fit"):
+                pass
+            # An inner collector takes the stages run inside it
+            with collect() as inner:
+                with stage("serialize"):
+                    pass
+        with stage("request"):
+            pass
+
+    assert list(outer.seconds) == ["fit", "request"]  # in order of completion
+    assert list(inner.seconds) == ["serialize"]
+    assert outer.seconds["request"] >= outer.seconds["fit"]
+    assert histogram.snapshot() == {}
+
+
+def test_merge_and_server_timing():
+    timings = metrics.StageTimings()
+    timings.add("fit", 0.002)
+    timings.merge({"fit": 0.001, "load prices": 0.5}, prefix="snapshot.")
+    timings.add("fit", 0.001)
+
+    assert server_timing(timings.seconds) == "fit;dur=3.00, snapshot.fit;dur=1.00, snapshot.load_prices;dur=500.00"
+
+
+def server_timing_stages(response) -> dict:
+    entries = [entry.split(";dur=") for entry in response.headers["server-timing"].split(", ")]
+    return {name: float(ms) for name, ms in entries}
+
+
+def test_profile_header(client, monkeypatch):
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+
+    assert "server-timing" not in client.get("/clusters").headers
+    response = client.get("/clusters?profile=1")
+    assert response.status_code == 200
+    stages = server_timing_stages(response)
+
+    # Request stages, then the served snapshot's, then the total
+    assert "serialize" in stages
+    assert any(name.startswith("snapshot.") for name in stages)
+    assert list(stages)[-1] == "total"
+    assert stages["total"] >= stages["serialize"]
+    assert "server-timing" in client.get("/clusters", headers={"X-Profile": "1"}).headers
+
+
+def test_profiling_disabled(client, monkeypatch):
+    monkeypatch.setattr(main, "PROFILING_ENABLED", False)
+    assert "server-timing" not in client.get("/clusters?profile=1").headers
@@ -0,0 +1,84 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_prices
+from models.flow_graph import FlowGraph
+from models.rotation_flow import compute_relative_strength, compute_rolling_strength, compute_sector_returns
+from services.pipeline import AnalysisResult
+
+
+@pytest.fixture(scope="module")
+def prices():
+    return synthetic_prices(6, 200, 6, seed=5)
+
+
+def make_result(prices, max_extra_horizons=2) -> AnalysisResult:
+    sector_prices, market_prices = prices
+    rel_strength = compute_relative_strength(compute_sector_returns(sector_prices), market_prices.pct_change().dropna())
+    rolling_strengths = {20: compute_rolling_strength(rel_strength, 20)}
+    flow_graphs = {20: FlowGraph.from_rolling_strength(rolling_strengths[20])}
+    return AnalysisResult(("test", "sector", 3, "6mo", 20), sector_prices, market_prices, pd.DataFrame(),
+                          rel_strength, rolling_strengths, flow_graphs, 20, max_extra_horizons=max_extra_horizons)
+
+
+def expected_matrix(result, window) -> pd.DataFrame:
+    return FlowGraph.from_rolling_strength(compute_rolling_strength(result.rel_strength, window)).flow_matrix()
+
+
+def test_derived_horizons_match_a_direct_computation(prices):
+    result = make_result(prices)
+    matrices = result.horizon_flow_matrices([5, 20, 60])
+
+    assert list(matrices) == [5, 20, 60]
+    for window, matrix in matrices.items():
+        pd.testing.assert_frame_equal(matrix, expected_matrix(result, window))
+
+
+def test_derived_horizons_are_bounded(prices):
+    result = make_result(prices, max_extra_horizons=2)
+    result.horizon_flow_graphs([5])
+    result.horizon_flow_graphs([10])
+    result.horizon_flow_graphs([5])  # 10 is now the least recently used
+    result.horizon_flow_graphs([15])
+
+    assert set(result.flow_graphs) == {20, 5, 15}
+    assert set(result.flow_matrices) == set(result.rolling_strengths) == {20, 5, 15}
+
+
+def test_request_larger_than_the_limit_gets_every_horizon(prices):
+    result = make_result(prices, max_extra_horizons=1)
+    graphs = result.horizon_flow_graphs([5, 10, 15])
+
+    assert list(graphs) == [5, 10, 15]
+    assert set(result.flow_graphs) == {20, 15}
+
+
+def test_concurrent_requests(prices):
+    result = make_result(prices, max_extra_horizons=3)
+    windows = [[5 + i % 7, 20, 30 + i % 5] for i in range(64)]
+    with ThreadPoolExecutor(8) as pool:
+        outputs = list(pool.map(result.horizon_flow_matrices, windows))
+
+    for requested, matrices in zip(windows, outputs):
+        assert list(matrices) == requested
+        pd.testing.assert_frame_equal(matrices[requested[0]], expected_matrix(result, requested[0]))
+    assert len(result.flow_graphs) <= 1 + 3
+
+
+def test_results_pickle(prices):
+    # Results are computed in worker processes
+    result = pickle.loads(pickle.dumps(make_result(prices)))
+    pd.testing.assert_frame_equal(result.horizon_flow_matrices([5])[5], expected_matrix(result, 5))
+
+
+def test_confidence_results_are_bounded(prices):
+    result = make_result(prices)
+    result.max_confidence = 2
+    result.store_confidence((100, 5, 0), "a")
+    result.store_confidence((100, 5, 1), "b")
+    assert result.cached_confidence((100, 5, 0)) == "a"  # (100, 5, 1) is now the least recently used
+    result.store_confidence((100, 5, 2), "c")
+
+    assert result.cached_confidence((100, 5, 1)) is None
+    assert list(result.confidence) == [(100, 5, 0), (100, 5, 2)]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from data.price_store import PriceStore
+
+
+class SeriesProvider:
+    """
+    Serves closes from an in-memory Series per ticker and records the calls.
+    """
+
+    def __init__(self, series: dict):
+        self.series = series
+        self.calls = []
+
+    def fetch(self, ticker, period=None, start=None):
+        self.calls.append((ticker, period, start))
+        series = self.series[ticker]
+        return series[series.index >= pd.Timestamp(start)] if start is not None else series
+
+
+def closes(values, start="2024-01-01"):
+    return pd.Series(values, index=pd.bdate_range(start, periods=len(values)), dtype="float64")
+
+
+def make_store(tmp_path, provider):
+    return PriceStore(str(tmp_path), provider, max_age_seconds=0, fetch_options={"retries": 0},
+                      overlap_days=7)
+
+
+def test_append_returns_bars_added_after_last_date(tmp_path):
+    store = make_store(tmp_path, SeriesProvider({}))
+    assert store.append("AAA", closes([1.0, 2.0, 3.0])) == 3
+    # Two stored days again (overwritten) and one new day
+    assert store.append("AAA", closes([2.0, 3.5, 4.0], start="2024-01-02")) == 1
+    np.testing.assert_array_equal(store.series("AAA").to_numpy(), [1.0, 2.0, 3.5, 4.0])
+
+
+def test_refresh_overwrites_partial_last_bar(tmp_path):
+    provider = SeriesProvider({"AAA": closes([1.0, 2.0, 3.0])})
+    store = make_store(tmp_path, provider)
+    store.refresh("AAA", period="max")
+
+    # The last bar was intraday; the final close differs and a new day arrived
+    provider.series["AAA"] = closes([1.0, 2.0, 3.3, 4.0])
+    store.refresh("AAA", period="max")
+    np.testing.assert_array_equal(store.series("AAA").to_numpy(), [1.0, 2.0, 3.3, 4.0])
+
+
+def test_refresh_refetches_readjusted_history(tmp_path):
+    provider = SeriesProvider({"AAA": closes(np.arange(1.0, 11.0))})
+    store = make_store(tmp_path, provider)
+    store.refresh("AAA", period="max")
+
+    # A dividend re-adjusts every past close
+    provider.series["AAA"] = closes(np.arange(1.0, 12.0) * 0.98)
+    store.refresh("AAA", period="max")
+    np.testing.assert_allclose(store.series("AAA").to_numpy(), np.arange(1.0, 12.0) * 0.98)
+    assert provider.calls[-1][1] == "max"
+
+
+def test_dates_and_closes_are_published_together(tmp_path):
+    store = make_store(tmp_path, SeriesProvider({}))
+    store.append("AAA", closes([1.0, 2.0]))
+    dates, values = store.read("AAA")
+    store.append("AAA", closes([3.0], start="2024-01-03"))
+
+    # An open map keeps its version; a new read sees both arrays grown
+    assert len(dates) == len(values) == 2
+    dates, values = store.read("AAA")
+    assert len(dates) == len(values) == 3
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_prices
+from features.rolling_covariance import build_rolling_covariance
+from utils.config import MAX_CORRELATION_WINDOW
+
+
+def reference_cov(prices: pd.DataFrame, window: int, k: int) -> np.ndarray:
+    # Window k of the returns, straight from np.cov; NaN for names missing a return
+    returns = prices.pct_change().iloc[1:]
+    rows = returns.iloc[k:k + window].to_numpy()
+    cov = np.cov(rows, rowvar=False)
+    incomplete = np.isnan(rows).any(axis=0)
+    cov[incomplete[:, None] | incomplete[None, :]] = np.nan
+    return cov
+
+
+def test_matches_pandas_rolling_cov():
+    sector_prices, market_prices = synthetic_prices(5, 80, 5, seed=7)
+    sector_prices.iloc[40, 1] = np.nan
+    cov = build_rolling_covariance(sector_prices, market_prices, window=20, chunk_size=7)
+
+    prices = sector_prices.assign(market=market_prices)
+    expected = prices.pct_change(fill_method=None).iloc[1:].rolling(20).cov()
+    expected = expected.to_numpy().reshape(-1, 6, 6)[19:]
+    np.testing.assert_allclose(cov.cov, expected, rtol=1e-4, atol=1e-9)
+
+
+@pytest.mark.parametrize("n_names", [40, 300])
+def test_tiled_names_match_np_cov(n_names):
+    # 300 names (301 with the market) no longer fit one tile of 2 * window rows
+    sector_prices, market_prices = synthetic_prices(n_names, 70, 10, seed=8)
+    sector_prices.iloc[50, 3] = np.nan
+    cov = build_rolling_covariance(sector_prices, market_prices, window=30)
+
+    prices = sector_prices.assign(market=market_prices)
+    assert cov.cov.shape == (40, n_names + 1, n_names + 1)
+    for k in (0, 19, 20, 39):
+        np.testing.assert_allclose(cov.cov[k], reference_cov(prices, 30, k), rtol=1e-4, atol=1e-9)
+
+
+def test_correlation_window_is_bounded():
+    from fastapi.testclient import TestClient
+    import main
+
+    response = TestClient(main.app).get(f"/correlation?window={MAX_CORRELATION_WINDOW + 1}")
+    assert response.status_code == 422
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from features.feature_engineering import build_feature_matrix
+from features.rolling_features import CORRELATION_FEATURES, FEATURE_NAMES, RollingFeatureState, build_rolling_features
+
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(9)
+    dates = pd.bdate_range("2023-01-02", periods=120, name="Date")
+    levels = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), 9)), axis=0))
+    sector_prices = pd.DataFrame(levels[:, :8], index=dates, columns=[f"Sector{i}" for i in range(8)])
+    # A sector listed part way through
+    sector_prices.iloc[:40, 5] = np.nan
+    return sector_prices, pd.Series(levels[:, 8], index=dates, name="Close")
+
+
+@pytest.mark.parametrize("window_size", [20, 30, 60])
+def test_features_match_the_feature_matrix(prices, window_size):
+    sector_prices, market_prices = prices
+    rolling = build_rolling_features(sector_prices, market_prices, window_size)
+
+    for k in range(len(rolling)):
+        window = sector_prices.iloc[k:k + window_size]
+        expected = build_feature_matrix(window, market_prices.loc[window.index])
+        pd.testing.assert_frame_equal(rolling.frame(k), expected, rtol=1e-5, check_dtype=False)
+
+
+def test_correlation_features_match_the_feature_matrix(prices):
+    sector_prices, market_prices = prices
+    rolling = build_rolling_features(sector_prices, market_prices, 30, correlation=True)
+    assert rolling.feature_names == FEATURE_NAMES + CORRELATION_FEATURES
+
+    for k in (0, 45, len(rolling) - 1):
+        expected = build_feature_matrix(sector_prices.iloc[k:k + 30], market_prices, correlation=True)
+        pd.testing.assert_frame_equal(rolling.frame(k), expected[rolling.feature_names], rtol=1e-5,
+                                      check_dtype=False)
+
+
+@pytest.fixture(scope="module")
+def gappy_market(prices):
+    # Single missing days, and a gap longer than the short lookback
+    market_prices = prices[1].copy()
+    market_prices.iloc[[40, 41, 70]] = np.nan
+    market_prices.iloc[85:120] = np.nan
+    return market_prices
+
+
+@pytest.mark.parametrize("window_size", [30, 45, 60])
+def test_missing_market_returns_fill_within_the_window(prices, gappy_market, window_size):
+    sector_prices = prices[0]
+    rolling = build_rolling_features(sector_prices, gappy_market, window_size)
+
+    for k in range(len(rolling)):
+        window = sector_prices.iloc[k:k + window_size]
+        expected = build_feature_matrix(window, gappy_market.loc[window.index])
+        np.testing.assert_allclose(rolling.frame(k)["rel_strength"], expected["rel_strength"], rtol=1e-5)
+    # Windows whose rows all lack a market return stay NaN
+    assert np.isnan(rolling.values[-1, :, FEATURE_NAMES.index("rel_strength")]).all()
+
+
+def test_state_matches_the_batched_features(prices):
+    sector_prices, market_prices = prices
+    rolling = build_rolling_features(sector_prices, market_prices, 30, correlation=True)
+
+    state = RollingFeatureState.from_prices(sector_prices.iloc[:80], market_prices.iloc[:80], 30, correlation=True)
+    # Persisted and restored half way
+    state = RollingFeatureState.from_arrays(state.to_arrays(), sector_prices.columns)
+    assert state.feature_names == rolling.feature_names
+
+    for i in range(80, len(sector_prices)):
+        values = state.push(sector_prices.index[i], sector_prices.iloc[i].to_numpy(), market_prices.iloc[i])
+        np.testing.assert_allclose(values, rolling.values[i - 30], rtol=1e-5, atol=1e-12)
+
+
+def test_state_fills_missing_market_returns_like_the_batch(prices, gappy_market):
+    sector_prices = prices[0]
+    rolling = build_rolling_features(sector_prices, gappy_market, 45)
+
+    state = RollingFeatureState.from_prices(sector_prices.iloc[:60], gappy_market.iloc[:60], 45)
+    for i in range(60, len(sector_prices)):
+        values = state.push(sector_prices.index[i], sector_prices.iloc[i].to_numpy(), gappy_market.iloc[i])
+        np.testing.assert_allclose(values, rolling.values[i - 45], rtol=1e-5, atol=1e-12)
+
+
+def test_correlation_features_are_optional(prices):
+    sector_prices, market_prices = prices
+    rolling = build_rolling_features(sector_prices, market_prices, 30)
+    state = RollingFeatureState.from_prices(sector_prices, market_prices, 30)
+
+    assert rolling.feature_names == state.feature_names == FEATURE_NAMES
+    assert rolling.values.shape[2] == len(FEATURE_NAMES)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.rotation_flow import compute_rotation_flow, compute_rotation_flow_matrix, rank_descending
+
+
+def baseline_rotation_flow(rolling_strength: pd.DataFrame) -> pd.DataFrame:
+    # compute_rotation_flow before vectorization, verbatim
+    flows = []
+
+    dates = rolling_strength.index
+    sectors = rolling_strength.columns
+
+    for i in range(1, len(dates)):
+        prev = rolling_strength.iloc[i - 1]
+        curr = rolling_strength.iloc[i]
+
+        # Rank sectors by relative strength
+        prev_rank = prev.rank(ascending=False)
+        curr_rank = curr.rank(ascending=False)
+
+        # Compute rank change (positive = improved, negative = declined)
+        rank_change = curr_rank - prev_rank
+
+        # Sectors that gained relative strength
+        gaining = rank_change[rank_change < 0].sort_values()  # rank decreased → moved up
+        # Sectors that lost relative strength
+        losing = rank_change[rank_change > 0].sort_values(ascending=False)  # rank increased → moved down
+
+        # Pair losing → gaining sectors
+        for loser in losing.index:
+            for gainer in gaining.index:
+                weight = min(losing[loser], -gaining[gainer])  # use magnitude of rank change
+                if weight > 0:
+                    flows.append({
+                        "source": loser,
+                        "target": gainer,
+                        "weight": float(weight)
+                    })
+
+    flow_df = pd.DataFrame(flows)
+    if flow_df.empty:
+        return pd.DataFrame(columns=["source", "target", "weight"])
+
+    # Aggregate duplicate flows
+    flow_df = flow_df.groupby(["source", "target"], as_index=False)["weight"].sum()
+
+    return flow_df
+
+
+def tied_strength(n_dates=60, n_sectors=9, seed=0, nan_share=0.05) -> pd.DataFrame:
+    """
+    Rolling strengths drawn from a few values (many ties) with some NaNs,
+    including a whole NaN row and a sector missing for a stretch.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.integers(-3, 4, (n_dates, n_sectors)).astype(float) / 100
+    values[rng.random(values.shape) < nan_share] = np.nan
+    values[20] = np.nan
+    values[30:36, 4] = np.nan
+    values[40] = values[39]
+    return pd.DataFrame(values, index=pd.bdate_range("2024-01-01", periods=n_dates, name="Date"),
+                        columns=[f"Sector{i}" for i in range(n_sectors)])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_rank_descending_matches_pandas(seed):
+    strength = tied_strength(seed=seed, nan_share=0.2)
+    expected = strength.rank(axis=1, ascending=False).to_numpy()
+    np.testing.assert_array_equal(rank_descending(strength.to_numpy()), expected)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_rotation_flow_matches_the_nested_loop(seed):
+    strength = tied_strength(seed=seed)
+    pd.testing.assert_frame_equal(compute_rotation_flow(strength), baseline_rotation_flow(strength))
+
+
+@pytest.mark.parametrize("chunk_size", [2, 3, 7, 1000])
+def test_chunks_give_the_same_flows(chunk_size):
+    strength = tied_strength(seed=5)
+    expected = baseline_rotation_flow(strength).pivot(index="source", columns="target", values="weight")
+
+    matrix = compute_rotation_flow_matrix(strength, chunk_size)
+    expected = expected.reindex(index=matrix.index, columns=matrix.columns).fillna(0.0)
+    np.testing.assert_array_equal(matrix.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("n_dates", [0, 1])
+def test_no_flows(n_dates):
+    strength = tied_strength().iloc[:n_dates]
+    pd.testing.assert_frame_equal(compute_rotation_flow(strength), baseline_rotation_flow(strength))
+
+
+def test_constant_strength_has_no_flows():
+    strength = tied_strength()
+    strength.iloc[:] = strength.iloc[0].fillna(0).to_numpy()
+    pd.testing.assert_frame_equal(compute_rotation_flow(strength), baseline_rotation_flow(strength))
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from features.rolling_features import build_rolling_features
+from models.cluster_matching import DEFAULT_HYSTERESIS
+from models.kmeans import SectorKMeans
+from models.rotation_frame_builder import _batched_frame, iter_rotation_frames
+from utils.config import MAX_FRAME_WINDOW
+
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2023-01-02", periods=160, name="Date")
+    market = rng.normal(0, 0.01, len(dates))
+    # Sectors move with the market plus their own noise
+    returns = market[:, None] + rng.normal(0, 0.01, (len(dates), 8))
+    sector_prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=dates,
+                                 columns=[f"Sector{i}" for i in range(8)])
+    return sector_prices, pd.Series(100 * np.exp(np.cumsum(market)), index=dates, name="Close")
+
+
+def test_chunked_features_match_one_pass_numpy(prices):
+    # Features for the whole range at once, clustered in the same chunks
+    sector_prices, market_prices = prices
+    rolling_features = build_rolling_features(sector_prices, market_prices, 30)
+    kmeans = SectorKMeans(n_clusters=3, backend="numpy", hysteresis=DEFAULT_HYSTERESIS)
+    selected = np.arange(20, len(rolling_features), 2)
+    expected = []
+    for c in range(0, len(selected), 7):
+        frame, bounds = _batched_frame(kmeans, rolling_features, selected[c:c + 7])
+        expected += [frame.iloc[bounds[w]:bounds[w + 1]] for w in range(len(bounds) - 1)]
+
+    frames = iter_rotation_frames(sector_prices, market_prices, 30, start=rolling_features.dates[20], stride=2,
+                                  backend="numpy", chunk_size=7)
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), pd.concat(expected, ignore_index=True))
+
+
+def test_chunked_frames_match_one_pass_sklearn(prices):
+    sector_prices, market_prices = prices
+    kwargs = dict(window_size=30, start=sector_prices.index[50], stride=2, warm_start=True)
+    whole = pd.concat(iter_rotation_frames(sector_prices, market_prices, chunk_size=None, **kwargs))
+    chunked = pd.concat(iter_rotation_frames(sector_prices, market_prices, chunk_size=7, **kwargs))
+    pd.testing.assert_frame_equal(chunked, whole)
+
+
+def test_frames_carry_the_features_of_their_window(prices):
+    sector_prices, market_prices = prices
+    reference = build_rolling_features(sector_prices, market_prices, 30)
+    for frame in iter_rotation_frames(sector_prices, market_prices, 30, stride=9, chunk_size=3, backend="numpy"):
+        k = reference.dates.get_loc(pd.Timestamp(frame["date"].iat[0]))
+        expected = reference.frame(k).loc[frame["sector"], "ret_short"].to_numpy()
+        np.testing.assert_allclose(frame["ret_short"].to_numpy(), expected, rtol=1e-9)
+
+
+def test_empty_range_yields_nothing(prices):
+    sector_prices, market_prices = prices
+    assert list(iter_rotation_frames(sector_prices, market_prices, 30, start="2100-01-01")) == []
+
+
+def test_window_is_bounded():
+    from fastapi.testclient import TestClient
+    import main
+
+    response = TestClient(main.app).get(f"/rotation/frames?window={MAX_FRAME_WINDOW + 1}")
+    assert response.status_code == 422
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from services.scheduler import RefreshScheduler, UnknownSnapshotKey
+
+
+class FakeClock:
+    """
+    Clock for RefreshScheduler: time only moves when sleep() is awaited.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class Result:
+    def __init__(self, key, n):
+        self.key = key
+        self.n = n
+        self.as_of = None
+
+
+class CountingCompute:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, period, window):
+        self.calls.append((period, window))
+        return Result((period, window), len(self.calls))
+
+
+def make_scheduler(**kwargs):
+    compute = CountingCompute()
+    options = dict(interval=60, clock=FakeClock(), periods=["6mo", "1y"], windows=[20, 60])
+    options.update(kwargs)
+    return RefreshScheduler(compute, **options), compute
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_get_computes_once_then_serves_the_snapshot():
+    scheduler, compute = make_scheduler()
+
+    async def scenario():
+        first = await scheduler.get()
+        second = await scheduler.get()
+        return first, second
+
+    first, second = run(scenario())
+    assert first is second and compute.calls == [("6mo", 20)]
+    assert (scheduler.hits, scheduler.misses) == (1, 1)
+
+
+def test_concurrent_gets_share_one_computation():
+    scheduler, compute = make_scheduler()
+
+    async def scenario():
+        return await asyncio.gather(*(scheduler.get("1y", 60) for _ in range(5)))
+
+    snapshots = run(scenario())
+    assert len({id(s) for s in snapshots}) == 1 and compute.calls == [("1y", 60)]
+    assert scheduler.coalesced == 4
+
+
+def test_refresh_replaces_snapshots_and_staleness_follows_the_clock():
+    scheduler, compute = make_scheduler(stale_after=100)
+
+    async def scenario():
+        old = await scheduler.get()
+        await scheduler.clock.sleep(150)
+        stale = scheduler.is_stale(old)
+        await scheduler.refresh_once()
+        return old, stale, scheduler.latest()
+
+    old, stale, new = run(scenario())
+    assert stale and new.result.n == 2 and not scheduler.is_stale(new)
+    assert scheduler.age(old) == 150
+
+
+def test_background_loop_refreshes_every_interval():
+    scheduler, compute = make_scheduler()
+
+    async def scenario():
+        scheduler.start()
+        # compute() runs in a thread; only the interval sleeps are faked
+        for _ in range(500):
+            if scheduler.refreshes >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    run(scenario())
+    assert scheduler.refreshes >= 2 and scheduler.clock.now >= 1000 + 60
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    scheduler, compute = make_scheduler()
+
+    async def scenario():
+        good = await scheduler.get()
+        scheduler.compute = lambda period, window: 1 / 0
+        await scheduler.refresh_once()
+        return good
+
+    good = run(scenario())
+    assert scheduler.latest() is good and scheduler.refresh_failures == 1
+
+
+@pytest.mark.parametrize("period, window", [("bogus", 20), ("6mo", 7)])
+def test_unknown_keys_are_rejected_before_scheduling(period, window):
+    scheduler, compute = make_scheduler()
+    with pytest.raises(UnknownSnapshotKey):
+        run(scheduler.get(period, window))
+    assert compute.calls == [] and scheduler.jobs == [("6mo", 20)]
+
+
+def test_on_demand_snapshots_are_bounded_and_recomputed_when_stale():
+    scheduler, compute = make_scheduler(jobs=(), max_jobs=0, max_snapshots=1, stale_after=100)
+
+    async def scenario():
+        await scheduler.get("6mo", 20)
+        await scheduler.get("1y", 20)
+        kept = [key for key in [("6mo", 20), ("1y", 20)] if scheduler.latest(*key) is not None]
+        await scheduler.clock.sleep(150)
+        await scheduler.get("1y", 20)
+        return kept
+
+    kept = run(scenario())
+    assert kept == [("1y", 20)]
+    assert compute.calls == [("6mo", 20), ("1y", 20), ("1y", 20)]
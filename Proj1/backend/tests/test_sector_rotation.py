@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.sector_rotation import SectorRotationModel
+
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(4)
+    dates = pd.bdate_range("2023-01-02", periods=160, name="Date")
+    market = rng.normal(0, 0.01, len(dates))
+    # Sectors move with the market plus their own noise
+    returns = market[:, None] + rng.normal(0, 0.01, (len(dates), 8))
+    sector_prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=dates,
+                                 columns=[f"Sector{i}" for i in range(8)])
+    return sector_prices, pd.Series(100 * np.exp(np.cumsum(market)), index=dates, name="Close")
+
+
+def full_run(sector_prices, market_prices, features=None):
+    model = SectorRotationModel(30, warm_start=True, features=features)
+    model.run(sector_prices, market_prices)
+    return model
+
+
+def assert_same_model(model, expected):
+    np.testing.assert_array_equal(model.cluster_history.dates, expected.cluster_history.dates)
+    np.testing.assert_array_equal(model.cluster_history.codes, expected.cluster_history.codes)
+    np.testing.assert_array_equal(model.rotations.events, expected.rotations.events)
+
+
+def test_update_matches_run_over_the_extended_history(prices):
+    sector_prices, market_prices = prices
+    expected = full_run(sector_prices, market_prices)
+
+    model = full_run(sector_prices.iloc[:100], market_prices.iloc[:100])
+    added = model.update(sector_prices, market_prices)
+
+    assert_same_model(model, expected)
+    np.testing.assert_array_equal(added.events, expected.rotations.query(start=sector_prices.index[100]).events)
+
+
+def test_update_one_day_at_a_time(prices):
+    sector_prices, market_prices = prices
+    expected = full_run(sector_prices, market_prices)
+
+    model = full_run(sector_prices.iloc[:100], market_prices.iloc[:100])
+    for i in range(100, len(sector_prices)):
+        model.update(sector_prices.iloc[i:i + 1], market_prices.iloc[i:i + 1])
+
+    assert_same_model(model, expected)
+
+
+def test_update_before_the_first_window_completes(prices):
+    # The prefix is shorter than one window: update() has to start the history
+    sector_prices, market_prices = prices
+    expected = full_run(sector_prices, market_prices)
+
+    model = full_run(sector_prices.iloc[:20], market_prices.iloc[:20])
+    model.update(sector_prices, market_prices)
+
+    assert_same_model(model, expected)
+
+
+def test_already_seen_rows_are_ignored(prices):
+    sector_prices, market_prices = prices
+    model = full_run(sector_prices, market_prices)
+    n_windows = len(model.cluster_history)
+
+    added = model.update(sector_prices, market_prices)
+
+    assert len(added) == 0
+    assert len(model.cluster_history) == n_windows
+
+
+def test_save_load_then_update_matches_run(prices, tmp_path):
+    sector_prices, market_prices = prices
+    expected = full_run(sector_prices, market_prices)
+
+    path = str(tmp_path / "model.npz")
+    full_run(sector_prices.iloc[:100], market_prices.iloc[:100]).save(path)
+    model = SectorRotationModel.load(path)
+    model.update(sector_prices, market_prices)
+
+    assert_same_model(model, expected)
+
+
+def test_correlation_features_update_matches_run(prices, tmp_path):
+    sector_prices, market_prices = prices
+    features = ["ret_short", "volatility", "beta", "avg_correlation"]
+    expected = full_run(sector_prices, market_prices, features)
+
+    path = str(tmp_path / "model.npz")
+    full_run(sector_prices.iloc[:100], market_prices.iloc[:100], features).save(path)
+    model = SectorRotationModel.load(path)
+    model.update(sector_prices, market_prices)
+
+    assert model.correlation
+    assert_same_model(model, expected)
+
+
+def test_correlation_features_batched(prices):
+    sector_prices, market_prices = prices
+    model = SectorRotationModel(30, backend="numpy", features=["ret_short", "beta", "avg_correlation"])
+    history, _ = model.run(sector_prices, market_prices)
+    assert (history.codes >= 0).all()
+
+
+def test_unknown_features_are_rejected():
+    with pytest.raises(ValueError):
+        SectorRotationModel(30, features=["ret_short", "momentum"])
+
+
+def test_update_needs_a_fitted_model(prices):
+    sector_prices, market_prices = prices
+    with pytest.raises(RuntimeError):
+        SectorRotationModel(30).update(sector_prices, market_prices)
@@ -0,0 +1,34 @@
+import json
+import numpy as np
+import pandas as pd
+from utils.serialization import ARROW, JSON, PACKED, choose_format, pack_columns, to_json_bytes, unpack_columns
+
+
+def test_choose_format_honours_q_values():
+    assert choose_format(None) == JSON
+    assert choose_format(f"{JSON};q=0.5, {PACKED}") == PACKED
+    assert choose_format(f"{ARROW};q=0, text/html") == JSON
+
+
+def test_packed_round_trip_with_missing_categories():
+    df = pd.DataFrame({"x": [1.5, np.nan, 3.0], "n": [1, 2, 3], "s": ["a", None, "b"]})
+    out = unpack_columns(pack_columns(df))
+    np.testing.assert_allclose(out["x"], df["x"])
+    assert out["n"].tolist() == [1, 2, 3]
+    assert out["s"].isna().tolist() == [False, True, False]
+    assert out["s"].dropna().tolist() == ["a", "b"]
+
+
+def test_packed_widens_codes_for_many_categories():
+    names = [f"T{i:05d}" for i in range(70_000)]
+    df = pd.DataFrame({"s": names + [None]})
+    payload = pack_columns(df)
+    out = unpack_columns(payload)
+    assert out["s"].iloc[65_535] == names[65_535]
+    assert pd.isna(out["s"].iloc[-1]) and out["s"].iloc[:-1].tolist() == names
+
+
+def test_json_records_turn_nan_into_null_in_every_column():
+    df = pd.DataFrame({"x": [np.nan, 1.0], "s": pd.Series([np.nan, "a"], dtype=object)})
+    records = json.loads(to_json_bytes(df))
+    assert records == [{"x": None, "s": None}, {"x": 1.0, "s": "a"}]
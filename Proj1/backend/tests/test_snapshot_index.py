@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_prices
+from features.rolling_features import FEATURE_NAMES, build_rolling_features
+from models.rotation_flow import (
+    compute_relative_strength, compute_rolling_strengths, compute_sector_returns, iter_daily_flows
+)
+from services.snapshot_index import SnapshotIndex, _daily_flows
+
+
+@pytest.fixture(scope="module")
+def prices():
+    return synthetic_prices(6, 220, 6, seed=6)
+
+
+@pytest.fixture(scope="module")
+def gapped_prices(prices):
+    # A few missing bars: their rows drop out of the returns
+    sector_prices, market_prices = prices
+    sector_prices = sector_prices.copy()
+    sector_prices.iloc[150:153, 2] = np.nan
+    return sector_prices, market_prices
+
+
+def full_history_flows(sector_prices, market_prices, flow_window, dates) -> np.ndarray:
+    # _daily_flows before it only read the tail of the prices
+    dates = pd.DatetimeIndex(dates)
+    rel_strength = compute_relative_strength(compute_sector_returns(sector_prices),
+                                             market_prices.pct_change().dropna())
+    strength = compute_rolling_strengths(rel_strength, [flow_window])[flow_window]
+    flows = np.zeros((len(dates), sector_prices.shape[1], sector_prices.shape[1]))
+    for chunk_dates, daily in iter_daily_flows(strength):
+        positions = dates.get_indexer(chunk_dates)
+        found = positions >= 0
+        flows[positions[found]] = daily[found]
+    return flows
+
+
+@pytest.mark.parametrize("first", [5, 100, 152, 160, 219])
+def test_daily_flows_match_the_full_history(gapped_prices, first):
+    sector_prices, market_prices = gapped_prices
+    dates = sector_prices.index[first:]
+    np.testing.assert_allclose(_daily_flows(sector_prices, market_prices, 20, dates),
+                               full_history_flows(sector_prices, market_prices, 20, dates))
+
+
+def test_extend_matches_a_full_build(prices, tmp_path):
+    sector_prices, market_prices = prices
+    expected = SnapshotIndex(str(tmp_path / "full"))
+    expected.build(sector_prices, market_prices, window=30, flow_window=20)
+
+    index = SnapshotIndex(str(tmp_path / "extended"))
+    index.build(sector_prices.iloc[:120], market_prices.iloc[:120], window=30, flow_window=20)
+    assert index.extend(sector_prices.iloc[:170], market_prices.iloc[:170]) == 50
+    assert index.extend(sector_prices, market_prices) == 50
+    assert index.extend(sector_prices, market_prices) == 0
+
+    np.testing.assert_array_equal(index.dates, expected.dates)
+    np.testing.assert_array_equal(index.history().codes, expected.history().codes)
+    pd.testing.assert_frame_equal(index.frames(0, len(index)), expected.frames(0, len(expected)))
+    pd.testing.assert_frame_equal(index.flow_matrix(10, len(index)), expected.flow_matrix(10, len(expected)))
+
+
+def test_build_stores_the_window_features(prices, tmp_path):
+    sector_prices, market_prices = prices
+    index = SnapshotIndex(str(tmp_path / "index"))
+    index.build(sector_prices, market_prices, window=30, flow_window=20)
+
+    rolling = build_rolling_features(sector_prices, market_prices, 30)
+    frames = index.frames(0, len(index))
+    np.testing.assert_array_equal(index.dates, rolling.dates.values.astype("datetime64[D]"))
+    np.testing.assert_array_equal(frames[FEATURE_NAMES].to_numpy(),
+                                  rolling.values.reshape(-1, len(FEATURE_NAMES)).astype("float32"))
+
+
+def test_reader_follows_the_writer(prices, tmp_path):
+    sector_prices, market_prices = prices
+    writer = SnapshotIndex(str(tmp_path / "index"))
+    writer.build(sector_prices.iloc[:120], market_prices.iloc[:120], window=30, flow_window=20)
+    reader = SnapshotIndex(writer.path)
+    assert reader.refresh() and len(reader) == 90
+
+    writer.extend(sector_prices, market_prices)
+    assert len(reader) == 90  # until it refreshes
+    reader.refresh()
+    np.testing.assert_array_equal(reader.dates, writer.dates)
+    np.testing.assert_array_equal(reader.history().codes, writer.history().codes)
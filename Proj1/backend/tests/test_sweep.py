@@ -0,0 +1,111 @@
+import json
+from collections import Counter
+import numpy as np
+import pandas as pd
+from data.dataGetter import get_universe
+from services.sweep import SweepRunner, expand_grid, open_prices, save_prices
+
+
+class FakeReport:
+    def __init__(self, prices: pd.DataFrame):
+        self.prices = prices
+
+
+def fake_prices(n_days: int = 120, seed: int = 0) -> pd.DataFrame:
+    # Random walks for every group of the configured universe plus its market
+    universe = get_universe()
+    columns = universe.groups() + [universe.market]
+    rng = np.random.default_rng(seed)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_days, len(columns))), axis=0))
+    return pd.DataFrame(values, index=pd.bdate_range("2024-01-01", periods=n_days, name="Date"), columns=columns)
+
+
+class Loader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, period):
+        self.calls.append(period)
+        return FakeReport(fake_prices(120 if period == "6mo" else 160))
+
+
+def ok_lines(runner) -> Counter:
+    with open(runner.results_path) as f:
+        records = [json.loads(line) for line in f if line.strip().endswith("}")]
+    return Counter(r["id"] for r in records if r["status"] == "ok")
+
+
+def test_expand_grid_cardinality():
+    grid = expand_grid(["6mo", "1y"], [20, 30, 60], [3, 4], [["ret_short"], ["ret_short", "volatility"]])
+
+    assert len(grid) == 2 * 3 * 2 * 2
+    assert len({c.id for c in grid}) == len(grid)
+    assert len(expand_grid(["6mo"], [20, 30], [3])) == 2
+    assert expand_grid([], [20], [3]) == []
+
+
+def test_resume_after_truncated_results(tmp_path):
+    grid = expand_grid(["6mo", "8mo"], [20, 30], [2, 3])
+    loader = Loader()
+    runner = SweepRunner(str(tmp_path), workers=0, load_prices=loader)
+    first = runner.run(grid)
+    assert len(first) == len(grid) and (first["status"] == "ok").all()
+    assert sorted(loader.calls) == ["6mo", "8mo"]
+
+    # Interrupted sweep: three finished lines and a torn fourth
+    with open(runner.results_path) as f:
+        lines = f.readlines()
+    with open(runner.results_path, "w") as f:
+        f.writelines(lines[:3])
+        f.write(lines[3][:20])
+
+    resumed = SweepRunner(str(tmp_path), workers=0, load_prices=loader)
+    results = resumed.run(grid)
+
+    assert ok_lines(resumed) == Counter({c.id: 1 for c in grid})
+    assert sorted(results["id"]) == sorted(c.id for c in grid)
+    # Saved prices are reused: nothing was loaded again
+    assert sorted(loader.calls) == ["6mo", "8mo"]
+    # Resumed configurations give the same summaries
+    columns = ["id", "windows", "rotations", "rotations_in", "rotations_out", "tier_spread"]
+    pd.testing.assert_frame_equal(results[columns].sort_values("id", ignore_index=True),
+                                  first[columns].sort_values("id", ignore_index=True))
+
+
+def test_finished_sweep_runs_nothing(tmp_path):
+    grid = expand_grid(["6mo"], [20, 30], [3])
+    runner = SweepRunner(str(tmp_path), workers=0, load_prices=Loader())
+    runner.run(grid)
+    runner.run(grid)
+
+    assert ok_lines(runner) == Counter({c.id: 1 for c in grid})
+    for config in grid:
+        assert list(runner.rotations(config).columns) == ["date", "sector", "from", "to", "direction"]
+
+
+def test_failed_configurations_are_retried(tmp_path):
+    # The model rejects the unknown feature
+    grid = expand_grid(["6mo"], [20], [3], [["ret_short"], ["ret_short", "no_such_feature"]])
+    runner = SweepRunner(str(tmp_path), workers=0, load_prices=Loader())
+    results = runner.run(grid).set_index("id")
+    assert results.loc[grid[1].id, "status"] == "error"
+
+    # Errors are not done: the next run tries again
+    assert set(runner.completed()) == {grid[0].id}
+    with open(runner.results_path) as f:
+        n_lines = len(f.readlines())
+    runner.run(grid)
+    with open(runner.results_path) as f:
+        assert len(f.readlines()) == n_lines + 1
+
+
+def test_open_prices_round_trip(tmp_path):
+    prices = fake_prices()
+    path = save_prices(str(tmp_path), "6mo", prices)
+    opened = open_prices(path)
+
+    assert list(opened.columns) == list(prices.columns)
+    assert opened.index.equals(prices.index)
+    np.testing.assert_array_equal(opened.to_numpy(), prices.to_numpy())
+    # Workers share the read-only memmap instead of a copy
+    assert not opened.to_numpy().flags.writeable
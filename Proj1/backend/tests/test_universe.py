@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.universe import Universe
+
+
+def make_universe(dtype="float64"):
+    members = pd.DataFrame({"ticker": ["A", "B", "C"], "industry": ["x", "x", "y"], "sector": ["S", "S", "T"]})
+    return Universe("test", "MKT", members, dtype)
+
+
+def closes(values):
+    return pd.Series(values, index=pd.bdate_range("2024-01-01", periods=len(values)), dtype="float64")
+
+
+def test_single_member_groups_pass_through():
+    universe = make_universe()
+    prices = universe.aggregate({"A": closes([1.0, 2.0]), "C": closes([3.0, 4.0])}, level="ticker")
+    assert prices["A"].tolist() == [1.0, 2.0] and prices["C"].tolist() == [3.0, 4.0]
+
+
+def test_group_index_is_equal_weighted():
+    universe = make_universe()
+    prices = universe.aggregate({"A": closes([10, 11, 11]), "B": closes([20, 20, 22]), "C": closes([1, 1, 1])})
+    np.testing.assert_allclose(prices["S"], [100, 105, 105 * 1.05])
+
+
+def test_returns_are_chain_linked_across_missing_bars():
+    universe = make_universe()
+    a = closes([10, 11, 12, 12])
+    b = closes([20, np.nan, 24, 24])
+    prices = universe.aggregate({"A": a, "B": b})
+
+    # Day 2: only A (+10%); day 3: A +1/11, B +20% since its last close
+    expected = 100 * np.cumprod([1, 1.10, 1 + (1 / 11 + 0.20) / 2, 1])
+    np.testing.assert_allclose(prices["S"], expected)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_group_prices_use_the_universe_dtype(dtype):
+    universe = make_universe(dtype)
+    prices = universe.aggregate({"A": closes([10.0, 10.000001]), "B": closes([20.0, 20.0])})
+    assert prices["S"].dtype == np.dtype(dtype)
+    if dtype == "float64":
+        assert prices["S"].iloc[1] == pytest.approx(100 * (1 + 1e-7 / 2), rel=1e-12)
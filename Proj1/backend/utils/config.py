@@ -1,14 +1,98 @@
-SECTORS = {
-    "Technology": "XLK",
-    "Financials": "XLF",
-    "Energy": "XLE",
-    "Healthcare": "XLV",
-    "ConsumerDiscretionary": "XLY",
-    "ConsumerStaples": "XLP",
-    "Industrials": "XLI",
-    "Materials": "XLB",
-    "Utilities": "XLU",
-    "RealEstate": "XLRE"
+import os
+
+# Universe registry (utils/universe.py): a file name in utils/universes/ or a path
+UNIVERSE = os.environ.get("SRA_UNIVERSE", "sectors")
+# Grouping analysed: "sector", "industry" or "ticker"
+UNIVERSE_LEVEL = os.environ.get("SRA_UNIVERSE_LEVEL", "sector")
+# Clusters per window (performance tiers, best to worst)
+N_CLUSTERS = int(os.environ.get("SRA_N_CLUSTERS", 3))
+# Rolling relative-strength horizons (days) whose rotation flows every
+# snapshot precomputes, besides its own window (/rotation?windows=)
+ROTATION_WINDOWS = tuple(int(w) for w in os.environ.get("SRA_ROTATION_WINDOWS", "5,20,60,120").split(","))
+# Longest horizon clients may ask for, and how many horizons outside
+# ROTATION_WINDOWS each snapshot keeps once derived (least recently used go first)
+MAX_ROTATION_HORIZON = int(os.environ.get("SRA_MAX_ROTATION_HORIZON", 260))
+MAX_EXTRA_HORIZONS = int(os.environ.get("SRA_MAX_EXTRA_HORIZONS", 32))
+# Longest clustering window /rotation/frames accepts (days)
+MAX_FRAME_WINDOW = int(os.environ.get("SRA_MAX_FRAME_WINDOW", 260))
+# Longest return window /correlation accepts (days)
+MAX_CORRELATION_WINDOW = int(os.environ.get("SRA_MAX_CORRELATION_WINDOW", 260))
+# Features the rolling cluster model (snapshot index, live mode) clusters on:
+# any of ret_short, ret_medium, volatility, rel_strength, beta, avg_correlation
+# (see features/rolling_features.py; the last two add rolling covariances)
+CLUSTER_FEATURES = tuple(os.environ.get("SRA_CLUSTER_FEATURES", "ret_short,ret_medium,volatility,rel_strength")
+                         .split(","))
+
+# Local price store
+PRICE_STORE_DIR = os.environ.get(
+    "SRA_PRICE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "store")
+)
+PRICE_MAX_AGE_SECONDS = float(os.environ.get("SRA_PRICE_MAX_AGE_SECONDS", 3600))
+# Calendar days of stored bars fetched again (and overwritten) on each refresh
+PRICE_REFRESH_OVERLAP_DAYS = int(os.environ.get("SRA_PRICE_REFRESH_OVERLAP_DAYS", 7))
+
+# "yfinance" or "fixture" (reads <SRA_FIXTURE_DIR>/<TICKER>.csv)
+PRICE_PROVIDER = os.environ.get("SRA_PRICE_PROVIDER", "yfinance")
+FIXTURE_DIR = os.environ.get("SRA_FIXTURE_DIR")
+
+# Universe fetch layer (data/fetcher.py)
+FETCH_OPTIONS = {
+    "max_workers": int(os.environ.get("SRA_FETCH_MAX_WORKERS", 8)),
+    "retries": int(os.environ.get("SRA_FETCH_RETRIES", 2)),
+    "timeout": float(os.environ.get("SRA_FETCH_TIMEOUT", 30)),
 }
 
-MARKET_TICKER = "SPY"
\ No newline at end of file
+# Background refresh scheduler (services/scheduler.py)
+REFRESH_INTERVAL_SECONDS = float(os.environ.get("SRA_REFRESH_INTERVAL_SECONDS", 300))
+STALE_AFTER_SECONDS = float(os.environ.get("SRA_STALE_AFTER_SECONDS", 2 * REFRESH_INTERVAL_SECONDS))
+# Processes for the CPU-bound pipeline; 0 runs it in a thread instead
+PROCESS_WORKERS = int(os.environ.get("SRA_PROCESS_WORKERS", 1))
+# Keys clients may ask for (?period=, rolling windows); anything else is a 400
+SNAPSHOT_PERIODS = tuple(os.environ.get("SRA_SNAPSHOT_PERIODS", "1mo,3mo,6mo,1y,2y,5y,ytd").split(","))
+SNAPSHOT_WINDOWS = tuple(sorted(set(ROTATION_WINDOWS) | {20}))
+# Snapshots kept for keys beyond the background jobs (least recently used go first)
+MAX_SNAPSHOTS = int(os.environ.get("SRA_MAX_SNAPSHOTS", 32))
+
+# Bootstrap cluster confidence (models/cluster_confidence.py, /clusters/confidence):
+# default replicates and block length (days) of the resampled return windows
+CONFIDENCE_BOOTSTRAPS = int(os.environ.get("SRA_CONFIDENCE_BOOTSTRAPS", 500))
+CONFIDENCE_BLOCK = int(os.environ.get("SRA_CONFIDENCE_BLOCK", 5))
+# Results each snapshot keeps per (n, block, seed) (least recently used go first)
+MAX_CONFIDENCE_RESULTS = int(os.environ.get("SRA_MAX_CONFIDENCE_RESULTS", 8))
+
+# Parameter sweeps (services/sweep.py)
+SWEEP_DIR = os.environ.get(
+    "SRA_SWEEP_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sweeps")
+)
+SWEEP_WORKERS = int(os.environ.get("SRA_SWEEP_WORKERS", os.cpu_count() or 1))
+
+# Instrumentation (utils/metrics.py): stage / request histograms on /metrics.
+# Profiling lets a request ask for its stage breakdown (?profile=1 or an
+# X-Profile: 1 header), returned as a Server-Timing header.
+METRICS_ENABLED = os.environ.get("SRA_METRICS", "1") != "0"
+PROFILING_ENABLED = os.environ.get("SRA_PROFILING", "0") != "0"
+
+# Point-in-time snapshot index (services/snapshot_index.py): built over
+# SNAPSHOT_INDEX_PERIOD of history, then extended in the background
+SNAPSHOT_INDEX_ENABLED = os.environ.get("SRA_SNAPSHOT_INDEX", "1") != "0"
+SNAPSHOT_INDEX_DIR = os.environ.get(
+    "SRA_SNAPSHOT_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshot_index")
+)
+SNAPSHOT_INDEX_PERIOD = os.environ.get("SRA_SNAPSHOT_INDEX_PERIOD", "5y")
+SNAPSHOT_INDEX_WINDOW = int(os.environ.get("SRA_SNAPSHOT_INDEX_WINDOW", 30))
+SNAPSHOT_INDEX_FLOW_WINDOW = int(os.environ.get("SRA_SNAPSHOT_INDEX_FLOW_WINDOW", 20))
+# Dense per-day flow matrices grow with sectors^2; larger universes index clusters only
+SNAPSHOT_INDEX_FLOW_MAX_SECTORS = int(os.environ.get("SRA_SNAPSHOT_INDEX_FLOW_MAX_SECTORS", 64))
+
+# Live intraday mode (services/live.py, /live/ws): bars from LIVE_SOURCE
+# ("replay:<csv>", see data/bar_sources.py) update clusters and rotation flows
+# per tick; each WebSocket subscriber buffers up to LIVE_QUEUE_SIZE messages
+LIVE_ENABLED = os.environ.get("SRA_LIVE", "0") != "0"
+LIVE_SOURCE = os.environ.get("SRA_LIVE_SOURCE", "")
+LIVE_REPLAY_SPEED = float(os.environ.get("SRA_LIVE_REPLAY_SPEED", 1.0))
+LIVE_QUEUE_SIZE = int(os.environ.get("SRA_LIVE_QUEUE_SIZE", 64))
+LIVE_PERIOD = os.environ.get("SRA_LIVE_PERIOD", "6mo")
+LIVE_ROLLING_WINDOW = int(os.environ.get("SRA_LIVE_ROLLING_WINDOW", 5))
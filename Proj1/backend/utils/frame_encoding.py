@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Delta-encoded rotation frames
+# -----------------------------
+# Long-format rotation frames (one row per sector per date, see
+# models/rotation_frame_builder.py) repeat every sector name, date string and
+# coordinate on every date. The encoder turns them into messages:
+#
+#   {"type": "key", "date", "sectors": [...], "labels": [...], "columns": [...],
+#    "precision": {column: step}, "values": {column: [q, ...]},
+#    "cluster": [...], "performance": [code, ...]}
+#   {"type": "delta", "date", "values": {column: [[i, dq], ...]},
+#    "reset": {column: [[i, q or null], ...]},
+#    "cluster": [[i, id], ...], "performance": [[i, code], ...],
+#    "sectors": [new names], "labels": [new labels]}
+#
+# Coordinates are quantized to integers q = round(value / precision) and a
+# delta carries, per column, only the sectors whose q changed, as integer
+# differences (exact: decoding never drifts). "reset" sets absolute values,
+# used when a sector appears in or drops out of the frame (null = missing).
+# Sectors and performance labels are dictionary-coded by position; names
+# first seen in a delta are appended to the dictionaries.
+#
+# Decimation happens before encoding: every Nth frame (stride) and/or only
+# frames whose cluster or performance labels differ from the last sent one.
+
+COLUMNS = ["ret_short", "rel_strength", "volatility", "ret_medium", "size"]
+
+DEFAULT_PRECISION = 1e-4
+
+
+def _quantize(values: np.ndarray, step: float) -> np.ndarray:
+    """
+    round(value / step) as floats holding integers; NaN where missing.
+    """
+    with np.errstate(invalid="ignore"):
+        return np.round(np.asarray(values, dtype="float64") / step)
+
+
+def _to_list(q: np.ndarray) -> list:
+    return [None if v != v else int(v) for v in q.tolist()]
+
+
+def _pairs(index: np.ndarray, values: np.ndarray) -> list:
+    """
+    [[i, v], ...] with NaN values as None.
+    """
+    return [[i, v] for i, v in zip(index.tolist(), _to_list(values))]
+
+
+class FrameEncoder:
+    def __init__(self, precision=DEFAULT_PRECISION, columns=None, keyframe_every: int = None):
+        """
+        precision: quantization step, one for all columns or {column: step}
+        columns: coordinate columns to send (default COLUMNS)
+        keyframe_every: send a fresh keyframe every N frames so clients can
+                        seek; None sends a single keyframe
+        """
+        self.columns = list(columns or COLUMNS)
+        if isinstance(precision, dict):
+            self.precision = {c: float(precision.get(c, DEFAULT_PRECISION)) for c in self.columns}
+        else:
+            self.precision = {c: float(precision) for c in self.columns}
+        self.keyframe_every = keyframe_every
+
+        self.sectors = {}   # name -> position
+        self.labels = {}    # performance label -> code
+        # Last frame: key -> array over sector positions (NaN = not in the frame)
+        self.state = None
+        self.n_frames = 0
+
+    def _codes(self, names, dictionary: dict) -> tuple:
+        """
+        Positions of names in a dictionary, adding the new ones.
+        Returns (positions, names added).
+        """
+        added = [name for name in dict.fromkeys(names) if name not in dictionary]
+        for name in added:
+            dictionary[name] = len(dictionary)
+        return np.array([dictionary[name] for name in names], dtype=np.int64), added
+
+    def _frame_state(self, frame: pd.DataFrame, positions: np.ndarray) -> dict:
+        """
+        Quantized coordinates and labels of one frame, per sector position.
+        """
+        codes, _ = self._codes(frame["performance"].astype(str).tolist(), self.labels)
+        columns = {c: _quantize(frame[c].to_numpy(), self.precision[c]) for c in self.columns}
+        columns["cluster"] = frame["cluster"].to_numpy(dtype="float64")
+        columns["performance"] = codes.astype("float64")
+
+        state = {}
+        for key, values in columns.items():
+            state[key] = np.full(len(self.sectors), np.nan)
+            state[key][positions] = values
+        return state
+
+    def encode(self, frame: pd.DataFrame) -> dict:
+        """
+        Message for the next frame (rows = sectors, one date).
+        """
+        n_labels = len(self.labels)
+        positions, new_sectors = self._codes(frame["sector"].tolist(), self.sectors)
+        state = self._frame_state(frame, positions)
+        date = str(frame["date"].iat[0]) if len(frame) else None
+
+        keyframe = self.state is None or (self.keyframe_every and self.n_frames % self.keyframe_every == 0)
+        previous = self.state
+        self.state = state
+        self.n_frames += 1
+
+        if keyframe:
+            return {
+                "type": "key",
+                "date": date,
+                "sectors": list(self.sectors),
+                "labels": list(self.labels),
+                "columns": self.columns,
+                "precision": self.precision,
+                "values": {c: _to_list(state[c]) for c in self.columns},
+                "cluster": _to_list(state["cluster"]),
+                "performance": _to_list(state["performance"]),
+            }
+
+        message = {"type": "delta", "date": date}
+        if new_sectors:
+            message["sectors"] = new_sectors
+        if len(self.labels) > n_labels:
+            message["labels"] = list(self.labels)[n_labels:]
+
+        # Sectors added since the previous frame were missing from it
+        pad = len(self.sectors) - len(next(iter(previous.values())))
+        previous = {k: np.concatenate([v, np.full(pad, np.nan)]) for k, v in previous.items()}
+
+        deltas, resets = {}, {}
+        for column in self.columns:
+            old, new = previous[column], state[column]
+            both = ~np.isnan(old) & ~np.isnan(new)
+            moved = np.flatnonzero(both & (old != new))
+            flipped = np.flatnonzero(np.isnan(old) != np.isnan(new))
+            if len(moved):
+                deltas[column] = _pairs(moved, new[moved] - old[moved])
+            if len(flipped):
+                resets[column] = _pairs(flipped, new[flipped])
+        if deltas:
+            message["values"] = deltas
+        if resets:
+            message["reset"] = resets
+
+        for key in ("cluster", "performance"):
+            old, new = previous[key], state[key]
+            changed = np.flatnonzero((old != new) & ~(np.isnan(old) & np.isnan(new)))
+            if len(changed):
+                message[key] = _pairs(changed, new[changed])
+        return message
+
+
+def decimate_frames(frames, stride: int = 1, on_label_change: bool = False):
+    """
+    Frames to send: every stride-th, and with on_label_change only those
+    whose (sector, cluster, performance) rows differ from the last one kept.
+    The first frame is always kept.
+    """
+    last = None
+    for i, frame in enumerate(frames):
+        if i % stride:
+            continue
+        if on_label_change:
+            labels = frozenset(zip(frame["sector"], frame["cluster"], frame["performance"]))
+            if labels == last:
+                continue
+            last = labels
+        yield frame
+
+
+def iter_encoded_frames(frames, precision=DEFAULT_PRECISION, stride: int = 1, on_label_change: bool = False,
+                        keyframe_every: int = None, columns=None):
+    """
+    Yields one message per frame kept by decimate_frames.
+    """
+    encoder = FrameEncoder(precision, columns, keyframe_every)
+    for frame in decimate_frames(frames, stride, on_label_change):
+        yield encoder.encode(frame)
+
+
+def decode_frames(messages) -> pd.DataFrame:
+    """
+    Long-format frames (date, sector, columns..., cluster, performance) back
+    from encoder messages, with coordinates at their quantized precision.
+    """
+    sectors, labels, state, precision, columns = [], [], {}, {}, []
+    rows = []
+
+    for message in messages:
+        if message["type"] == "key":
+            sectors, labels = list(message["sectors"]), list(message["labels"])
+            columns, precision = message["columns"], message["precision"]
+            state = {c: list(message["values"][c]) for c in columns}
+            state["cluster"] = list(message["cluster"])
+            state["performance"] = list(message["performance"])
+        else:
+            sectors += message.get("sectors", [])
+            labels += message.get("labels", [])
+            for values in state.values():
+                values.extend([None] * (len(sectors) - len(values)))
+            for column, changes in message.get("values", {}).items():
+                for i, d in changes:
+                    state[column][i] += d
+            for column, changes in message.get("reset", {}).items():
+                for i, q in changes:
+                    state[column][i] = q
+            for key in ("cluster", "performance"):
+                for i, v in message.get(key, []):
+                    state[key][i] = v
+
+        present = [i for i, c in enumerate(state["cluster"]) if c is not None]
+        frame = {"date": [message["date"]] * len(present), "sector": [sectors[i] for i in present]}
+        for column in columns:
+            frame[column] = [np.nan if state[column][i] is None else state[column][i] * precision[column]
+                             for i in present]
+        frame["cluster"] = [state["cluster"][i] for i in present]
+        frame["performance"] = [labels[state["performance"][i]] for i in present]
+        rows.append(pd.DataFrame(frame))
+
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
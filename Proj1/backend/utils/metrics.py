@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from utils.config import METRICS_ENABLED
+
+# -----------------------------
+# Stage timing and Prometheus metrics
+# -----------------------------
+# Hot-path stages are wrapped in stage("name") (or decorated with
+# @timed("name")). A stage's duration goes to the innermost active collector
+# (see collect()) when there is one, otherwise straight into the
+# stage-duration histogram. Whoever opens a collector decides what happens to
+# its timings: the pipeline attaches them to its result (it may run in a
+# worker process, whose registry the server never sees) and the scheduler
+# observes them; the request middleware observes its own and can echo them
+# back as a Server-Timing header.
+#
+# With SRA_METRICS=0 and no collector active, stage() returns a shared no-op
+# context manager, so instrumented code pays one context-variable lookup.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NOOP = nullcontext()
+_collector = ContextVar("stage_collector", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str, buckets=DEFAULT_BUCKETS):
+        """
+        Cumulative-bucket histogram keyed by the value of a single label.
+        """
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+
+        self._lock = threading.Lock()
+        # label value -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+
+    def observe(self, label_value: str, seconds: float):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def snapshot(self) -> dict:
+        """
+        label value -> {"buckets": cumulative counts, "sum", "count"}.
+        """
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+        out = {}
+        for value, (counts, total, count) in series.items():
+            cumulative, running = [], 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            out[value] = {"buckets": cumulative, "sum": total, "count": count}
+        return out
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for value, series in sorted(self.snapshot().items()):
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(bounds, series["buckets"]):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("sra_stage_duration_seconds", "Time spent in each pipeline / request stage.", "stage")
+REQUEST_SECONDS = Histogram("sra_http_request_duration_seconds", "Request handling time per route.", "route")
+
+
+# -----------------------------
+# Timers
+# -----------------------------
+
+class StageTimings:
+    def __init__(self):
+        """
+        Stage name -> accumulated seconds, in order of first use.
+        """
+        self.seconds = {}
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def merge(self, timings: dict, prefix: str = ""):
+        for name, seconds in timings.items():
+            self.add(prefix + name, seconds)
+
+
+@contextmanager
+def collect():
+    """
+    Collect the stages run inside the block (in this context) into a
+    StageTimings instead of the histogram.
+    """
+    timings = StageTimings()
+    token = _collector.set(timings)
+    try:
+        yield timings
+    finally:
+        _collector.reset(token)
+
+
+def stage(name: str):
+    """
+    Context manager timing one stage.
+    """
+    collector = _collector.get()
+    if collector is None and not METRICS_ENABLED:
+        return _NOOP
+    return _timed_stage(name, collector)
+
+
+@contextmanager
+def _timed_stage(name: str, collector):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if collector is not None:
+            collector.add(name, elapsed)
+        else:
+            STAGE_SECONDS.observe(name, elapsed)
+
+
+def timed(name: str):
+    """
+    Decorator form of stage().
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_stages(timings: dict):
+    """
+    Feed collected timings (stage -> seconds) into the stage histogram.
+    """
+    if METRICS_ENABLED:
+        for name, seconds in timings.items():
+            STAGE_SECONDS.observe(name, seconds)
+
+
+def server_timing(timings: dict) -> str:
+    """
+    Server-Timing header value (durations in milliseconds).
+    """
+    return ", ".join(f"{_token(name)};dur={seconds * 1e3:.2f}" for name, seconds in timings.items())
+
+
+# -----------------------------
+# Exposition
+# -----------------------------
+
+def render(gauges=(), counters=()) -> str:
+    """
+    Prometheus text exposition of the histograms plus point-in-time values.
+    gauges / counters: iterables of (name, help, [(labels dict, value), ...])
+    """
+    lines = []
+    for kind, metrics in (("gauge", gauges), ("counter", counters)):
+        for name, help, samples in metrics:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    if METRICS_ENABLED:
+        lines.extend(STAGE_SECONDS.render())
+        lines.extend(REQUEST_SECONDS.render())
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    value = float(value)
+    return repr(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _token(name: str) -> str:
+    # Server-Timing metric names are HTTP tokens
+    return "".join(c if c.isalnum() or c in "-_.!#$%&'*+^`|~" else "_" for c in name)
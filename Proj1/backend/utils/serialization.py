@@ -0,0 +1,183 @@
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Response serialization
+# -----------------------------
+# Columnar payloads in three formats, picked from the request's Accept header:
+#   application/json                      records (default, what the frontend reads)
+#   application/x-sra-packed              packed little-endian columns, see pack_columns
+#   application/vnd.apache.arrow.stream   Arrow IPC stream (needs pyarrow)
+
+JSON = "application/json"
+PACKED = "application/x-sra-packed"
+ARROW = "application/vnd.apache.arrow.stream"
+
+SUPPORTED = (JSON, PACKED, ARROW)
+
+PACKED_MAGIC = b"SRAP"
+PACKED_VERSION = 1
+
+
+def choose_format(accept: str = None) -> str:
+    """
+    Pick the best supported media type from an Accept header (q-values honoured).
+    Falls back to JSON.
+    """
+    if not accept:
+        return JSON
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media_type, q = fields[0].lower(), 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        if media_type in SUPPORTED and q > 0:
+            candidates.append((-q, position, media_type))
+
+    return min(candidates)[2] if candidates else JSON
+
+
+def to_records(df: pd.DataFrame) -> list:
+    """
+    JSON-ready list of row dicts, built column by column (no iterrows).
+    NaN becomes None.
+    """
+    columns = list(df.columns)
+    values = []
+    for col in columns:
+        series = df[col]
+        if series.dtype.kind == "f":
+            values.append([None if v != v else v for v in series.tolist()])
+        else:
+            # Object columns can hold NaN / NaT / pd.NA too
+            missing = series.isna().to_numpy()
+            values.append(series.astype(object).where(~missing, None).tolist() if missing.any()
+                          else series.tolist())
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def to_json_bytes(df: pd.DataFrame) -> bytes:
+    return json.dumps(to_records(df), separators=(",", ":")).encode()
+
+
+# -----------------------------
+# Packed columnar format
+# -----------------------------
+# b"SRAP" | version: u8 | header length: u32 | header: UTF-8 JSON | column buffers
+#
+# The header lists {"name", "dtype", "offset", "length"} per column (offsets
+# into the buffer section). Numeric columns are float32 / int32; string
+# columns are dictionary-encoded with the dictionary stored in the header
+# ("dictionary": [...]) as uint16 codes, or uint32 codes when there are too
+# many categories. The largest value of the code type marks a missing value.
+
+
+def pack_columns(df: pd.DataFrame) -> bytes:
+    columns = []
+    buffers = []
+    offset = 0
+
+    for name in df.columns:
+        series = df[name]
+        entry = {"name": str(name)}
+
+        if series.dtype.kind == "f":
+            data = series.to_numpy(dtype="<f4")
+        elif series.dtype.kind in "iub":
+            data = series.to_numpy(dtype="<i4")
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            entry["dictionary"] = [str(u) for u in uniques]
+            code_type = np.dtype("<u2") if len(uniques) < np.iinfo("u2").max else np.dtype("<u4")
+            data = np.where(codes < 0, np.iinfo(code_type).max, codes).astype(code_type)
+
+        raw = data.tobytes()
+        entry.update({"dtype": data.dtype.str, "offset": offset, "length": len(data)})
+        columns.append(entry)
+        buffers.append(raw)
+
+        # Keep every buffer 4-byte aligned
+        padding = (-len(raw)) % 4
+        buffers.append(b"\0" * padding)
+        offset += len(raw) + padding
+
+    header = json.dumps({"rows": len(df), "columns": columns}, separators=(",", ":")).encode()
+    header += b" " * ((-(len(header) + 9)) % 4)
+
+    return PACKED_MAGIC + struct.pack("<BI", PACKED_VERSION, len(header)) + header + b"".join(buffers)
+
+
+def unpack_columns(payload: bytes) -> pd.DataFrame:
+    """
+    Inverse of pack_columns (float columns come back as float32).
+    """
+    if payload[:4] != PACKED_MAGIC:
+        raise ValueError("Not a packed payload")
+
+    version, header_len = struct.unpack_from("<BI", payload, 4)
+    if version != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed version: {version}")
+
+    header = json.loads(payload[9:9 + header_len])
+    body = memoryview(payload)[9 + header_len:]
+
+    data = {}
+    for col in header["columns"]:
+        dtype = np.dtype(col["dtype"])
+        values = np.frombuffer(body, dtype=dtype, count=col["length"], offset=col["offset"])
+        if "dictionary" in col:
+            dictionary = np.array(col["dictionary"] + [None], dtype=object)
+            missing = values == np.iinfo(dtype).max
+            values = dictionary[np.where(missing, len(col["dictionary"]), values)]
+        data[col["name"]] = values
+
+    return pd.DataFrame(data)
+
+
+# -----------------------------
+# Arrow IPC
+# -----------------------------
+
+def to_arrow_ipc(df: pd.DataFrame) -> bytes:
+    """
+    Arrow IPC stream with float32 numeric columns and dictionary-encoded strings.
+    Raises ImportError when pyarrow is not installed.
+    """
+    import pyarrow as pa
+
+    arrays = {}
+    for name in df.columns:
+        series = df[name]
+        if series.dtype.kind == "f":
+            arrays[str(name)] = pa.array(series.to_numpy(dtype="float32"), from_pandas=True)
+        elif series.dtype.kind in "iub":
+            arrays[str(name)] = pa.array(series.to_numpy(dtype="int32"))
+        else:
+            arrays[str(name)] = pa.array(series.astype(object).tolist()).dictionary_encode()
+
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(df: pd.DataFrame, media_type: str) -> bytes:
+    """
+    Serialize a columnar frame in the given media type.
+    """
+    if media_type == PACKED:
+        return pack_columns(df)
+    if media_type == ARROW:
+        return to_arrow_ipc(df)
+    return to_json_bytes(df)
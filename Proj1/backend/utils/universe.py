@@ -0,0 +1,144 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Universe registry
+# -----------------------------
+# A universe is a JSON file listing member tickers and the groups they
+# belong to (ticker -> industry -> sector), plus the market benchmark:
+#
+#   {"name": "sectors", "market": "SPY", "dtype": "float64",
+#    "members": [{"ticker": "XLK", "industry": "...", "sector": "Technology"}, ...]}
+#
+# "industry" is optional (defaults to the sector). "dtype" is the storage
+# type of the group price frames; float32 halves memory for large universes.
+# Files live in utils/universes/ and are referenced by name, or by path.
+
+UNIVERSE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "universes")
+
+LEVELS = ("ticker", "industry", "sector")
+
+
+class Universe:
+    def __init__(self, name: str, market: str, members: pd.DataFrame, dtype: str = "float64"):
+        """
+        members: DataFrame with columns ticker, industry, sector (one row per ticker)
+        """
+        if members["ticker"].duplicated().any():
+            duplicates = members.loc[members["ticker"].duplicated(), "ticker"].tolist()
+            raise ValueError(f"Universe {name!r} lists tickers more than once: {duplicates}")
+        if market in set(members["ticker"]):
+            raise ValueError(f"Universe {name!r} lists its market ticker {market!r} as a member")
+
+        self.name = name
+        self.market = market
+        self.members = members.reset_index(drop=True)
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "Universe":
+        members = pd.DataFrame(config["members"])
+        if "sector" not in members or members["sector"].isna().any():
+            raise ValueError(f"Every member of universe {config.get('name')!r} needs a sector")
+        if "industry" not in members:
+            members["industry"] = members["sector"]
+        members["industry"] = members["industry"].fillna(members["sector"])
+
+        return cls(config["name"], config["market"], members[["ticker", "industry", "sector"]],
+                   config.get("dtype", "float64"))
+
+    @property
+    def tickers(self) -> list:
+        return self.members["ticker"].tolist()
+
+    def mapping(self, level: str = "sector") -> pd.Series:
+        """
+        ticker -> group name at `level`.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Unknown universe level: {level}")
+        return pd.Series(self.members[level].to_numpy(), index=self.members["ticker"].to_numpy())
+
+    def groups(self, level: str = "sector") -> list:
+        """
+        Group names at `level`, in order of first appearance.
+        """
+        return self.mapping(level).unique().tolist()
+
+    def aggregate(self, series: Dict[str, pd.Series], level: str = "sector",
+                  chunk_size: int = 256) -> Dict[str, pd.Series]:
+        """
+        Member closes -> one price series per group at `level`.
+
+        series: ticker -> Series of closes (missing tickers are skipped)
+        When every group has a single member its closes are used as they are.
+        Otherwise each group is an equal-weighted index of its members' daily
+        returns, rebased to 100. A member's return runs from its last valid
+        close (chain-linked across missing bars); members without a close that
+        day are left out.
+        Members are processed chunk_size at a time so memory stays bounded.
+        """
+        mapping = self.mapping(level)
+        if mapping.is_unique:
+            return {mapping[t]: s.astype(self.dtype)
+                    for t, s in series.items() if t in mapping.index}
+
+        tickers = [t for t in mapping.index if t in series]
+        if not tickers:
+            return {}
+
+        groups = pd.Index(self.groups(level))
+        codes = groups.get_indexer(mapping[tickers])
+        dates = pd.DatetimeIndex(np.unique(np.concatenate([series[t].index.to_numpy() for t in tickers])))
+        n_dates, n_groups = len(dates), len(groups)
+
+        sums = np.zeros((n_dates, n_groups))
+        counts = np.zeros((n_dates, n_groups))
+        priced = np.zeros((n_dates, n_groups))
+
+        for lo in range(0, len(tickers), chunk_size):
+            chunk = tickers[lo:lo + chunk_size]
+
+            block = np.full((n_dates, len(chunk)), np.nan, dtype=self.dtype)
+            for j, ticker in enumerate(chunk):
+                block[dates.get_indexer(series[ticker].index), j] = series[ticker].to_numpy()
+
+            # Last valid close on or before each date
+            rows = np.where(np.isnan(block), 0, np.arange(n_dates)[:, None])
+            last_close = block[np.maximum.accumulate(rows, axis=0), np.arange(len(chunk))]
+
+            # Grouped sums as one matrix product with the member -> group indicator
+            onehot = np.zeros((len(chunk), n_groups))
+            onehot[np.arange(len(chunk)), codes[lo:lo + chunk_size]] = 1.0
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                daily = block[1:] / last_close[:-1] - 1
+            valid = np.isfinite(daily)
+
+            sums[1:] += np.where(valid, daily, 0.0) @ onehot
+            counts[1:] += valid @ onehot
+            priced += ~np.isnan(block) @ onehot
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth = np.where(counts > 0, 1 + sums / counts, 1.0)
+        index = 100 * np.cumprod(growth, axis=0)
+        # No value before a group's first price, or on days none of its members traded
+        index[np.cumsum(priced, axis=0) == 0] = np.nan
+        index[priced == 0] = np.nan
+
+        index = index.astype(self.dtype)
+        return {group: pd.Series(index[:, g], index=dates, name=group) for g, group in enumerate(groups)}
+
+
+@lru_cache(maxsize=None)
+def load_universe(name: str) -> Universe:
+    """
+    name: file name in utils/universes/ (without .json), or a path to a JSON file
+    """
+    path = name if os.path.splitext(name)[1] else os.path.join(UNIVERSE_DIR, f"{name}.json")
+    with open(path) as f:
+        return Universe.from_dict(json.load(f))
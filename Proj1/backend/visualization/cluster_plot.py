@@ -0,0 +1,42 @@
+import plotly.express as px
+
+def plot_clusters(clustered_df):
+    """
+    clustered_df: SectorKMeans output with 'cluster' and 'performance' columns,
+    indexed by sector
+    """
+    df = clustered_df.reset_index().rename(columns={"index": "sector"})
+
+    # Plot 3D scatter
+    fig = px.scatter_3d(
+        df,
+        x="ret_short",
+        y="rel_strength",
+        z="volatility",
+        color="performance",       # use human-readable labels
+        text="sector",             # sector names on points
+        title="Sector Clusters Labeled by Performance",
+        color_discrete_map={
+            "Outperforming": "green",
+            "Neutral": "yellow",
+            "Underperforming": "red"
+        },
+        labels={
+            "ret_short": "Short-Term Return",
+            "rel_strength": "Relative Strength",
+            "volatility": "Volatility",
+            "performance": "Cluster Performance"
+        },
+        hover_data={"cluster": True, "ret_medium": True}  # optional extra info
+    )
+
+    fig.update_traces(marker=dict(size=8), textposition="top center")
+    fig.update_layout(
+        width=1000,
+        height=800,
+        template="plotly_dark",
+        legend_title="Performance"
+    )
+
+    fig.show()
+    return fig
@@ -1,11 +1,19 @@
+import pandas as pd
 import plotly.express as px
+from utils.frame_encoding import decimate_frames
 
-def animate_sector_rotation(rotation_frames_df):
+def animate_sector_rotation(rotation_frames_df, stride=1, on_label_change=False):
     """
     rotation_frames_df columns:
     ['date', 'sector', 'ret_short', 'rel_strength', 'volatility',
      'ret_medium', 'performance']
+    stride / on_label_change: animate every Nth date / only dates where the
+    labels changed (see utils/frame_encoding.py); long histories otherwise
+    produce very large figures
     """
+    if stride > 1 or on_label_change:
+        frames = [frame for _, frame in rotation_frames_df.groupby("date", sort=True)]
+        rotation_frames_df = pd.concat(list(decimate_frames(frames, stride, on_label_change)), ignore_index=True)
 
     fig = px.scatter_3d(
         rotation_frames_df,
@@ -0,0 +1,39 @@
+import pandas as pd
+import plotly.graph_objects as go
+from models.rotation_flow import flow_matrix_to_edges
+
+def plot_sector_to_sector_sankey(flow_df: pd.DataFrame):
+    """
+    Plot a Sankey diagram from a rotation flow DataFrame.
+
+    flow_df: edges (source, target, weight) as returned by compute_rotation_flow,
+             or a flow matrix (rows = source, columns = target)
+    Sectors losing rank are drawn on the left, sectors gaining it on the right.
+    """
+    if not {"source", "target", "weight"}.issubset(flow_df.columns):
+        flow_df = flow_matrix_to_edges(flow_df)
+
+    sources = pd.Index(flow_df["source"].unique())
+    targets = pd.Index(flow_df["target"].unique())
+
+    fig = go.Figure(go.Sankey(
+        node=dict(
+            label=[f"{s} (out)" for s in sources] + [f"{t} (in)" for t in targets],
+            pad=15,
+            thickness=15,
+        ),
+        link=dict(
+            source=sources.get_indexer(flow_df["source"]),
+            target=len(sources) + targets.get_indexer(flow_df["target"]),
+            value=flow_df["weight"],
+        ),
+    ))
+    fig.update_layout(
+        title="Sector-to-Sector Rotation Flows",
+        template="plotly_dark",
+        width=1000,
+        height=800,
+    )
+
+    fig.show()
+    return fig